@@ -309,6 +309,11 @@ export default function NotificationsPage() {
                             <span className="font-medium text-white/80">
                               {notification.sender?.display_name || notification.sender?.username}
                             </span>{" "}
+                            {notification.actors_count > 1 && (
+                              <span className="text-white/40">
+                                {t.notifications.andOthers} {notification.actors_count - 1}{" "}
+                              </span>
+                            )}
                             <span className="text-white/40">
                               {getMessageForType(notification.notification_type)}
                             </span>
@@ -1,5 +1,8 @@
 """
 ASGI config for gitforum project.
+
+SSE-поток /api/notifications/stream/ держит соединения открытыми,
+поэтому запускайте через ASGI-сервер: uvicorn gitforum.asgi:application
 """
 import os
 from django.core.asgi import get_asgi_application
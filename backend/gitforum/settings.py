@@ -38,6 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.sites',
+    'django.contrib.postgres',
     
     # Third party
     'rest_framework',
@@ -79,7 +80,7 @@ ROOT_URLCONF = 'gitforum.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [],
+        'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -122,6 +123,20 @@ DATABASES = {
 # }
 
 
+# Cache
+# По умолчанию локальная память процесса; для нескольких воркеров
+# укажите общий backend, например django.core.cache.backends.redis.RedisCache
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='gitforum'),
+    }
+}
+
+# Время жизни кэша ответов для анонимных пользователей (секунды)
+RESPONSE_CACHE_TIMEOUT = config('RESPONSE_CACHE_TIMEOUT', default=60, cast=int)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -187,6 +202,83 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Пагинация списков постов: 'page' (PageNumberPagination) или 'cursor' (keyset).
+# Клиент может переключиться сам через ?pagination=cursor / ?cursor=
+POSTS_PAGINATION = config('POSTS_PAGINATION', default='page')
+
+# Лента подписок: посты авторов с таким числом подписчиков и больше
+# не раскладываются по лентам, а подмешиваются при чтении
+FEED_FANOUT_MAX_FOLLOWERS = config('FEED_FANOUT_MAX_FOLLOWERS', default=10000, cast=int)
+
+# Быстрый путь сериализации списков (см. python manage.py bench_serializers)
+FAST_SERIALIZATION = config('FAST_SERIALIZATION', default=True, cast=bool)
+
+# Буфер просмотров (posts/view_buffer.py): просмотры пишутся пачками
+# в фоне раз в VIEW_BUFFER_FLUSH_INTERVAL секунд или при заполнении буфера
+VIEW_BUFFER_ENABLED = config('VIEW_BUFFER_ENABLED', default=True, cast=bool)
+VIEW_BUFFER_FLUSH_INTERVAL = config('VIEW_BUFFER_FLUSH_INTERVAL', default=5, cast=float)
+VIEW_BUFFER_MAX_SIZE = config('VIEW_BUFFER_MAX_SIZE', default=10000, cast=int)
+
+# Уникальные просмотры: 'exact' — строки PostView, 'hll' — скетчи HyperLogLog
+# (~1% ошибки, несколько КБ на пост). Перед переключением: manage.py build_view_sketches
+UNIQUE_VIEWS_MODE = config('UNIQUE_VIEWS_MODE', default='exact')
+
+# Счётчики (likes_count, followers_count, ...): изменения копятся в шардах
+# CounterShard и переносятся в строки пачками раз в COUNTER_FLUSH_INTERVAL секунд.
+# SHARDED_COUNTERS=False — прежние F()-обновления прямо в запросе
+SHARDED_COUNTERS = config('SHARDED_COUNTERS', default=True, cast=bool)
+COUNTER_SHARDS = config('COUNTER_SHARDS', default=8, cast=int)
+COUNTER_FLUSH_INTERVAL = config('COUNTER_FLUSH_INTERVAL', default=5, cast=float)
+
+# Трендовые рейтинги (posts/trending.py): события копятся в TrendingDelta
+# и переносятся в рейтинги раз в TRENDING_FOLD_INTERVAL секунд
+TRENDING_FOLD_INTERVAL = config('TRENDING_FOLD_INTERVAL', default=5, cast=float)
+
+# Группировка уведомлений (posts/notification_groups.py): лайки поста и подписки
+# за NOTIFICATION_GROUP_WINDOW часов собираются в одну строку «alice и ещё 41»
+NOTIFICATION_GROUPING = config('NOTIFICATION_GROUPING', default=True, cast=bool)
+NOTIFICATION_GROUP_WINDOW = config('NOTIFICATION_GROUP_WINDOW', default=24, cast=int)
+
+# Рассылка нового поста подписчикам (posts/fanout_jobs.py) — фоновыми задачами
+# FanoutJob. FANOUT_JOBS_IN_PROCESS=False — только отдельный воркер run_fanout_jobs
+FANOUT_JOBS_IN_PROCESS = config('FANOUT_JOBS_IN_PROCESS', default=True, cast=bool)
+FANOUT_JOB_INTERVAL = config('FANOUT_JOB_INTERVAL', default=10, cast=float)
+
+# SSE-поток уведомлений /api/notifications/stream/ (нужен ASGI-сервер).
+# Брокер: posts.notification_stream.LocalBroker — в пределах процесса,
+# posts.notification_stream.PostgresBroker — LISTEN/NOTIFY для нескольких воркеров
+NOTIFICATION_STREAM_BACKEND = config(
+    'NOTIFICATION_STREAM_BACKEND', default='posts.notification_stream.LocalBroker'
+)
+NOTIFICATION_STREAM_HEARTBEAT = config('NOTIFICATION_STREAM_HEARTBEAT', default=15, cast=float)
+NOTIFICATION_STREAM_QUEUE_SIZE = config('NOTIFICATION_STREAM_QUEUE_SIZE', default=16, cast=int)
+
+# Срок хранения (posts/retention.py, manage.py prune_old_rows): строки старше
+# стольких дней удаляются, 0 — хранить всё. Старые PostView — ключи уникальных
+# просмотров: после их удаления зритель посчитается снова
+NOTIFICATION_RETENTION_DAYS = config('NOTIFICATION_RETENTION_DAYS', default=180, cast=int)
+POST_VIEW_RETENTION_DAYS = config('POST_VIEW_RETENTION_DAYS', default=0, cast=int)
+# Помесячные секции (posts/partitions.py, manage.py partition_tables) создаются заранее
+PARTITION_MONTHS_AHEAD = config('PARTITION_MONTHS_AHEAD', default=3, cast=int)
+
+# Почта: по умолчанию письма печатаются в консоль; для SMTP —
+# EMAIL_BACKEND=django.core.mail.backends.smtp.EmailBackend и EMAIL_HOST/...
+EMAIL_BACKEND = config('EMAIL_BACKEND', default='django.core.mail.backends.console.EmailBackend')
+EMAIL_HOST = config('EMAIL_HOST', default='localhost')
+EMAIL_PORT = config('EMAIL_PORT', default=25, cast=int)
+EMAIL_HOST_USER = config('EMAIL_HOST_USER', default='')
+EMAIL_HOST_PASSWORD = config('EMAIL_HOST_PASSWORD', default='')
+EMAIL_USE_TLS = config('EMAIL_USE_TLS', default=False, cast=bool)
+EMAIL_TIMEOUT = config('EMAIL_TIMEOUT', default=30, cast=int)
+DEFAULT_FROM_EMAIL = config('DEFAULT_FROM_EMAIL', default='GitForum <noreply@gitforum.local>')
+
+# Email-дайджесты уведомлений (posts/email_digests.py, manage.py send_notification_digests):
+# не чаще раза в EMAIL_DIGEST_INTERVAL минут, первое письмо — за последние
+# EMAIL_DIGEST_MAX_AGE часов, до EMAIL_DIGEST_MAX_ITEMS уведомлений в письме
+EMAIL_DIGEST_INTERVAL = config('EMAIL_DIGEST_INTERVAL', default=60, cast=int)
+EMAIL_DIGEST_MAX_AGE = config('EMAIL_DIGEST_MAX_AGE', default=24, cast=int)
+EMAIL_DIGEST_MAX_ITEMS = config('EMAIL_DIGEST_MAX_ITEMS', default=20, cast=int)
+
 # ===================
 # JWT Settings
 # ===================
@@ -263,7 +355,7 @@ REST_AUTH = {
     'JWT_AUTH_COOKIE': 'gitforum-auth',
     'JWT_AUTH_REFRESH_COOKIE': 'gitforum-refresh',
     'JWT_AUTH_HTTPONLY': True,
-    'USER_DETAILS_SERIALIZER': 'users.serializers.UserDetailSerializer',
+    'USER_DETAILS_SERIALIZER': 'users.serializers.CurrentUserSerializer',
 }
 
 # ===================
@@ -0,0 +1,63 @@
+"""
+Фоновый периодический сброс буферов процесса (просмотры, счётчики)
+
+Поток запускается лениво при первом использовании и заново после fork
+(воркеры gunicorn). При завершении процесса выполняется последний сброс (atexit).
+"""
+import atexit
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicFlusher:
+    """Вызывает flush раз в interval_setting секунд в фоновом потоке"""
+
+    def __init__(self, flush, interval_setting, default_interval=5, name='flusher'):
+        self.flush = flush
+        self.interval_setting = interval_setting
+        self.default_interval = default_interval
+        self.name = name
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._wakeup = threading.Event()
+
+    @property
+    def interval(self):
+        return getattr(settings, self.interval_setting, self.default_interval)
+
+    def ensure_started(self):
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            if self._pid is None:
+                atexit.register(self._flush_safely)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def _flush_safely(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('%s: flush failed', self.name)
+
+    def wake(self):
+        """Запускает сброс сейчас, не дожидаясь интервала"""
+        self.ensure_started()
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self._flush_safely()
+            close_old_connections()
@@ -0,0 +1,114 @@
+"""
+Кэш ответов для анонимных GET-запросов
+
+Ключ зависит от пути и query-параметров, но не от пользователя
+(для анонимов is_liked / is_bookmarked всегда False).
+Инвалидация через версии пространств имён: сигналы увеличивают версию,
+и все старые ключи этого пространства перестают использоваться.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+CACHE_PREFIX = 'response-cache'
+
+# Пространства имён кэша
+POSTS = 'posts'
+TAGS = 'tags'
+STATS = 'stats'
+
+# Не чаще одного сброса за столько секунд для просмотров
+VIEW_INVALIDATION_DEBOUNCE = 10
+
+
+def _version_key(namespace):
+    return f'{CACHE_PREFIX}:version:{namespace}'
+
+
+def _new_version():
+    # Время в мс: если ключ версии вытеснен из кэша, новая версия
+    # не совпадёт ни с одной старой
+    return int(time.time() * 1000)
+
+
+def get_versions(namespaces):
+    """Текущие версии пространств имён (создаёт отсутствующие)"""
+    keys = {namespace: _version_key(namespace) for namespace in namespaces}
+    stored = cache.get_many(keys.values())
+    versions = []
+    for namespace, key in keys.items():
+        version = stored.get(key)
+        if version is None:
+            cache.add(key, _new_version(), timeout=None)
+            version = cache.get(key)
+        versions.append(f'{namespace}{version}')
+    return versions
+
+
+def _bump(namespace):
+    key = _version_key(namespace)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_version(), timeout=None)
+
+
+def invalidate(*namespaces, debounce=None):
+    """
+    Сбрасывает кэш пространств имён после коммита транзакции.
+    debounce (сек): не чаще одного сброса за интервал — для частых событий
+    вроде просмотров, иначе кэш списков сбрасывался бы на каждый просмотр.
+    """
+    def bump():
+        for namespace in namespaces:
+            if debounce and not cache.add(f'{CACHE_PREFIX}:debounce:{namespace}', 1, timeout=debounce):
+                continue
+            _bump(namespace)
+
+    transaction.on_commit(bump)
+
+
+class AnonymousResponseCacheMixin:
+    """
+    Кэширует ответы GET для анонимных пользователей.
+    cache_namespaces — от каких данных зависит ответ.
+    Для generic list views работает автоматически, в APIView
+    оборачивайте обработчик через cached_response().
+    """
+    cache_namespaces = (POSTS,)
+
+    def get_response_cache_key(self, request):
+        params = sorted(
+            (key, value)
+            for key, values in request.query_params.lists()
+            for value in values
+        )
+        raw = f'{request.get_host()}|{request.path}|{params}'
+        digest = hashlib.md5(raw.encode()).hexdigest()
+        versions = ':'.join(get_versions(self.cache_namespaces))
+        return f'{CACHE_PREFIX}:{versions}:{digest}'
+
+    def cached_response(self, request, handler, *args, **kwargs):
+        """Отдаёт ответ из кэша или вызывает handler и кэширует результат"""
+        if request.user.is_authenticated:
+            return handler(request, *args, **kwargs)
+
+        key = self.get_response_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, timeout=settings.RESPONSE_CACHE_TIMEOUT)
+            response['X-Cache'] = 'MISS'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
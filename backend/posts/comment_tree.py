@@ -0,0 +1,84 @@
+"""
+Загрузка веток комментариев одним запросом
+
+Раньше CommentSerializer на каждый комментарий делал replies.count()
+и отдельный запрос ответов (до 5 уровней) — сотни запросов на ветку.
+Теперь для страницы корневых комментариев все ответы до нужной глубины
+берутся одним запросом по root_id (индекс comment_root_path_idx),
+в порядке path — родитель всегда раньше своих ответов. Дерево и
+ограничение REPLIES_PER_LEVEL ответов на уровень собираются в Python,
+replies_count хранится в колонке комментария. Остальные ответы
+догружаются страницами через comments/<id>/replies/ (load_replies).
+"""
+from . import counters
+from .models import Comment
+
+# Максимальная глубина отображаемых ответов
+MAX_DEPTH = 5
+# Сколько ответов показывать на каждом уровне
+REPLIES_PER_LEVEL = 20
+# Максимальная глубина ответа: путь из MAX_NESTING + 1 сегментов по 17 символов
+# должен помещаться в Comment.path (1000 символов)
+MAX_NESTING = 50
+
+
+def build_tree(roots, descendants):
+    """
+    Раскладывает descendants (в порядке path) по родителям.
+    Заполняет у каждого комментария thread_replies и применяет
+    незаписанные шарды replies_count (одним запросом).
+    """
+    by_id = {}
+    for comment in roots:
+        comment.thread_replies = []
+        by_id[comment.pk] = comment
+
+    for comment in descendants:
+        comment.thread_replies = []
+        by_id[comment.pk] = comment
+        parent = by_id.get(comment.parent_id)
+        if parent is not None and len(parent.thread_replies) < REPLIES_PER_LEVEL:
+            parent.thread_replies.append(comment)
+
+    counters.apply_pending(by_id.values())
+    return roots
+
+
+def load_threads(roots):
+    """
+    Загружает ответы к корневым комментариям страницы одним запросом.
+    Ответы глубже MAX_DEPTH не показываются (их число — в replies_count).
+    """
+    roots = list(roots)
+    if not roots:
+        return roots
+
+    descendants = Comment.objects.filter(
+        root_id__in=[comment.pk for comment in roots],
+        depth__gt=0,
+        depth__lte=MAX_DEPTH,
+    ).select_related('author').order_by('root_id', 'path')
+    return build_tree(roots, descendants)
+
+
+def load_replies(parent, replies):
+    """
+    Страница прямых ответов parent вместе с их ветками до MAX_DEPTH.
+    Ответы страницы идут подряд в порядке path, поэтому все их потомки
+    лежат в одном диапазоне path — один запрос по comment_post_path_idx.
+    """
+    replies = list(replies)
+    if not replies or parent.depth + 2 > MAX_DEPTH:
+        return build_tree(replies, [])
+
+    paths = [reply.path for reply in replies]
+    descendants = Comment.objects.filter(
+        post_id=parent.post_id,
+        path__gte=min(paths),
+        # Пути потомков начинаются с path ответа, '~' больше любой hex-цифры
+        path__lt=max(paths) + '~',
+        depth__gte=parent.depth + 2,
+        depth__lte=MAX_DEPTH,
+    ).select_related('author').order_by('path')
+    return build_tree(replies, descendants)
+
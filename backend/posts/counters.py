@@ -0,0 +1,238 @@
+"""
+Счётчики с отложенной записью (likes_count, followers_count, ...)
+
+Раньше каждый лайк/комментарий/подписка делал UPDATE ... SET x = x + 1
+строки поста или пользователя, и при всплеске активности все запросы
+ждали блокировку одной строки. Теперь:
+- increment() прибавляет изменение к случайному из COUNTER_SHARDS шардов
+  CounterShard (INSERT ... ON CONFLICT DO UPDATE) — параллельные запросы
+  пишут в разные строки;
+- flush() раз в COUNTER_FLUSH_INTERVAL секунд забирает шарды
+  (DELETE ... RETURNING) и применяет суммы одним UPDATE на объект;
+- apply_pending() добавляет к прочитанным объектам ещё не перенесённые
+  изменения, поэтому API сразу показывает свежие значения.
+SHARDED_COUNTERS = False возвращает прямые F()-обновления.
+
+CounterShard.object_id — UUID; объекты с целым ключом (PlatformStats)
+хранятся в шардах как UUID(int=pk).
+"""
+import random
+import uuid
+from collections import Counter, defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.models import F, Q, Sum, Value
+from django.db.models.functions import Greatest
+
+from .background import PeriodicFlusher
+from .models import CounterShard, Post
+
+# Сколько шардов забирать за одну транзакцию сброса
+FLUSH_BATCH_SIZE = 5000
+# Сколько объектов записывать одним INSERT в increment_many
+INCREMENT_BATCH_SIZE = 1000
+
+
+def sharded_enabled():
+    return getattr(settings, 'SHARDED_COUNTERS', True)
+
+
+def object_key(model, pk):
+    """object_id шарда для pk объекта"""
+    if isinstance(model._meta.pk, models.UUIDField):
+        return pk
+    return uuid.UUID(int=int(pk))
+
+
+def object_pk(model, object_id):
+    """pk объекта по object_id шарда"""
+    if isinstance(model._meta.pk, models.UUIDField):
+        return object_id
+    return uuid.UUID(str(object_id)).int
+
+
+def apply_deltas(model, pk, deltas):
+    """Прибавляет deltas к строке объекта, не опуская счётчики ниже 0"""
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return 0
+    return model.objects.filter(pk=pk).update(**{
+        field: Greatest(F(field) + delta, Value(0))
+        for field, delta in deltas.items()
+    })
+
+
+def increment(model, pk, **deltas):
+    """Изменяет счётчики объекта: increment(Post, post_id, likes_count=1)"""
+    increment_many(model, [pk], **deltas)
+
+
+def increment_many(model, pks, **deltas):
+    """
+    Одинаково изменяет счётчики многих объектов одним запросом:
+    increment_many(User, follower_ids, unread_notifications_count=1).
+    Повторяющийся pk получает изменение столько раз, сколько встречается.
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    times = Counter(pks)
+    if not deltas or not times:
+        return
+    if not sharded_enabled():
+        by_times = defaultdict(list)
+        for pk, n in times.items():
+            by_times[n].append(pk)
+        for n, group in by_times.items():
+            model.objects.filter(pk__in=group).update(**{
+                field: Greatest(F(field) + delta * n, Value(0))
+                for field, delta in deltas.items()
+            })
+        return
+
+    shard = random.randrange(getattr(settings, 'COUNTER_SHARDS', 8))
+    label = model._meta.label_lower
+    table = CounterShard._meta.db_table
+    # Одинаковый порядок строк — без взаимных блокировок параллельных вставок
+    items = sorted(((object_key(model, pk), n) for pk, n in times.items()), key=lambda item: str(item[0]))
+    with connection.cursor() as cursor:
+        for start in range(0, len(items), INCREMENT_BATCH_SIZE):
+            batch = items[start:start + INCREMENT_BATCH_SIZE]
+            values = ', '.join(['(%s, %s, %s, %s, %s)'] * (len(deltas) * len(batch)))
+            params = []
+            for pk, n in batch:
+                for field, delta in deltas.items():
+                    params.extend([label, pk, field, shard, delta * n])
+            cursor.execute(
+                f'INSERT INTO {table} (model, object_id, field, shard, delta) VALUES {values} '
+                f'ON CONFLICT (model, object_id, field, shard) '
+                f'DO UPDATE SET delta = {table}.delta + EXCLUDED.delta',
+                params,
+            )
+    flusher.ensure_started()
+
+
+def discard_pending(model, pk, *fields):
+    """
+    Отбрасывает незаписанные изменения полей объекта — вызывается в одной
+    транзакции с UPDATE, который записывает в эти поля точное значение
+    """
+    if not sharded_enabled():
+        return
+    CounterShard.objects.filter(
+        model=model._meta.label_lower, object_id=object_key(model, pk), field__in=fields
+    ).delete()
+
+
+def take_pending(model, pks, *fields):
+    """
+    Забирает (удаляет) незаписанные изменения полей объектов: {pk: {field: delta}}.
+    Вызывается в одной транзакции с записью точных значений этих полей.
+    """
+    if not sharded_enabled() or not pks:
+        return {}
+    table = CounterShard._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE model = %s AND object_id = ANY(%s) AND field = ANY(%s) '
+            f'RETURNING object_id, field, delta',
+            [model._meta.label_lower, [object_key(model, pk) for pk in pks], list(fields)],
+        )
+        rows = cursor.fetchall()
+    result = defaultdict(lambda: defaultdict(int))
+    for object_id, field, delta in rows:
+        result[object_pk(model, object_id)][field] += delta
+    return {pk: dict(deltas) for pk, deltas in result.items()}
+
+
+def flush():
+    """Переносит накопленные изменения в строки объектов; возвращает число объектов"""
+    table = CounterShard._meta.db_table
+    updated = 0
+    while True:
+        with transaction.atomic():
+            # SKIP LOCKED: шарды незавершённых транзакций заберём в следующий раз
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'DELETE FROM {table} WHERE id IN ('
+                    f'SELECT id FROM {table} ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED'
+                    f') RETURNING model, object_id, field, delta',
+                    [FLUSH_BATCH_SIZE],
+                )
+                rows = cursor.fetchall()
+
+            totals = defaultdict(lambda: defaultdict(int))
+            for label, object_id, field, delta in rows:
+                totals[(label, str(object_id))][field] += delta
+            # Одинаковый порядок обновлений — без взаимных блокировок
+            for (label, object_id), deltas in sorted(totals.items()):
+                model = apps.get_model(label)
+                apply_deltas(model, object_pk(model, object_id), deltas)
+
+        updated += len(totals)
+        if len(rows) < FLUSH_BATCH_SIZE:
+            return updated
+
+
+flusher = PeriodicFlusher(flush, 'COUNTER_FLUSH_INTERVAL', name='counter-flusher')
+
+
+def pending(objects):
+    """Незаписанные изменения объектов: {(model_label, pk): {field: delta}}"""
+    by_label = defaultdict(set)
+    for obj in objects:
+        by_label[obj._meta.label_lower].add(obj.pk)
+    return pending_by_label(by_label)
+
+
+def pending_for(model, pks):
+    """Незаписанные изменения объектов model по их pk: {pk: {field: delta}}"""
+    label = model._meta.label_lower
+    return {
+        pk: deltas
+        for (row_label, pk), deltas in pending_by_label({label: set(pks)}).items()
+    }
+
+
+def pending_by_label(by_label):
+    """Незаписанные изменения по {model_label: pks} одним запросом"""
+    if not sharded_enabled() or not by_label:
+        return {}
+
+    query = Q()
+    for label, pks in by_label.items():
+        model = apps.get_model(label)
+        query |= Q(model=label, object_id__in=[object_key(model, pk) for pk in pks])
+    rows = CounterShard.objects.filter(query).values(
+        'model', 'object_id', 'field'
+    ).annotate(total=Sum('delta')).order_by()
+
+    result = defaultdict(dict)
+    for row in rows:
+        pk = object_pk(apps.get_model(row['model']), row['object_id'])
+        result[(row['model'], pk)][row['field']] = row['total']
+    return result
+
+
+def apply_pending(objects):
+    """
+    Добавляет к счётчикам объектов незаписанные изменения (одним запросом).
+    Для постов учитываются и загруженные авторы.
+    """
+    if not sharded_enabled():
+        return
+    instances = {}
+    for obj in objects:
+        instances[id(obj)] = obj
+        if isinstance(obj, Post) and obj._state.fields_cache.get('author') is not None:
+            instances[id(obj.author)] = obj.author
+    if not instances:
+        return
+
+    deltas = pending(instances.values())
+    if not deltas:
+        return
+    for obj in instances.values():
+        for field, delta in deltas.get((obj._meta.label_lower, obj.pk), {}).items():
+            if field in obj.__dict__:
+                setattr(obj, field, max(obj.__dict__[field] + delta, 0))
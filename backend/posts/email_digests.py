@@ -0,0 +1,245 @@
+"""
+Email-дайджесты уведомлений
+
+Письмо на каждое уведомление добавило бы SMTP-запрос к каждому лайку,
+поэтому сигналы почту не трогают. Команда send_notification_digests
+раз в EMAIL_DIGEST_INTERVAL минут собирает непрочитанные уведомления
+получателя в одно письмо (templates/emails/notification.html):
+
+1. claim() — одним запросом находит получателей с новыми непрочитанными
+   уведомлениями после User.digest_sent_until и в одной транзакции создаёт
+   им EmailDigest (pending) за (since, until] и сдвигает digest_sent_until.
+   until отстаёт от текущего времени на SAFETY_LAG: уведомление из ещё
+   не закоммиченной транзакции (created_at — её начало) попадёт в следующий
+   дайджест, а не пропадёт. Пользователи блокируются через SKIP LOCKED —
+   воркеры не делят одного получателя, а повторный запуск не соберёт
+   те же уведомления снова.
+2. send_pending() — короткой транзакцией забирает пачку pending-дайджестов
+   (SKIP LOCKED) в статус sending, затем вне транзакции рендерит по одному
+   письму на получателя, отправляет через одно открытое SMTP-соединение
+   и записывает статус каждого дайджеста сразу после его отправки.
+
+Дайджест, упавший при отправке, возвращается в pending до MAX_ATTEMPTS
+попыток. Если процесс умрёт между отправкой и записью статуса, дайджест
+останется sending и через SENDING_TIMEOUT будет отправлен повторно —
+доставка «хотя бы раз», дубликат в этом случае возможен.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.utils import DNS_NAME
+from django.db import connection, transaction
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from . import notification_reads
+from .models import EmailDigest, Notification
+
+logger = logging.getLogger(__name__)
+
+# Получателей (писем) в одной пачке
+BATCH_SIZE = 100
+# После стольких неудачных попыток дайджест помечается failed
+MAX_ATTEMPTS = 5
+# Окно дайджеста заканчивается настолько раньше текущего момента
+SAFETY_LAG = timedelta(seconds=30)
+# Дайджест в sending дольше этого считается брошенным упавшим воркером
+SENDING_TIMEOUT = timedelta(minutes=15)
+
+
+def interval():
+    return timedelta(minutes=getattr(settings, 'EMAIL_DIGEST_INTERVAL', 60))
+
+
+def max_age():
+    return timedelta(hours=getattr(settings, 'EMAIL_DIGEST_MAX_AGE', 24))
+
+
+def max_items():
+    return getattr(settings, 'EMAIL_DIGEST_MAX_ITEMS', 20)
+
+
+def claim(limit=BATCH_SIZE, now=None):
+    """Создаёт дайджесты для получателей, которым пора писать; возвращает их число"""
+    from users.models import User
+
+    now = (now or timezone.now()) - SAFETY_LAG
+    oldest = now - max_age()
+    due = now - interval()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT n.recipient_id FROM {Notification._meta.db_table} n '
+            f'JOIN {User._meta.db_table} r ON r.id = n.recipient_id '
+            f'WHERE n.created_at > %s AND n.created_at <= %s '
+            f"AND r.email_digests AND r.is_active AND r.email <> '' "
+            f'AND (r.digest_sent_until IS NULL OR r.digest_sent_until <= %s) '
+            f'AND n.created_at > COALESCE(r.digest_sent_until, %s) '
+            f'AND {notification_reads.unread_sql("n")} '
+            f'GROUP BY n.recipient_id ORDER BY n.recipient_id LIMIT %s',
+            [oldest, now, due, oldest, limit],
+        )
+        user_ids = [row[0] for row in cursor.fetchall()]
+    if not user_ids:
+        return 0
+
+    with transaction.atomic():
+        # Повторная проверка под блокировкой: параллельный воркер мог успеть раньше
+        users = list(
+            User.objects.select_for_update(skip_locked=True)
+            .filter(Q(digest_sent_until__isnull=True) | Q(digest_sent_until__lte=due), pk__in=user_ids)
+            .values_list('pk', 'digest_sent_until')
+        )
+        EmailDigest.objects.bulk_create([
+            EmailDigest(user_id=pk, since=max(sent_until or oldest, oldest), until=now)
+            for pk, sent_until in users
+        ])
+        User.objects.filter(pk__in=[pk for pk, sent_until in users]).update(digest_sent_until=now)
+    return len(users)
+
+
+def load_items(digests):
+    """
+    Непрочитанные уведомления дайджестов одним запросом:
+    {digest.id: (первые max_items() уведомлений, всего)}
+    """
+    window = Q()
+    for digest in digests:
+        window |= Q(recipient_id=digest.user_id, created_at__gt=digest.since, created_at__lte=digest.until)
+    rows = (
+        Notification.objects.filter(window, notification_reads.unread_q())
+        .select_related('sender', 'post')
+        .annotate(
+            position=Window(RowNumber(), partition_by=[F('recipient_id')], order_by=F('created_at').desc()),
+            total=Window(Count('*'), partition_by=[F('recipient_id')]),
+        )
+        .filter(position__lte=max_items())
+        .order_by('recipient_id', 'position')
+    )
+    by_user = {}
+    for notification in rows:
+        items, total = by_user.get(notification.recipient_id, ([], notification.total))
+        items.append(notification)
+        by_user[notification.recipient_id] = (items, total)
+    return {digest.id: by_user.get(digest.user_id, ([], 0)) for digest in digests}
+
+
+def build_message(digest, items, total):
+    site_url = getattr(settings, 'FRONTEND_URL', 'http://localhost:3000')
+    context = {
+        'recipient': digest.user,
+        'items': items,
+        'total': total,
+        'more': total - len(items),
+        'site_url': site_url,
+    }
+    message = EmailMultiAlternatives(
+        subject=f'GitForum: {total} new notification{"s" if total != 1 else ""}',
+        body=render_to_string('emails/notification.txt', context),
+        to=[digest.user.email],
+        headers={'Message-ID': f'<digest.{digest.id}@{DNS_NAME}>'},
+    )
+    message.attach_alternative(render_to_string('emails/notification.html', context), 'text/html')
+    return message
+
+
+def _failed(digest, error):
+    digest.attempts += 1
+    digest.last_error = repr(error)
+    digest.status = 'failed' if digest.attempts >= MAX_ATTEMPTS else 'pending'
+
+
+def _claim_batch(limit):
+    """Короткой транзакцией переводит пачку дайджестов в sending; возвращает её"""
+    now = timezone.now()
+    with transaction.atomic():
+        digests = list(
+            EmailDigest.objects.select_for_update(skip_locked=True, of=('self',))
+            .select_related('user')
+            .filter(Q(status='pending') | Q(status='sending', claimed_at__lte=now - SENDING_TIMEOUT))
+            .order_by('created_at')[:limit]
+        )
+        EmailDigest.objects.filter(pk__in=[digest.pk for digest in digests]).update(
+            status='sending', claimed_at=now
+        )
+    for digest in digests:
+        digest.status = 'sending'
+        digest.claimed_at = now
+    return digests
+
+
+def _save(digest):
+    """Записывает результат отправки дайджеста (своим автокоммитом)"""
+    EmailDigest.objects.filter(pk=digest.pk, status='sending').update(
+        status=digest.status,
+        items_count=digest.items_count,
+        attempts=digest.attempts,
+        last_error=digest.last_error,
+        sent_at=digest.sent_at,
+    )
+
+
+def send_pending(limit=BATCH_SIZE, email_connection=None):
+    """
+    Отправляет пачку pending-дайджестов через одно SMTP-соединение;
+    возвращает обработанные дайджесты (с новыми статусами).
+    SMTP-запросы идут вне транзакции и без блокировок строк.
+    """
+    digests = _claim_batch(limit)
+    if not digests:
+        return []
+
+    try:
+        items = load_items(digests)
+        email_connection = email_connection or get_connection()
+        email_connection.open()
+        try:
+            for digest in digests:
+                notifications, total = items[digest.id]
+                if not total or not digest.user.email_digests or not digest.user.email:
+                    # Всё уже прочитано или рассылка отключена
+                    digest.status = 'empty'
+                    _save(digest)
+                    continue
+                try:
+                    email_connection.send_messages([build_message(digest, notifications, total)])
+                except Exception as error:
+                    logger.exception('Failed to send notification digest %s', digest.id)
+                    _failed(digest, error)
+                    _save(digest)
+                    # Соединение могло оборваться — следующие письма через новое
+                    email_connection.close()
+                    email_connection.open()
+                    continue
+                digest.status = 'sent'
+                digest.items_count = total
+                digest.sent_at = timezone.now()
+                _save(digest)
+        finally:
+            email_connection.close()
+    except Exception as error:
+        # Недоотправленные дайджесты — обратно в очередь, не дожидаясь SENDING_TIMEOUT
+        rest = [digest for digest in digests if digest.status == 'sending']
+        logger.exception('Email connection failed, postponing %d digests', len(rest))
+        for digest in rest:
+            _failed(digest, error)
+            _save(digest)
+    return digests
+
+
+def run(limit=BATCH_SIZE):
+    """
+    Собирает и отправляет все дайджесты, которым пора; возвращает число писем.
+    После пачки с ошибками останавливается — оставшиеся попытки в следующий запуск.
+    """
+    while claim(limit) == limit:
+        pass
+    sent = 0
+    while True:
+        digests = send_pending(limit)
+        sent += sum(digest.status == 'sent' for digest in digests)
+        if len(digests) < limit or any(digest.attempts for digest in digests if digest.status == 'pending'):
+            return sent
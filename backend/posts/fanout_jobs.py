@@ -0,0 +1,156 @@
+"""
+Фоновая рассылка нового поста подписчикам
+
+Раньше post_created_notify_followers прямо в запросе POST /api/posts/
+создавал по объекту Notification на каждого подписчика и делал один
+bulk_create: у автора со 100 тыс. подписчиков публикация занимала секунды.
+Теперь запрос только добавляет строку FanoutJob в той же транзакции,
+что и пост, а рассылка идёт в фоне пачками по CHUNK_SIZE подписчиков
+в порядке follower_id (индекс follow_following_follower_idx):
+
+    INSERT INTO posts_notification (...)
+    SELECT gen_random_uuid(), f.follower_id, ... FROM users_follow f
+    WHERE f.following_id = <автор> AND f.follower_id > <cursor>
+    ORDER BY f.follower_id LIMIT <CHUNK_SIZE> RETURNING recipient_id
+
+Каждая пачка — одна транзакция: блокировка задачи (SKIP LOCKED, поэтому
+несколько процессов делят задачи без двойной обработки), уведомления,
+записи лент, счётчики непрочитанных и новый cursor. После сбоя пачка
+откатывается целиком и задача продолжается с сохранённого cursor.
+
+Задачи выполняет фоновый поток процесса (FANOUT_JOBS_IN_PROCESS): он
+запускается после коммита первой задачи процесса и затем раз в
+FANOUT_JOB_INTERVAL секунд подбирает все оставшиеся, в том числе
+прерванные перезапуском. Отдельный воркер (или FANOUT_JOBS_IN_PROCESS=False):
+python manage.py run_fanout_jobs --loop
+"""
+import logging
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from . import counters
+from . import notification_stream
+from .background import PeriodicFlusher
+from .feed import fanout_post, is_fanout_author
+from .models import FanoutJob, Notification
+
+logger = logging.getLogger(__name__)
+
+# Подписчиков в одной пачке (одна транзакция)
+CHUNK_SIZE = 1000
+# Сколько пачек выполнять за один проход фонового потока
+CHUNKS_PER_RUN = 50
+# После стольких неудачных попыток задача помечается failed
+MAX_ATTEMPTS = 5
+
+
+def in_process_enabled():
+    return getattr(settings, 'FANOUT_JOBS_IN_PROCESS', True)
+
+
+def enqueue(post):
+    """
+    Ставит рассылку поста в очередь и будит воркер после коммита.
+    Вызывается из post_save поста: атомарность с самим постом обеспечивает
+    транзакция вызывающего кода (PostCreateSerializer.create)
+    """
+    job = FanoutJob.objects.create(post=post)
+    if in_process_enabled():
+        transaction.on_commit(worker.wake)
+    return job
+
+
+def _insert_notifications(post, cursor_id):
+    """Уведомления следующей пачке подписчиков; возвращает их id"""
+    from users.models import Follow
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {Notification._meta.db_table} (id, recipient_id, sender_id, notification_type, '
+            f'post_id, message, is_read, actors_count, recent_sender_ids, created_at) '
+            f"SELECT gen_random_uuid(), f.follower_id, %s, 'new_post', %s, %s, false, 1, '{{}}', now() "
+            f'FROM {Follow._meta.db_table} f '
+            f'WHERE f.following_id = %s AND (%s::uuid IS NULL OR f.follower_id > %s::uuid) '
+            f'ORDER BY f.follower_id LIMIT %s '
+            f'RETURNING recipient_id',
+            [
+                post.author_id, post.pk, f'Новый пост: {post.title[:50]}',
+                post.author_id, cursor_id, cursor_id, CHUNK_SIZE,
+            ],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def process_chunk(job_id):
+    """
+    Одна пачка задачи в своей транзакции.
+    Возвращает True, если у задачи остались подписчики.
+    """
+    from users.models import User
+
+    with transaction.atomic():
+        job = (
+            FanoutJob.objects.select_for_update(skip_locked=True, of=('self',))
+            .select_related('post__author')
+            .filter(pk=job_id, status='pending')
+            .first()
+        )
+        if job is None:
+            # Выполнена или её обрабатывает другой процесс
+            return False
+
+        post = job.post
+        follower_ids = _insert_notifications(post, job.cursor)
+        if follower_ids:
+            if is_fanout_author(post.author):
+                fanout_post(post, follower_ids)
+            counters.increment_many(User, follower_ids, unread_notifications_count=1)
+            notification_stream.publish(follower_ids)
+            # Порядок uuid в Python совпадает с порядком в PostgreSQL
+            job.cursor = max(follower_ids)
+            job.processed += len(follower_ids)
+        if len(follower_ids) < CHUNK_SIZE:
+            job.status = 'done'
+        job.save(update_fields=['cursor', 'processed', 'status', 'updated_at'])
+    return job.status == 'pending'
+
+
+def _record_failure(job_id, error):
+    job = FanoutJob.objects.filter(pk=job_id).first()
+    if job is None:
+        return
+    job.attempts += 1
+    job.last_error = repr(error)
+    if job.attempts >= MAX_ATTEMPTS:
+        job.status = 'failed'
+    job.save(update_fields=['attempts', 'last_error', 'status', 'updated_at'])
+
+
+def run_pending(max_chunks=CHUNKS_PER_RUN):
+    """Выполняет до max_chunks пачек задач в очереди (None — все); возвращает число пачек"""
+    done = 0
+    job_ids = FanoutJob.objects.filter(status='pending').order_by('created_at').values_list('id', flat=True)
+    for job_id in list(job_ids):
+        while max_chunks is None or done < max_chunks:
+            try:
+                more = process_chunk(job_id)
+            except Exception as error:
+                logger.exception('Fan-out job %s failed', job_id)
+                _record_failure(job_id, error)
+                break
+            done += 1
+            if not more:
+                break
+        if max_chunks is not None and done >= max_chunks:
+            break
+    return done
+
+
+def _run_in_process():
+    if run_pending() >= CHUNKS_PER_RUN:
+        # Остались пачки — следующий проход сразу, без ожидания интервала
+        worker.wake()
+
+
+worker = PeriodicFlusher(_run_in_process, 'FANOUT_JOB_INTERVAL', default_interval=10, name='fanout-worker')
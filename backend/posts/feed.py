@@ -0,0 +1,116 @@
+"""
+Лента подписок (fan-out on write)
+
+- При публикации поста его id раскладывается в TimelineEntry всех
+  подписчиков автора пачками фоновой задачи (posts/fanout_jobs.py).
+- Авторы с очень большим числом подписчиков (>= FEED_FANOUT_MAX_FOLLOWERS)
+  не раскладываются: их посты подмешиваются при чтении (merge at read).
+- Подписка добавляет в ленту последние посты автора, отписка их удаляет.
+"""
+from django.conf import settings
+
+from .models import Post, TimelineEntry
+from .pagination import PostKeysetPagination, keyset_filter
+
+FANOUT_BATCH_SIZE = 1000
+# Сколько последних постов автора добавлять в ленту при подписке
+BACKFILL_POSTS = 50
+
+
+def fanout_max_followers():
+    return getattr(settings, 'FEED_FANOUT_MAX_FOLLOWERS', 10000)
+
+
+def is_fanout_author(author):
+    return author.followers_count < fanout_max_followers()
+
+
+def fanout_post(post, follower_ids):
+    """
+    Раскладывает новый публичный пост в ленты подписчиков follower_ids
+    (пачка фоновой рассылки, см. posts/fanout_jobs.py)
+    """
+    TimelineEntry.objects.bulk_create([
+        TimelineEntry(
+            user_id=follower_id,
+            post_id=post.pk,
+            author_id=post.author_id,
+            created_at=post.created_at,
+        )
+        for follower_id in follower_ids
+    ], batch_size=FANOUT_BATCH_SIZE, ignore_conflicts=True)
+
+
+def backfill_follow(follower_id, author):
+    """После подписки добавляет в ленту последние посты автора"""
+    if not is_fanout_author(author):
+        return
+    posts = Post.objects.filter(
+        author=author,
+        is_public=True
+    ).order_by('-created_at').values_list('id', 'created_at')[:BACKFILL_POSTS]
+    TimelineEntry.objects.bulk_create([
+        TimelineEntry(user_id=follower_id, post_id=post_id, author_id=author.pk, created_at=created_at)
+        for post_id, created_at in posts
+    ], ignore_conflicts=True)
+
+
+def trim_unfollow(follower_id, author_id):
+    """После отписки убирает посты автора из ленты"""
+    TimelineEntry.objects.filter(user_id=follower_id, author_id=author_id).delete()
+
+
+def feed_page(user, after=None, limit=20):
+    """
+    Страница ленты по убыванию (created_at, id) после курсора after.
+    Лента из TimelineEntry сливается с постами авторов без fan-out.
+    """
+    from users.models import Follow
+
+    # Посты ленты могли стать приватными — дочитываем, пока страница не заполнится
+    posts = []
+    cursor = after
+    while len(posts) < limit:
+        timeline = TimelineEntry.objects.filter(user=user)
+        if cursor:
+            timeline = keyset_filter(timeline, 'created_at', cursor[0], cursor[1], id_field='post_id')
+        rows = list(
+            timeline.order_by('-created_at', '-post_id').values_list('created_at', 'post_id')[:limit]
+        )
+        if rows:
+            post_ids = [post_id for created_at, post_id in rows]
+            posts.extend(Post.objects.filter(id__in=post_ids, is_public=True).for_list())
+        if len(rows) < limit:
+            break
+        cursor = rows[-1]
+
+    # Авторы без fan-out: читаем их посты напрямую
+    merged_author_ids = list(Follow.objects.filter(
+        follower=user,
+        following__followers_count__gte=fanout_max_followers()
+    ).values_list('following_id', flat=True))
+    if merged_author_ids:
+        merged = Post.objects.filter(author_id__in=merged_author_ids, is_public=True)
+        if after:
+            merged = keyset_filter(merged, 'created_at', after[0], after[1])
+        posts.extend(merged.for_list().order_by('-created_at', '-id')[:limit])
+
+    unique = {post.pk: post for post in posts}
+    return sorted(unique.values(), key=lambda post: (post.created_at, post.pk), reverse=True)[:limit]
+
+
+class FeedPagination(PostKeysetPagination):
+    """Keyset пагинация ленты подписок по (-created_at, -id)"""
+    ordering = '-created_at'
+
+    def paginate_feed(self, request):
+        self.request = request
+        after = None
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded:
+            after = self.decode_cursor(encoded, Post)
+
+        results = feed_page(request.user, after=after, limit=self.page_size + 1)
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        return self.page
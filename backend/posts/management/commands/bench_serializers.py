@@ -0,0 +1,130 @@
+"""
+Бенчмарк сериализаторов: обычный путь DRF против быстрого пути
+
+Работает на синтетических объектах в памяти, база данных не нужна.
+Run with: python manage.py bench_serializers --sizes 1000 10000
+"""
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from posts.models import Post, Tag, Notification
+from posts.serializers import PostListSerializer, NotificationSerializer
+from users.models import User
+
+
+def make_users(count):
+    return [
+        User(
+            id=uuid.uuid4(),
+            username=f'user{i}',
+            display_name=f'User {i}' if i % 2 else '',
+            avatar=f'http://localhost:8000/media/avatars/{i}.png' if i % 3 else '',
+            is_verified=i % 5 == 0,
+        )
+        for i in range(count)
+    ]
+
+
+def make_posts(count, users, tags):
+    now = timezone.now()
+    posts = []
+    for i in range(count):
+        code = f'def handler_{i}(request):\n    return {{"id": {i}}}\n' * 20
+        post = Post(
+            id=uuid.uuid4(),
+            author=users[i % len(users)],
+            title=f'Snippet #{i}',
+            filename=f'snippet_{i}.py',
+            language='python',
+            description='Описание сниппета ' * (i % 4),
+            views=i * 7,
+            likes_count=i % 50,
+            comments_count=i % 13,
+            bookmarks_count=i % 9,
+            created_at=now - timedelta(minutes=i),
+        )
+        post.code = code
+        post.update_code_stats()
+        # Имитируем prefetch_related('tags')
+        post_tags = Tag.objects.all()
+        post_tags._result_cache = [tags[(i + j) % len(tags)] for j in range(i % 4)]
+        post_tags._prefetch_done = True
+        post._prefetched_objects_cache = {'tags': post_tags}
+        posts.append(post)
+    return posts
+
+
+def make_notifications(count, users, posts):
+    now = timezone.now()
+    return [
+        Notification(
+            id=uuid.uuid4(),
+            recipient=users[0],
+            sender=users[i % len(users)],
+            notification_type='like',
+            post=posts[i % len(posts)] if i % 4 else None,
+            message='',
+            is_read=i % 2 == 0,
+            created_at=now - timedelta(seconds=i),
+        )
+        for i in range(count)
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks hot read serializers: DRF field machinery vs the fast dict path'
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+        parser.add_argument('--repeat', type=int, default=3, help='Best of N runs')
+
+    def measure(self, serializer_class, objects, context, fast, repeat):
+        renderer = JSONRenderer()
+        best = None
+        output = None
+        with override_settings(FAST_SERIALIZATION=fast):
+            for _ in range(repeat):
+                started = time.perf_counter()
+                data = serializer_class(objects, many=True, context=context).data
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            output = renderer.render(data)
+        return best, output
+
+    def handle(self, *args, **options):
+        users = make_users(200)
+        tags = [
+            Tag(id=uuid.uuid4(), name=f'tag{i}', color='#3B82F6', usage_count=i)
+            for i in range(30)
+        ]
+        context = {'request': None, 'liked_post_ids': set(), 'bookmarked_post_ids': set()}
+
+        for size in options['sizes']:
+            posts = make_posts(size, users, tags)
+            notifications = make_notifications(size, users, posts)
+
+            for name, serializer_class, objects in [
+                ('PostListSerializer', PostListSerializer, posts),
+                ('NotificationSerializer', NotificationSerializer, notifications),
+            ]:
+                before, before_json = self.measure(serializer_class, objects, context, False, options['repeat'])
+                after, after_json = self.measure(serializer_class, objects, context, True, options['repeat'])
+
+                if before_json != after_json:
+                    raise CommandError(f'{name}: fast path JSON differs from DRF output')
+
+                self.stdout.write(
+                    f'{name:<24} n={size:<6} '
+                    f'drf={before / size * 1e6:8.1f} us/obj  '
+                    f'fast={after / size * 1e6:8.1f} us/obj  '
+                    f'x{before / after:.1f}  identical JSON'
+                )
+
+        self.stdout.write(self.style.SUCCESS('Done!'))
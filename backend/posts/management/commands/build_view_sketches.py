@@ -0,0 +1,48 @@
+"""
+Построение скетчей HyperLogLog уникальных просмотров из PostView
+(перед включением UNIQUE_VIEWS_MODE = 'hll')
+"""
+from django.core.management.base import BaseCommand
+from posts.models import Post
+from posts import unique_views
+
+
+class Command(BaseCommand):
+    help = 'Builds per-post and per-day HyperLogLog view sketches from existing PostView rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Number of posts per batch (default: 200)'
+        )
+        parser.add_argument(
+            '--missing-only',
+            action='store_true',
+            help='Only build sketches for posts that have none yet'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        queryset = Post.objects.order_by('pk')
+        if options['missing_only']:
+            queryset = queryset.filter(view_sketches__isnull=True)
+
+        self.stdout.write('Building view sketches...')
+        posts = 0
+        views = 0
+        last_pk = None
+        while True:
+            batch = queryset
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            post_ids = list(batch.values_list('pk', flat=True)[:batch_size])
+            if not post_ids:
+                break
+            views += unique_views.build_sketches(post_ids)
+            posts += len(post_ids)
+            last_pk = post_ids[-1]
+            self.stdout.write(f'  {posts} posts, {views} views')
+
+        self.stdout.write(self.style.SUCCESS(f'Done! Built sketches for {posts} posts from {views} views.'))
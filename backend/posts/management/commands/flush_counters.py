@@ -0,0 +1,14 @@
+"""
+Перенос накопленных изменений счётчиков (CounterShard) в строки постов и пользователей
+"""
+from django.core.management.base import BaseCommand
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Flushes pending sharded counter deltas into Post and User rows'
+
+    def handle(self, *args, **options):
+        self.stdout.write('Flushing counters...')
+        updated = counters.flush()
+        self.stdout.write(self.style.SUCCESS(f'Done! Updated {updated} objects.'))
@@ -0,0 +1,45 @@
+"""
+Помесячное секционирование Notification и PostView (см. posts/partitions.py)
+"""
+from django.core.management.base import BaseCommand
+
+from posts import partitions
+
+
+class Command(BaseCommand):
+    help = (
+        'Creates upcoming monthly partitions for partitioned Notification/PostView tables; '
+        'with --convert, rebuilds the given tables as range-partitioned by created_at month'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--convert',
+            nargs='+',
+            choices=list(partitions.MODELS),
+            default=[],
+            help='Tables to convert (copies the table under an exclusive lock; restart the app afterwards)'
+        )
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            help='Partitions to create ahead of the current month (default: PARTITION_MONTHS_AHEAD)'
+        )
+
+    def handle(self, *args, **options):
+        ahead = options['months_ahead']
+        for name in options['convert']:
+            model = partitions.MODELS[name]
+            if partitions.is_partitioned(model):
+                self.stdout.write(f'{name}: already partitioned.')
+                continue
+            self.stdout.write(f'{name}: converting to monthly partitions...')
+            partitions.convert(model, ahead)
+            self.stdout.write(self.style.SUCCESS(f'{name}: converted.'))
+
+        for name, model in partitions.MODELS.items():
+            if not partitions.is_partitioned(model):
+                continue
+            created = partitions.ensure_partitions(model, ahead)
+            self.stdout.write(f'{name}: {len(created)} new partitions {", ".join(created)}'.rstrip())
+        self.stdout.write(self.style.SUCCESS('Done!'))
@@ -0,0 +1,82 @@
+"""
+Удаление (или перенос в архив) уведомлений, просмотров и отправителей групп старше срока хранения
+(см. posts/retention.py)
+"""
+from django.core.management.base import BaseCommand
+
+from posts import partitions, retention
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes or archives Notification, PostView and NotificationActor rows older than their retention period '
+        'in small batches (dropping whole monthly partitions when the table is partitioned)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tables',
+            nargs='+',
+            choices=list(retention.POLICIES),
+            default=list(retention.POLICIES),
+            help='Which tables to prune (default: all)'
+        )
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='Retention in days for all selected tables (default: NOTIFICATION_RETENTION_DAYS / '
+                 'POST_VIEW_RETENTION_DAYS / notification group window + 1 day)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=retention.BATCH_SIZE,
+            help=f'Rows per delete transaction (default: {retention.BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0,
+            help='Seconds to sleep between batches (default: 0)'
+        )
+        parser.add_argument(
+            '--archive',
+            action='store_true',
+            help='Move rows into <table>_archive instead of deleting them'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only count expired rows'
+        )
+
+    def handle(self, *args, **options):
+        for name in options['tables']:
+            policy = retention.POLICIES[name]
+            cutoff = policy.cutoff(options['days'])
+            if cutoff is None:
+                self.stdout.write(f'{name}: retention disabled, skipped.')
+                continue
+
+            if options['dry_run']:
+                expired = retention.count_expired(policy, cutoff)
+                self.stdout.write(f'{name}: {expired} rows older than {cutoff:%Y-%m-%d %H:%M}.')
+                continue
+
+            if partitions.is_partitioned(policy.model):
+                created = partitions.ensure_partitions(policy.model)
+                if created:
+                    self.stdout.write(f'{name}: created partitions {", ".join(created)}.')
+
+            self.stdout.write(f'{name}: pruning rows older than {cutoff:%Y-%m-%d %H:%M}...')
+            dropped, total = retention.prune(
+                policy,
+                cutoff,
+                batch_size=options['batch_size'],
+                archive=options['archive'],
+                pause=options['pause'],
+            )
+            for partition, rows in dropped:
+                self.stdout.write(f'  dropped partition {partition} ({rows} rows)')
+            action = 'Archived' if options['archive'] else 'Deleted'
+            self.stdout.write(self.style.SUCCESS(f'{name}: {action} {total} rows.'))
@@ -0,0 +1,48 @@
+"""
+Заполнение search_vector для существующих постов
+"""
+from django.core.management.base import BaseCommand
+from posts.models import Post
+from posts.search import update_search_vector
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds full-text search vectors for posts in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of posts updated per UPDATE statement'
+        )
+        parser.add_argument(
+            '--missing-only',
+            action='store_true',
+            help='Only fill posts without a search vector'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        queryset = Post.objects.order_by('pk')
+        if options['missing_only']:
+            queryset = queryset.filter(search_vector__isnull=True)
+        
+        self.stdout.write('Rebuilding search vectors...')
+        
+        updated = 0
+        last_pk = None
+        # Идём по диапазонам pk, чтобы не держать длинных блокировок
+        while True:
+            batch = queryset
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            pks = list(batch.values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                break
+            
+            updated += update_search_vector(Post.objects.filter(pk__in=pks))
+            last_pk = pks[-1]
+            self.stdout.write(f'  {updated} posts processed')
+        
+        self.stdout.write(self.style.SUCCESS(f'Done! Updated {updated} posts.'))
@@ -1,49 +1,139 @@
 """
-Пересчёт счётчиков в постах
+Пересчёт денормализованных счётчиков постов, тегов, комментариев и пользователей
+(см. posts/reconcile.py)
 """
-from django.core.management.base import BaseCommand
-from django.db.models import Count
-from posts.models import Post
+import json
+import re
+import sys
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from posts.reconcile import get_targets, range_chunks, changed_ids, id_chunks, reconcile_target
+
+
+def parse_since(value):
+    """'2026-01-31', '2026-01-31T12:00' или относительное '6h' / '2d'"""
+    match = re.fullmatch(r'(\d+)([hd])', value)
+    if match:
+        amount, unit = int(match.group(1)), match.group(2)
+        return timezone.now() - (timedelta(hours=amount) if unit == 'h' else timedelta(days=amount))
+
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f'Invalid --since value: {value}')
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
 
 
 class Command(BaseCommand):
-    help = 'Recalculates likes_count, comments_count, bookmarks_count for all posts'
+    help = (
+        'Recalculates likes/comments/bookmarks/views of posts, tag usage_count, '
+        'comment replies_count and user follower/following/posts/unread notification counters '
+        'with set-based chunked queries'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--targets',
+            nargs='+',
+            choices=['posts', 'tags', 'comments', 'users'],
+            default=['posts', 'tags', 'comments', 'users'],
+            help='Which counters to reconcile (default: all)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=10000,
+            help='Number of objects per chunk (default: 10000)'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of chunks processed in parallel, each with its own connection'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report drift, do not update rows or discard pending counter shards'
+        )
+        parser.add_argument(
+            '--since',
+            help='Incremental mode: only objects with source rows since this moment '
+                 '(ISO date/datetime or relative like 6h, 2d)'
+        )
+        parser.add_argument(
+            '--report',
+            help='Write a JSON Lines drift report to this file ("-" for stdout)'
+        )
 
     def handle(self, *args, **options):
-        self.stdout.write('Recalculating post counts...')
-        
-        updated = 0
-        # Перебираем все посты и обновляем счётчики вручную
-        for post in Post.objects.all():
-            real_likes = post.likes.count()
-            real_comments = post.comments.count()
-            real_bookmarks = post.bookmarks.count()
-            real_views = post.post_views.count()
-            
-            changed = False
-            
-            if post.likes_count != real_likes:
-                self.stdout.write(f'  {post.filename}: likes {post.likes_count} -> {real_likes}')
-                post.likes_count = real_likes
-                changed = True
-                
-            if post.comments_count != real_comments:
-                self.stdout.write(f'  {post.filename}: comments {post.comments_count} -> {real_comments}')
-                post.comments_count = real_comments
-                changed = True
-                
-            if post.bookmarks_count != real_bookmarks:
-                self.stdout.write(f'  {post.filename}: bookmarks {post.bookmarks_count} -> {real_bookmarks}')
-                post.bookmarks_count = real_bookmarks
-                changed = True
-            
-            if post.views != real_views:
-                self.stdout.write(f'  {post.filename}: views {post.views} -> {real_views}')
-                post.views = real_views
-                changed = True
-                
-            if changed:
-                post.save(update_fields=['likes_count', 'comments_count', 'bookmarks_count', 'views'])
-                updated += 1
-        
-        self.stdout.write(self.style.SUCCESS(f'Done! Updated {updated} posts.'))
+        since = parse_since(options['since']) if options['since'] else None
+        dry_run = options['dry_run']
+        chunk_size = options['chunk_size']
+        workers = options['workers']
+
+        report = None
+        out = self.stdout
+        if options['report'] == '-':
+            # Отчёт в stdout — прогресс в stderr
+            report = sys.stdout
+            out = self.stderr
+        elif options['report']:
+            report = open(options['report'], 'w', encoding='utf-8')
+
+        targets = get_targets()
+        summary = {}
+        try:
+            for name in options['targets']:
+                target = targets[name]
+                if since:
+                    chunks = id_chunks(changed_ids(target, since), chunk_size)
+                else:
+                    chunks = range_chunks(target, chunk_size)
+
+                out.write(f'Reconciling {name}: {len(chunks)} chunks...')
+                fields = {}
+                drifted = set()
+                for done, drift in enumerate(reconcile_target(target, chunks, workers, dry_run), start=1):
+                    for object_id, field, old, new in drift:
+                        drifted.add(object_id)
+                        stats = fields.setdefault(field, {'rows': 0, 'delta': 0})
+                        stats['rows'] += 1
+                        stats['delta'] += new - old
+                        if report:
+                            report.write(json.dumps({
+                                'type': 'drift',
+                                'target': name,
+                                'id': str(object_id),
+                                'field': field,
+                                'old': old,
+                                'new': new,
+                            }) + '\n')
+                    out.write(f'  {name}: {done}/{len(chunks)} chunks, {len(drifted)} objects drifted')
+
+                summary[name] = {'chunks': len(chunks), 'objects': len(drifted), 'fields': fields}
+                for field, stats in fields.items():
+                    out.write(f'  {name}.{field}: {stats["rows"]} rows, net {stats["delta"]:+d}')
+
+            if report:
+                report.write(json.dumps({
+                    'type': 'summary',
+                    'dry_run': dry_run,
+                    'since': since.isoformat() if since else None,
+                    'targets': summary,
+                }) + '\n')
+        finally:
+            if report and report is not sys.stdout:
+                report.close()
+
+        total = sum(item['objects'] for item in summary.values())
+        action = 'Found drift in' if dry_run else 'Updated'
+        out.write(self.style.SUCCESS(f'Done! {action} {total} objects.'))
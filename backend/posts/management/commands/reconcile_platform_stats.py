@@ -0,0 +1,22 @@
+"""
+Сверка роллапа статистики платформы с исходными таблицами
+"""
+from django.core.management.base import BaseCommand
+from posts import stats
+
+
+class Command(BaseCommand):
+    help = 'Recomputes PlatformStats totals and recent daily buckets from source tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=2,
+            help='Number of recent local days to rebuild (default: today and yesterday)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Reconciling platform stats...')
+        stats.reconcile(days=options['days'])
+        self.stdout.write(self.style.SUCCESS('Done!'))
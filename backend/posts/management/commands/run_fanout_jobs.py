@@ -0,0 +1,49 @@
+"""
+Выполнение фоновых рассылок новых постов подписчикам (см. posts/fanout_jobs.py)
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from posts import fanout_jobs
+from posts.models import FanoutJob
+
+
+class Command(BaseCommand):
+    help = 'Runs pending new-post fan-out jobs (follower notifications and timelines) in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running as a worker, polling for new jobs'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=2,
+            help='Seconds between polls in --loop mode (default: 2)'
+        )
+        parser.add_argument(
+            '--retry-failed',
+            action='store_true',
+            help='Requeue failed jobs before running (they resume from their cursor)'
+        )
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            requeued = FanoutJob.objects.filter(status='failed').update(status='pending', attempts=0)
+            self.stdout.write(f'Requeued {requeued} failed jobs.')
+
+        if not options['loop']:
+            chunks = fanout_jobs.run_pending(max_chunks=None)
+            self.stdout.write(self.style.SUCCESS(f'Done! Processed {chunks} chunks.'))
+            return
+
+        self.stdout.write('Running fan-out worker...')
+        while True:
+            chunks = fanout_jobs.run_pending()
+            close_old_connections()
+            if chunks < fanout_jobs.CHUNKS_PER_RUN:
+                time.sleep(options['interval'])
@@ -0,0 +1,54 @@
+"""
+Отправка email-дайджестов непрочитанных уведомлений (см. posts/email_digests.py)
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from posts import email_digests
+from posts.models import EmailDigest
+
+
+class Command(BaseCommand):
+    help = 'Sends batched email digests of unread notifications over one SMTP connection per batch'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running as a worker, polling for due digests'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=60,
+            help='Seconds between polls in --loop mode (default: 60)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=email_digests.BATCH_SIZE,
+            help=f'Digests (emails) per SMTP connection (default: {email_digests.BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--retry-failed',
+            action='store_true',
+            help='Requeue failed digests before sending'
+        )
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            requeued = EmailDigest.objects.filter(status='failed').update(status='pending', attempts=0)
+            self.stdout.write(f'Requeued {requeued} failed digests.')
+
+        if not options['loop']:
+            sent = email_digests.run(options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Done! Sent {sent} digests.'))
+            return
+
+        self.stdout.write('Running email digest worker...')
+        while True:
+            email_digests.run(options['batch_size'])
+            close_old_connections()
+            time.sleep(options['interval'])
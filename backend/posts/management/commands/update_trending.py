@@ -0,0 +1,35 @@
+"""
+Пересчёт трендовых рейтингов (запускать периодически, например раз в 5 минут)
+"""
+from django.core.management.base import BaseCommand
+from posts import trending
+
+
+class Command(BaseCommand):
+    help = 'Re-decays trending scores and rebuilds ranked lists for today/week/month'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--period',
+            choices=list(trending.PERIODS),
+            action='append',
+            help='Rebuild only these periods (default: all)'
+        )
+        parser.add_argument(
+            '--fold',
+            action='store_true',
+            help='Only fold pending trending deltas into scores, without a rebuild'
+        )
+
+    def handle(self, *args, **options):
+        if options['fold']:
+            folded = trending.fold_deltas()
+            self.stdout.write(self.style.SUCCESS(f'Done! Folded {folded} events.'))
+            return
+
+        periods = options['period'] or list(trending.PERIODS)
+        for period in periods:
+            count = trending.rebuild_period(period)
+            self.stdout.write(f'  {period}: {count} posts ranked')
+        
+        self.stdout.write(self.style.SUCCESS('Done!'))
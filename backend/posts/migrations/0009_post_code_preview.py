@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:55
+
+from django.db import migrations, models
+from django.db.models import Case, F, Func, IntegerField, Value, When
+from django.db.models.functions import Left, Length, Replace
+
+
+def backfill_code_stats(apps, schema_editor):
+    """Заполняем превью, число строк и размер кода батчами по pk"""
+    Post = apps.get_model('posts', 'Post')
+    batch_size = 1000
+    last_pk = None
+    while True:
+        queryset = Post.objects.order_by('pk')
+        if last_pk is not None:
+            queryset = queryset.filter(pk__gt=last_pk)
+        pks = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            break
+        Post.objects.filter(pk__in=pks).update(
+            code_preview=Left('code', 500),
+            code_lines=Case(
+                When(code='', then=Value(0)),
+                default=Length('code') - Length(Replace('code', Value('\n'), Value(''))) + 1,
+            ),
+            code_size=Func(F('code'), function='octet_length', output_field=IntegerField()),
+        )
+        last_pk = pks[-1]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_post_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='code_lines',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Строк кода'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='code_preview',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Превью кода'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='code_size',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Размер кода (байт)'),
+        ),
+        migrations.RunPython(backfill_code_stats, migrations.RunPython.noop),
+    ]
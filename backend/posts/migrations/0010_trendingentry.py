@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 06:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_post_code_preview'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('today', 'Сегодня'), ('week', 'Неделя'), ('month', 'Месяц')], max_length=10, verbose_name='Период')),
+                ('scope', models.CharField(blank=True, default='', max_length=60, verbose_name='Область')),
+                ('score', models.FloatField(default=0, verbose_name='Рейтинг')),
+                ('decayed_at', models.DateTimeField(verbose_name='Рейтинг приведён к моменту')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trending_entries', to='posts.post', verbose_name='Пост')),
+            ],
+            options={
+                'verbose_name': 'Трендовый рейтинг',
+                'verbose_name_plural': 'Трендовые рейтинги',
+                'indexes': [models.Index(fields=['period', 'scope', '-score'], name='trending_rank_idx')],
+                'unique_together': {('period', 'scope', 'post')},
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_timelineentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlatformStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.CharField(max_length=10, unique=True, verbose_name='Период')),
+                ('likes', models.BigIntegerField(default=0, verbose_name='Лайки')),
+                ('comments', models.BigIntegerField(default=0, verbose_name='Комментарии')),
+                ('views', models.BigIntegerField(default=0, verbose_name='Просмотры')),
+                ('posts', models.BigIntegerField(default=0, verbose_name='Публичные посты')),
+                ('authors', models.BigIntegerField(default=0, verbose_name='Авторы')),
+            ],
+            options={
+                'verbose_name': 'Статистика платформы',
+                'verbose_name_plural': 'Статистика платформы',
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_platformstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostViewSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.CharField(max_length=10, verbose_name='Период')),
+                ('registers', models.BinaryField(verbose_name='Регистры HyperLogLog')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='view_sketches', to='posts.post', verbose_name='Пост')),
+            ],
+            options={
+                'verbose_name': 'Скетч просмотров',
+                'verbose_name_plural': 'Скетчи просмотров',
+                'unique_together': {('post', 'bucket')},
+            },
+        ),
+    ]
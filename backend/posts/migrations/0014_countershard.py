@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_postviewsketch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CounterShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=50, verbose_name='Модель')),
+                ('object_id', models.UUIDField(verbose_name='ID объекта')),
+                ('field', models.CharField(max_length=50, verbose_name='Поле счётчика')),
+                ('shard', models.PositiveSmallIntegerField(verbose_name='Шард')),
+                ('delta', models.BigIntegerField(default=0, verbose_name='Изменение')),
+            ],
+            options={
+                'verbose_name': 'Шард счётчика',
+                'verbose_name_plural': 'Шарды счётчиков',
+                'unique_together': {('model', 'object_id', 'field', 'shard')},
+            },
+        ),
+    ]
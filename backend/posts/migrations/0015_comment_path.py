@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# Заполняем root, path и depth существующих комментариев обходом дерева.
+# Сегмент: 13 hex-цифр времени создания в мкс + 4 hex-цифры id (как comment_path_segment)
+BACKFILL_COMMENT_PATHS = """
+WITH RECURSIVE tree AS (
+    SELECT id, id AS root_id, 0 AS depth,
+           (lpad(to_hex((extract(epoch from created_at) * 1000000)::bigint), 13, '0')
+            || substr(replace(id::text, '-', ''), 1, 4))::text AS path
+    FROM posts_comment
+    WHERE parent_id IS NULL
+    UNION ALL
+    SELECT c.id, tree.root_id, tree.depth + 1,
+           tree.path || lpad(to_hex((extract(epoch from c.created_at) * 1000000)::bigint), 13, '0')
+           || substr(replace(c.id::text, '-', ''), 1, 4)
+    FROM posts_comment c
+    JOIN tree ON c.parent_id = tree.id
+)
+UPDATE posts_comment c
+SET root_id = tree.root_id, depth = tree.depth, path = tree.path
+FROM tree
+WHERE c.id = tree.id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_countershard'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Глубина'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(db_collation='C', default='', editable=False, max_length=1000, verbose_name='Путь в дереве'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='root',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.comment', verbose_name='Корневой комментарий'),
+        ),
+        migrations.RunSQL(BACKFILL_COMMENT_PATHS, migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'path'], name='comment_post_path_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['root', 'path'], name='comment_root_path_idx'),
+        ),
+    ]
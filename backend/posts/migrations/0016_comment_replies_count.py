@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Начальные значения replies_count — одним UPDATE по сгруппированным ответам
+BACKFILL_REPLIES_COUNT = """
+UPDATE posts_comment c SET replies_count = r.n
+FROM (
+    SELECT parent_id, COUNT(*) AS n FROM posts_comment
+    WHERE parent_id IS NOT NULL GROUP BY parent_id
+) r
+WHERE c.id = r.parent_id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_comment_path'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='replies_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Ответы'),
+        ),
+        migrations.RunSQL(BACKFILL_REPLIES_COUNT, migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['parent', 'created_at', 'id'], name='comment_replies_keyset_idx'),
+        ),
+    ]
@@ -0,0 +1,99 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:05
+
+from django.db import migrations, models
+
+# Ключи зрителя (как posts/view_buffer.view_key): (суффикс, колонки, условие)
+VIEWER_KEYS = [
+    ('user_uniq', 'post_id, user_id', 'user_id IS NOT NULL'),
+    ('session_uniq', 'post_id, session_key', 'user_id IS NULL AND session_key IS NOT NULL'),
+    ('ip_uniq', 'post_id, ip_address', 'user_id IS NULL AND session_key IS NULL AND ip_address IS NOT NULL'),
+]
+
+CONSTRAINTS = [
+    models.UniqueConstraint(
+        fields=['post', 'user'],
+        condition=models.Q(user__isnull=False),
+        name='postview_user_uniq'
+    ),
+    models.UniqueConstraint(
+        fields=['post', 'session_key'],
+        condition=models.Q(user__isnull=True, session_key__isnull=False),
+        name='postview_session_uniq'
+    ),
+    models.UniqueConstraint(
+        fields=['post', 'ip_address'],
+        condition=models.Q(user__isnull=True, session_key__isnull=True, ip_address__isnull=False),
+        name='postview_ip_uniq'
+    ),
+]
+
+
+def partition_names(cursor, table):
+    """Секции таблицы; None — таблица не секционирована"""
+    cursor.execute('SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))', [table])
+    if not cursor.fetchone()[0]:
+        return None
+    cursor.execute(
+        'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+        'WHERE i.inhparent = to_regclass(%s)',
+        [table],
+    )
+    return [name for (name,) in cursor.fetchall()]
+
+
+def add_viewer_constraints(apps, schema_editor):
+    """
+    Удаляет повторные просмотры (оставляя первый) и добавляет уникальные ключи.
+    Секционированная таблица (posts/partitions.py) получает их в каждой секции.
+    """
+    PostView = apps.get_model('posts', 'PostView')
+    table = PostView._meta.db_table
+    with schema_editor.connection.cursor() as cursor:
+        for suffix, columns, condition in VIEWER_KEYS:
+            cursor.execute(
+                f'DELETE FROM {table} WHERE id IN ('
+                f'SELECT id FROM (SELECT id, row_number() OVER '
+                f'(PARTITION BY {columns} ORDER BY created_at, id) AS position '
+                f'FROM {table} WHERE {condition}) duplicates WHERE position > 1)'
+            )
+        partitions = partition_names(cursor, table)
+        if partitions is not None:
+            for name in partitions:
+                for suffix, columns, condition in VIEWER_KEYS:
+                    cursor.execute(
+                        f'CREATE UNIQUE INDEX IF NOT EXISTS {name}_{suffix} ON {name} ({columns}) WHERE {condition}'
+                    )
+            return
+    for constraint in CONSTRAINTS:
+        schema_editor.add_constraint(PostView, constraint)
+
+
+def remove_viewer_constraints(apps, schema_editor):
+    """Удаляет уникальные ключи, в том числе созданные в каждой секции"""
+    PostView = apps.get_model('posts', 'PostView')
+    with schema_editor.connection.cursor() as cursor:
+        partitions = partition_names(cursor, PostView._meta.db_table)
+    for name in partitions or []:
+        for suffix, columns, condition in VIEWER_KEYS:
+            schema_editor.execute(f'DROP INDEX IF EXISTS {name}_{suffix}')
+    for constraint in CONSTRAINTS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {constraint.name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_email_digests'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(add_viewer_constraints, remove_viewer_constraints),
+            ],
+            state_operations=[
+                migrations.AddConstraint(model_name='postview', constraint=constraint)
+                for constraint in CONSTRAINTS
+            ],
+        ),
+    ]
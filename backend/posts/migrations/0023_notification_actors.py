@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 08:03
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0022_comment_created_at_default'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationActor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('group_key', models.CharField(max_length=128, verbose_name='Ключ группы')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Добавлен')),
+                ('sender', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Отправитель')),
+            ],
+            options={
+                'verbose_name': 'Отправитель группы уведомлений',
+                'verbose_name_plural': 'Отправители групп уведомлений',
+                'indexes': [models.Index(fields=['created_at'], name='notificationactor_created_idx')],
+                'unique_together': {('group_key', 'sender')},
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 08:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0023_notification_actors'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='emaildigest',
+            name='emaildigest_pending_idx',
+        ),
+        migrations.AddField(
+            model_name='emaildigest',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Забран на отправку'),
+        ),
+        migrations.AlterField(
+            model_name='emaildigest',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Ожидает отправки'), ('sending', 'Отправляется'), ('sent', 'Отправлен'), ('empty', 'Нечего отправлять'), ('failed', 'Ошибка')], default='pending', max_length=20, verbose_name='Статус'),
+        ),
+        migrations.AddIndex(
+            model_name='emaildigest',
+            index=models.Index(condition=models.Q(('status__in', ['pending', 'sending'])), fields=['created_at'], name='emaildigest_pending_idx'),
+        ),
+    ]
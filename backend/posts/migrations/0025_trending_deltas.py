@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 08:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0024_emaildigest_sending'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingDelta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('today', 'Сегодня'), ('week', 'Неделя'), ('month', 'Месяц')], max_length=10, verbose_name='Период')),
+                ('weight', models.FloatField(verbose_name='Вес')),
+                ('occurred_at', models.DateTimeField(verbose_name='Момент события')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trending_deltas', to='posts.post', verbose_name='Пост')),
+            ],
+            options={
+                'verbose_name': 'Изменение трендового рейтинга',
+                'verbose_name_plural': 'Изменения трендовых рейтингов',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 08:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0025_trending_deltas'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('like', 'Лайк'), ('comment', 'Комментарий'), ('follow', 'Подписка'), ('reply', 'Ответ'), ('new_post', 'Новый пост')], max_length=20, verbose_name='Тип уведомления'),
+        ),
+    ]
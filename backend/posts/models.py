@@ -2,8 +2,12 @@
 Модели для постов (сниппетов кода)
 """
 import uuid
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.conf import settings
+from django.utils import timezone
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 
 
 class Tag(models.Model):
@@ -37,6 +41,22 @@ class Tag(models.Model):
         return self.name
 
 
+# Длина превью кода в списках постов
+CODE_PREVIEW_LENGTH = 500
+# Поля, которые вычисляются из code при сохранении
+CODE_STATS_FIELDS = ('code_preview', 'code_lines', 'code_size')
+
+
+class PostQuerySet(models.QuerySet):
+    """QuerySet постов"""
+    
+    def for_list(self):
+        """Для списков: без полного кода и поискового вектора, с автором и тегами"""
+        return self.select_related('author').prefetch_related('tags').defer(
+            'code', 'search_vector'
+        )
+
+
 class Post(models.Model):
     """Пост с кодом (code snippet)"""
     
@@ -93,6 +113,23 @@ class Post(models.Model):
     code = models.TextField(
         verbose_name='Код'
     )
+    # Денормализация кода для списков (чтобы не читать весь code)
+    code_preview = models.TextField(
+        blank=True,
+        default='',
+        editable=False,
+        verbose_name='Превью кода'
+    )
+    code_lines = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Строк кода'
+    )
+    code_size = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Размер кода (байт)'
+    )
     description = models.TextField(
         blank=True,
         max_length=2000,
@@ -133,6 +170,13 @@ class Post(models.Model):
         verbose_name='Форки'
     )
     
+    # Полнотекстовый поиск (обновляется в posts/search.py)
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор'
+    )
+    
     # Метаданные
     created_at = models.DateTimeField(
         auto_now_add=True,
@@ -147,20 +191,45 @@ class Post(models.Model):
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
         ordering = ['-created_at']
+        indexes = [
+            GinIndex(fields=['search_vector'], name='post_search_vector_gin'),
+            # Поиск подстрок и регулярок в коде (pg_trgm)
+            GinIndex(fields=['code'], name='post_code_trgm_gin', opclasses=['gin_trgm_ops']),
+            # Keyset пагинация: (поле сортировки, id)
+            models.Index(fields=['-created_at', '-id'], name='post_created_keyset_idx'),
+            models.Index(fields=['-likes_count', '-id'], name='post_likes_keyset_idx'),
+            models.Index(fields=['-views', '-id'], name='post_views_keyset_idx'),
+            models.Index(fields=['-comments_count', '-id'], name='post_comments_keyset_idx'),
+        ]
+    
+    objects = PostQuerySet.as_manager()
     
     def __str__(self):
         return f'{self.filename} by {self.author.username}'
     
+    def update_code_stats(self):
+        """Пересчитывает превью, число строк и размер кода"""
+        code = self.code or ''
+        self.code_preview = code[:CODE_PREVIEW_LENGTH]
+        self.code_lines = code.count('\n') + 1 if code else 0
+        self.code_size = len(code.encode('utf-8'))
+    
     def save(self, *args, **kwargs):
-        """Обновляем счётчик постов у автора"""
-        is_new = self.pk is None
+        """Обновляем превью кода и счётчик постов у автора"""
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self.update_code_stats()
+        elif 'code' in update_fields:
+            self.update_code_stats()
+            kwargs['update_fields'] = {*update_fields, *CODE_STATS_FIELDS}
+        
+        is_new = self._state.adding
         super().save(*args, **kwargs)
         
         if is_new:
             from users.models import User
-            User.objects.filter(pk=self.author_id).update(
-                posts_count=models.F('posts_count') + 1
-            )
+            from .counters import increment
+            increment(User, self.author_id, posts_count=1)
 
 
 class Like(models.Model):
@@ -231,6 +300,15 @@ class Bookmark(models.Model):
         return f'{self.user.username} -> {self.post.filename}'
 
 
+# Сегмент пути комментария: 13 hex-цифр времени в мкс + 4 hex-цифры id
+COMMENT_PATH_SEGMENT_LENGTH = 17
+
+
+def comment_path_segment(created_at, comment_id):
+    micros = int(created_at.timestamp() * 1_000_000)
+    return f'{micros:013x}{comment_id.hex[:4]}'
+
+
 class Comment(models.Model):
     """Комментарий к посту"""
     id = models.UUIDField(
@@ -262,22 +340,74 @@ class Comment(models.Model):
         max_length=2000,
         verbose_name='Содержание'
     )
+    # Время известно до INSERT — из него строится сегмент path (как в бэкфилле 0015)
     created_at = models.DateTimeField(
-        auto_now_add=True,
+        default=timezone.now,
+        editable=False,
         verbose_name='Дата'
     )
     updated_at = models.DateTimeField(
         auto_now=True,
         verbose_name='Обновлён'
     )
+    # Корневой комментарий ветки (у корня — он сам)
+    root = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Корневой комментарий'
+    )
+    # Материализованный путь: сегменты фиксированной длины от корня до комментария.
+    # Сортировка по path — обход дерева в глубину, ответы по времени;
+    # поддерево — диапазон path LIKE '<path>%' по индексу (collation "C").
+    # Глубина ограничена comment_tree.MAX_NESTING, чтобы путь помещался в max_length
+    path = models.CharField(
+        max_length=1000,
+        default='',
+        db_collation='C',
+        editable=False,
+        verbose_name='Путь в дереве'
+    )
+    depth = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Глубина'
+    )
+    # Число прямых ответов (обновляется сигналами через posts/counters.py)
+    replies_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Ответы'
+    )
     
     class Meta:
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['post', 'path'], name='comment_post_path_idx'),
+            models.Index(fields=['root', 'path'], name='comment_root_path_idx'),
+            models.Index(fields=['parent', 'created_at', 'id'], name='comment_replies_keyset_idx'),
+        ]
     
     def __str__(self):
         return f'{self.author.username}: {self.content[:50]}...'
+    
+    def save(self, *args, **kwargs):
+        """Новому комментарию заполняем root, path и depth"""
+        if self._state.adding and not self.path:
+            segment = comment_path_segment(self.created_at, self.pk)
+            if self.parent_id:
+                parent = self.parent
+                self.root_id = parent.root_id or parent.pk
+                self.path = parent.path + segment
+                self.depth = parent.depth + 1
+            else:
+                self.root_id = self.pk
+                self.path = segment
+                self.depth = 0
+        super().save(*args, **kwargs)
 
 
 class PostRevision(models.Model):
@@ -380,6 +510,29 @@ class PostView(models.Model):
         verbose_name = 'Просмотр поста'
         verbose_name_plural = 'Просмотры постов'
         ordering = ['-created_at']
+        indexes = [
+            # Срок хранения (posts/retention.py) и просмотры за день
+            models.Index(fields=['created_at'], name='postview_created_idx'),
+        ]
+        constraints = [
+            # Один просмотр на зрителя — ключ posts/view_buffer.view_key
+            # (в секционированной схеме — в каждой секции, см. posts/partitions.py)
+            models.UniqueConstraint(
+                fields=['post', 'user'],
+                condition=models.Q(user__isnull=False),
+                name='postview_user_uniq'
+            ),
+            models.UniqueConstraint(
+                fields=['post', 'session_key'],
+                condition=models.Q(user__isnull=True, session_key__isnull=False),
+                name='postview_session_uniq'
+            ),
+            models.UniqueConstraint(
+                fields=['post', 'ip_address'],
+                condition=models.Q(user__isnull=True, session_key__isnull=True, ip_address__isnull=False),
+                name='postview_ip_uniq'
+            ),
+        ]
     
     def __str__(self):
         return f'{self.post.filename} - {self.user or self.ip_address}'
@@ -391,22 +544,256 @@ class PostView(models.Model):
         if user and user.is_authenticated:
             if cls.objects.filter(post=post, user=user).exists():
                 return False  # Уже просмотрен
-            cls.objects.create(post=post, user=user)
+            fields = {'user': user}
         elif session_key:
             if cls.objects.filter(post=post, session_key=session_key).exists():
                 return False
-            cls.objects.create(post=post, session_key=session_key, ip_address=ip_address)
+            fields = {'session_key': session_key, 'ip_address': ip_address}
         elif ip_address:
             if cls.objects.filter(post=post, ip_address=ip_address).exists():
                 return False
-            cls.objects.create(post=post, ip_address=ip_address)
+            fields = {'ip_address': ip_address}
         else:
             return False
         
+        try:
+            with transaction.atomic():
+                cls.objects.create(post=post, **fields)
+        except IntegrityError:
+            return False  # Параллельный запрос успел раньше
+        
         # Сигнал post_save увеличит views автоматически
         return True
 
 
+class PostViewSketch(models.Model):
+    """
+    HyperLogLog уникальных зрителей поста (режим UNIQUE_VIEWS_MODE = 'hll',
+    см. posts/unique_views.py).
+    bucket: 'total' — за всё время, 'YYYY-MM-DD' — за день (по TIME_ZONE)
+    """
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='view_sketches',
+        verbose_name='Пост'
+    )
+    bucket = models.CharField(
+        max_length=10,
+        verbose_name='Период'
+    )
+    registers = models.BinaryField(
+        verbose_name='Регистры HyperLogLog'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата обновления'
+    )
+    
+    class Meta:
+        verbose_name = 'Скетч просмотров'
+        verbose_name_plural = 'Скетчи просмотров'
+        unique_together = ['post', 'bucket']
+    
+    def __str__(self):
+        return f'{self.post_id} - {self.bucket}'
+
+
+class TimelineEntry(models.Model):
+    """
+    Лента подписок пользователя (fan-out on write, см. posts/feed.py).
+    created_at копирует дату поста для keyset пагинации.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Владелец ленты'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост'
+    )
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор поста'
+    )
+    created_at = models.DateTimeField(
+        verbose_name='Дата поста'
+    )
+    
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        unique_together = ['user', 'post']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-post'], name='timeline_keyset_idx'),
+            models.Index(fields=['user', 'author'], name='timeline_user_author_idx'),
+        ]
+    
+    def __str__(self):
+        return f'{self.user_id}: {self.post_id}'
+
+
+class TrendingEntry(models.Model):
+    """
+    Предрассчитанный трендовый рейтинг поста (см. posts/trending.py)
+    scope: '' — глобально, 'lang:<язык>' — по языку, 'tag:<тег>' — по тегу
+    """
+    
+    PERIOD_CHOICES = [
+        ('today', 'Сегодня'),
+        ('week', 'Неделя'),
+        ('month', 'Месяц'),
+    ]
+    
+    period = models.CharField(
+        max_length=10,
+        choices=PERIOD_CHOICES,
+        verbose_name='Период'
+    )
+    scope = models.CharField(
+        max_length=60,
+        blank=True,
+        default='',
+        verbose_name='Область'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='trending_entries',
+        verbose_name='Пост'
+    )
+    score = models.FloatField(
+        default=0,
+        verbose_name='Рейтинг'
+    )
+    decayed_at = models.DateTimeField(
+        verbose_name='Рейтинг приведён к моменту'
+    )
+    
+    class Meta:
+        verbose_name = 'Трендовый рейтинг'
+        verbose_name_plural = 'Трендовые рейтинги'
+        unique_together = ['period', 'scope', 'post']
+        indexes = [
+            models.Index(fields=['period', 'scope', '-score'], name='trending_rank_idx'),
+        ]
+    
+    def __str__(self):
+        return f'{self.period}/{self.scope or "*"}: {self.post_id} ({self.score:.2f})'
+
+
+class TrendingDelta(models.Model):
+    """
+    Событие, ещё не перенесённое в TrendingEntry (см. posts/trending.py).
+    Строки только добавляются, поэтому лайк не ждёт блокировку строк рейтинга;
+    вес затухает с occurred_at и переносится в рейтинги фоновым fold_deltas().
+    """
+    period = models.CharField(
+        max_length=10,
+        choices=TrendingEntry.PERIOD_CHOICES,
+        verbose_name='Период'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='trending_deltas',
+        verbose_name='Пост'
+    )
+    weight = models.FloatField(
+        verbose_name='Вес'
+    )
+    occurred_at = models.DateTimeField(
+        verbose_name='Момент события'
+    )
+    
+    class Meta:
+        verbose_name = 'Изменение трендового рейтинга'
+        verbose_name_plural = 'Изменения трендовых рейтингов'
+    
+    def __str__(self):
+        return f'{self.period}: {self.post_id} {self.weight:+g}'
+
+
+class PlatformStats(models.Model):
+    """
+    Счётчики статистики платформы (см. posts/stats.py)
+    bucket: 'total' — итоги, 'YYYY-MM-DD' — за день (по TIME_ZONE)
+    """
+    bucket = models.CharField(
+        max_length=10,
+        unique=True,
+        verbose_name='Период'
+    )
+    likes = models.BigIntegerField(
+        default=0,
+        verbose_name='Лайки'
+    )
+    comments = models.BigIntegerField(
+        default=0,
+        verbose_name='Комментарии'
+    )
+    views = models.BigIntegerField(
+        default=0,
+        verbose_name='Просмотры'
+    )
+    posts = models.BigIntegerField(
+        default=0,
+        verbose_name='Публичные посты'
+    )
+    authors = models.BigIntegerField(
+        default=0,
+        verbose_name='Авторы'
+    )
+    
+    class Meta:
+        verbose_name = 'Статистика платформы'
+        verbose_name_plural = 'Статистика платформы'
+    
+    def __str__(self):
+        return self.bucket
+
+
+class CounterShard(models.Model):
+    """
+    Накопленное изменение счётчика (likes_count, followers_count, ...)
+    ещё не перенесённое в строку объекта (см. posts/counters.py).
+    Запись идёт в случайный шард, чтобы параллельные запросы
+    не ждали блокировку одной строки.
+    """
+    model = models.CharField(
+        max_length=50,
+        verbose_name='Модель'
+    )
+    object_id = models.UUIDField(
+        verbose_name='ID объекта'
+    )
+    field = models.CharField(
+        max_length=50,
+        verbose_name='Поле счётчика'
+    )
+    shard = models.PositiveSmallIntegerField(
+        verbose_name='Шард'
+    )
+    delta = models.BigIntegerField(
+        default=0,
+        verbose_name='Изменение'
+    )
+    
+    class Meta:
+        verbose_name = 'Шард счётчика'
+        verbose_name_plural = 'Шарды счётчиков'
+        unique_together = ['model', 'object_id', 'field', 'shard']
+    
+    def __str__(self):
+        return f'{self.model}:{self.object_id}.{self.field}[{self.shard}] {self.delta:+d}'
+
+
 class Notification(models.Model):
     """Уведомление пользователя"""
     
@@ -461,10 +848,32 @@ class Notification(models.Model):
         blank=True,
         verbose_name='Сообщение'
     )
+    # Прочитано по одному; всё, что не новее User.notifications_read_at,
+    # тоже прочитано (posts/notification_reads.py)
     is_read = models.BooleanField(
         default=False,
         verbose_name='Прочитано'
     )
+    # Группировка (posts/notification_groups.py): одна строка на
+    # (получатель, тип, пост, окно времени); sender — последний из отправителей
+    group_key = models.CharField(
+        max_length=128,
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Ключ группы'
+    )
+    actors_count = models.PositiveIntegerField(
+        default=1,
+        verbose_name='Число отправителей'
+    )
+    recent_sender_ids = ArrayField(
+        models.UUIDField(),
+        default=list,
+        blank=True,
+        verbose_name='Последние отправители'
+    )
+    # Для сгруппированных — время последнего события группы
     created_at = models.DateTimeField(
         auto_now_add=True,
         verbose_name='Создано'
@@ -474,6 +883,206 @@ class Notification(models.Model):
         verbose_name = 'Уведомление'
         verbose_name_plural = 'Уведомления'
         ordering = ['-created_at']
+        indexes = [
+            # Список уведомлений пользователя
+            models.Index(fields=['recipient', '-created_at'], name='notification_recipient_idx'),
+            # Срок хранения (posts/retention.py)
+            models.Index(fields=['created_at'], name='notification_created_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['group_key'],
+                condition=models.Q(group_key__isnull=False),
+                name='notification_group_key_uniq'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.sender.username} -> {self.recipient.username}: {self.notification_type}"
+
+
+class NotificationActor(models.Model):
+    """
+    Отправители группы уведомлений (posts/notification_groups.py):
+    actors_count растёт, только если отправитель добавлен в группу впервые.
+    Строки старше окна группировки удаляет prune_old_rows (posts/retention.py)
+    """
+    group_key = models.CharField(
+        max_length=128,
+        verbose_name='Ключ группы'
+    )
+    sender = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Отправитель'
+    )
+    created_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Добавлен'
+    )
+    
+    class Meta:
+        verbose_name = 'Отправитель группы уведомлений'
+        verbose_name_plural = 'Отправители групп уведомлений'
+        unique_together = ['group_key', 'sender']
+        indexes = [
+            models.Index(fields=['created_at'], name='notificationactor_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f'{self.group_key}: {self.sender_id}'
+
+
+class FanoutJob(models.Model):
+    """
+    Фоновая рассылка нового поста подписчикам автора (см. posts/fanout_jobs.py):
+    уведомления и ленты пачками по возрастанию follower_id.
+    cursor — последний обработанный подписчик, с него задача продолжается после сбоя.
+    """
+    
+    STATUS_CHOICES = [
+        ('pending', 'В очереди'),
+        ('done', 'Выполнено'),
+        ('failed', 'Ошибка'),
+    ]
+    
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='fanout_jobs',
+        verbose_name='Пост'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='pending',
+        verbose_name='Статус'
+    )
+    cursor = models.UUIDField(
+        null=True,
+        blank=True,
+        verbose_name='Последний обработанный подписчик'
+    )
+    processed = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Обработано подписчиков'
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Неудачных попыток'
+    )
+    last_error = models.TextField(
+        blank=True,
+        verbose_name='Последняя ошибка'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Создано'
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Обновлено'
+    )
+    
+    class Meta:
+        verbose_name = 'Задача рассылки'
+        verbose_name_plural = 'Задачи рассылки'
+        ordering = ['created_at']
+        indexes = [
+            models.Index(
+                fields=['created_at'],
+                condition=models.Q(status='pending'),
+                name='fanoutjob_pending_idx'
+            ),
+        ]
+    
+    def __str__(self):
+        return f'{self.post_id}: {self.status} ({self.processed})'
+
+
+class EmailDigest(models.Model):
+    """
+    Email-дайджест уведомлений получателя (см. posts/email_digests.py):
+    уведомления, созданные в (since, until]. Строка создаётся до отправки,
+    поэтому после сбоя письмо досылается, а не собирается заново.
+    sending — дайджест забран воркером в claimed_at и отправляется.
+    """
+    
+    STATUS_CHOICES = [
+        ('pending', 'Ожидает отправки'),
+        ('sending', 'Отправляется'),
+        ('sent', 'Отправлен'),
+        ('empty', 'Нечего отправлять'),
+        ('failed', 'Ошибка'),
+    ]
+    
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='email_digests_sent',
+        verbose_name='Получатель'
+    )
+    since = models.DateTimeField(
+        verbose_name='Уведомления после'
+    )
+    until = models.DateTimeField(
+        verbose_name='Уведомления до'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='pending',
+        verbose_name='Статус'
+    )
+    items_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Уведомлений в письме'
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Неудачных попыток'
+    )
+    last_error = models.TextField(
+        blank=True,
+        verbose_name='Последняя ошибка'
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Создано'
+    )
+    claimed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Забран на отправку'
+    )
+    sent_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Отправлено'
+    )
+    
+    class Meta:
+        verbose_name = 'Email-дайджест'
+        verbose_name_plural = 'Email-дайджесты'
+        ordering = ['created_at']
+        indexes = [
+            models.Index(
+                fields=['created_at'],
+                condition=models.Q(status__in=['pending', 'sending']),
+                name='emaildigest_pending_idx'
+            ),
+        ]
+    
+    def __str__(self):
+        return f'{self.user_id}: {self.status} ({self.items_count})'
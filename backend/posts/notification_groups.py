@@ -0,0 +1,136 @@
+"""
+Группировка уведомлений
+
+Раньше каждый лайк создавал отдельную строку Notification: лайк → снятие →
+лайк давали новые строки, а автор популярного поста получал тысячи
+уведомлений «лайкнул ваш пост». Теперь уведомления типов GROUPED_TYPES
+собираются в одну строку на (получатель, тип, пост, окно в
+NOTIFICATION_GROUP_WINDOW часов): sender и created_at — последнее событие,
+recent_sender_ids — последние RECENT_SENDERS отправителей, actors_count —
+число разных отправителей группы («alice и ещё 41»). Все отправители
+группы хранятся в NotificationActor (group_key, sender).
+
+Строка пишется одним запросом без чтения в Python: вставка отправителя в
+NotificationActor (ON CONFLICT DO NOTHING) и INSERT ... ON CONFLICT (group_key)
+DO UPDATE уведомления, где actors_count растёт, только если отправитель
+вставлен впервые. Повтор от отправителя из recent_sender_ids ничего не
+меняет, вытесненный из последних — поднимает группу, но не actors_count.
+Счётчик непрочитанных растёт, только если строка создана или была
+прочитана (флагом или отметкой получателя, posts/notification_reads.py)
+и снова стала непрочитанной.
+"""
+import logging
+import uuid
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from . import counters
+from . import notification_stream
+from . import partitions
+from .models import Notification, NotificationActor
+
+logger = logging.getLogger(__name__)
+
+# Какие уведомления группируются
+GROUPED_TYPES = {'like', 'follow'}
+# Сколько последних отправителей хранить в группе
+RECENT_SENDERS = 3
+
+
+def grouping_enabled():
+    return getattr(settings, 'NOTIFICATION_GROUPING', True)
+
+
+def group_key(recipient_id, notification_type, post_id, when):
+    """Ключ группы: получатель, тип, пост и номер окна времени"""
+    window = getattr(settings, 'NOTIFICATION_GROUP_WINDOW', 24) * 3600
+    bucket = int(when.timestamp() // window)
+    return f'{recipient_id}:{notification_type}:{post_id or "-"}:{bucket}'
+
+
+def notify(recipient_id, sender_id, notification_type, post_id=None):
+    """
+    Уведомление типа из GROUPED_TYPES: добавляет отправителя в группу окна.
+    С NOTIFICATION_GROUPING = False — отдельная строка, как раньше.
+    """
+    now = timezone.now()
+    target = None
+    if notification_type in GROUPED_TYPES and grouping_enabled():
+        # В секционированной схеме уникальный индекс group_key есть только у секций
+        target = partitions.insert_table(Notification, now)
+        if target is None:
+            logger.warning('No notification partition for %s, storing ungrouped notification', now)
+    if target is None:
+        Notification.objects.create(
+            recipient_id=recipient_id,
+            sender_id=sender_id,
+            notification_type=notification_type,
+            post_id=post_id
+        )
+        return
+
+    from users.models import User
+
+    key = group_key(recipient_id, notification_type, post_id, now)
+    table = Notification._meta.db_table
+    users_table = User._meta.db_table
+    actors_table = NotificationActor._meta.db_table
+    with connection.cursor() as cursor:
+        # previous читается (и блокируется) до вставки: INSERT берёт строки из него.
+        # Иначе FOR UPDATE пропустил бы строку, уже изменённую этим же оператором.
+        # Группа обновляется, только если отправитель в ней новый (строка actor вставлена):
+        # повторный лайк отправителя, выпавшего из recent_sender_ids, не новая активность
+        # и не должен делать прочитанную группу снова непрочитанной
+        cursor.execute(
+            f'WITH previous AS ('
+            f'SELECT p.id, (p.is_read OR p.created_at <= u.notifications_read_at) IS TRUE AS is_read '
+            f'FROM {table} p JOIN {users_table} u ON u.id = p.recipient_id '
+            f'WHERE p.group_key = %s FOR UPDATE OF p'
+            f'), actor AS ('
+            f'INSERT INTO {actors_table} (group_key, sender_id, created_at) VALUES (%s, %s, %s) '
+            f'ON CONFLICT (group_key, sender_id) DO NOTHING RETURNING 1'
+            f'), saved AS ('
+            f'INSERT INTO {target} AS n (id, recipient_id, sender_id, notification_type, post_id, '
+            f'message, is_read, group_key, actors_count, recent_sender_ids, created_at) '
+            f"SELECT %s::uuid, %s::uuid, %s::uuid, %s, %s::uuid, '', false, %s, 1, ARRAY[%s::uuid], %s::timestamptz "
+            f'FROM (SELECT 1) AS one LEFT JOIN previous ON true '
+            f'ON CONFLICT (group_key) WHERE group_key IS NOT NULL DO UPDATE SET '
+            f'sender_id = EXCLUDED.sender_id, '
+            f'actors_count = n.actors_count + (SELECT count(*) FROM actor), '
+            f'recent_sender_ids = (EXCLUDED.sender_id || array_remove(n.recent_sender_ids, EXCLUDED.sender_id))[1:%s], '
+            f'is_read = false, '
+            f'created_at = EXCLUDED.created_at '
+            f'WHERE EXISTS (SELECT 1 FROM actor) AND NOT (EXCLUDED.sender_id = ANY(n.recent_sender_ids)) '
+            f'RETURNING id, (xmax = 0) AS inserted'
+            f') SELECT saved.inserted, previous.is_read FROM saved LEFT JOIN previous ON true',
+            [
+                key, key, sender_id, now, uuid.uuid4(), recipient_id, sender_id, notification_type, post_id,
+                key, sender_id, now, RECENT_SENDERS,
+            ],
+        )
+        row = cursor.fetchone()
+    if row is None:
+        # Отправитель уже учтён в группе
+        return
+
+    inserted, was_read = row
+    # Без previous и без вставки строку только что создал параллельный запрос — она непрочитана
+    if inserted or was_read:
+        counters.increment(User, recipient_id, unread_notifications_count=1)
+    notification_stream.publish([recipient_id])
+
+
+def attach_recent_senders(notifications):
+    """Загружает последних отправителей групп одним запросом (notification.recent_senders)"""
+    from users.models import User
+
+    notifications = list(notifications)
+    ids = {sender_id for notification in notifications for sender_id in notification.recent_sender_ids}
+    users = User.objects.in_bulk(ids) if ids else {}
+    for notification in notifications:
+        notification.recent_senders = [
+            users[sender_id] for sender_id in notification.recent_sender_ids if sender_id in users
+        ] or [notification.sender]
+    return notifications
@@ -0,0 +1,87 @@
+"""
+Прочитанность уведомлений: отметка пользователя + флаг строки
+
+Раньше «прочитать всё» делало UPDATE ... SET is_read = true по всем
+непрочитанным строкам пользователя и переписывало тысячи строк.
+Теперь у пользователя есть notifications_read_at: уведомление прочитано,
+если is_read (прочитано по одному) или created_at <= notifications_read_at.
+- «Прочитать всё» — один UPDATE строки пользователя: отметка = now(),
+  unread_notifications_count = 0 (вместе с удалением шардов счётчика);
+- «Прочитать выбранные» — условный UPDATE is_read только строк новее
+  отметки, счётчик уменьшается ровно на число изменённых строк.
+Сгруппированное уведомление, обновлённое после отметки, получает новый
+created_at и снова становится непрочитанным.
+"""
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import counters
+from . import notification_stream
+from .models import Notification
+
+# Сколько id принимает POST /api/notifications/read/
+MAX_IDS = 100
+
+
+def unread_q(prefix=''):
+    """Условие «не прочитано» для запросов по уведомлениям (prefix — путь до уведомления)"""
+    watermark = f'{prefix}recipient__notifications_read_at'
+    return Q(**{f'{prefix}is_read': False}) & (
+        Q(**{f'{watermark}__isnull': True}) | Q(**{f'{prefix}created_at__gt': F(watermark)})
+    )
+
+
+def unread_sql(alias):
+    """То же условие «не прочитано» в SQL для строки уведомления alias"""
+    from users.models import User
+
+    return (
+        f'NOT {alias}.is_read AND {alias}.created_at > COALESCE((SELECT u.notifications_read_at '
+        f"FROM {User._meta.db_table} u WHERE u.id = {alias}.recipient_id), '-infinity')"
+    )
+
+
+def with_read_state(queryset):
+    """Добавляет к уведомлениям отметку получателя (одна колонка через JOIN)"""
+    return queryset.annotate(recipient_read_at=F('recipient__notifications_read_at'))
+
+
+def is_read(notification):
+    """Прочитано ли уведомление: флаг строки или отметка получателя"""
+    if notification.is_read:
+        return True
+    if hasattr(notification, 'recipient_read_at'):
+        watermark = notification.recipient_read_at
+    elif notification._state.fields_cache.get('recipient') is not None:
+        watermark = notification.recipient.notifications_read_at
+    else:
+        from users.models import User
+        watermark = User.objects.filter(
+            pk=notification.recipient_id
+        ).values_list('notifications_read_at', flat=True).first()
+    return watermark is not None and notification.created_at <= watermark
+
+
+def mark_all_read(user):
+    """Прочитать всё: одна запись в строку пользователя независимо от числа уведомлений"""
+    with transaction.atomic():
+        # Шарды — до строки пользователя, в том же порядке, что и counters.flush()
+        counters.discard_pending(type(user), user.pk, 'unread_notifications_count')
+        type(user).objects.filter(pk=user.pk).update(
+            notifications_read_at=timezone.now(),
+            unread_notifications_count=0,
+        )
+    notification_stream.publish([user.pk], notification_stream.READ)
+
+
+def mark_read(user, ids):
+    """Прочитать выбранные уведомления пользователя; возвращает число прочитанных"""
+    updated = Notification.objects.filter(
+        unread_q(), recipient=user, id__in=ids
+    ).update(is_read=True)
+    # Условный UPDATE: повторное или параллельное прочтение не уменьшит счётчик дважды
+    counters.increment(type(user), user.pk, unread_notifications_count=-updated)
+    if updated:
+        notification_stream.publish([user.pk], notification_stream.READ)
+    return updated
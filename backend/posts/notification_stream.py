@@ -0,0 +1,392 @@
+"""
+Поток уведомлений (Server-Sent Events): GET /api/notifications/stream/
+
+Вместо опроса раз в 30 секунд клиент держит одно SSE-соединение
+(нужен ASGI-сервер: uvicorn / daphne gitforum.asgi:application).
+Соединение — корутина, которая спит на своей очереди, пока не придёт
+сообщение брокера, поэтому простаивающие клиенты не делают запросов к БД
+(только heartbeat раз в NOTIFICATION_STREAM_HEARTBEAT секунд) и не держат
+соединений с PostgreSQL: запросы идут через run_db в общем пуле потоков,
+и соединение закрывается сразу после запроса.
+
+Сообщения брокера — не сами уведомления, а сигнал «у пользователя есть
+новости» (NOTIFICATION) или «изменилось число непрочитанных» (READ).
+Получив его, соединение одним запросом перечитывает новые уведомления
+после своего курсора и счётчик непрочитанных. Отсюда:
+- очередь соединения ограничена NOTIFICATION_STREAM_QUEUE_SIZE: при
+  переполнении лишние сигналы можно отбросить без потерь;
+- id события — время создания уведомления (мкс), и при переподключении
+  с Last-Event-ID (или ?last_event_id=) пропущенное дочитывается из БД
+  тем же запросом (не дальше RESUME_MAX_AGE назад — полную историю отдаёт список).
+
+EventSource не умеет передавать заголовки, а JWT в URL оседает в логах
+и истории браузера. Поэтому браузер сначала получает одноразовый билет
+POST /api/notifications/stream/ticket/ (подписанный id пользователя,
+живёт STREAM_TICKET_MAX_AGE секунд) и открывает поток с ?ticket=.
+
+Брокер задаётся NOTIFICATION_STREAM_BACKEND:
+- LocalBroker — внутри процесса (один воркер);
+- PostgresBroker — LISTEN / NOTIFY PostgreSQL, сигналы доходят до всех воркеров.
+"""
+import asyncio
+import json
+import logging
+import secrets
+import select
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Виды сообщений брокера
+NOTIFICATION = 'notification'
+READ = 'read'
+
+# Сколько уведомлений читать одним запросом
+FETCH_BATCH_SIZE = 50
+# Уведомление из долгой транзакции может закоммититься позже более новых:
+# живое соединение перечитывает это окно (уже отправленные версии отбрасываются)
+LOOKBACK = timedelta(seconds=5)
+# Через сколько миллисекунд браузер переподключается после обрыва
+RETRY_MS = 3000
+# Насколько давний Last-Event-ID дочитывается при переподключении
+RESUME_MAX_AGE = timedelta(minutes=5)
+# Сколько секунд действует билет на открытие потока
+STREAM_TICKET_MAX_AGE = 30
+STREAM_TICKET_SALT = 'posts.notification_stream.ticket'
+
+
+class Subscription:
+    """Подписка одного соединения: ограниченная очередь в его event loop"""
+
+    def __init__(self, user_id, maxsize):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def push(self, kind):
+        """Можно вызывать из любого потока"""
+        try:
+            self.loop.call_soon_threadsafe(self._put, kind)
+        except RuntimeError:
+            # Event loop соединения уже закрыт
+            pass
+
+    def _put(self, kind):
+        try:
+            self.queue.put_nowait(kind)
+        except asyncio.QueueFull:
+            # В очереди уже есть сигналы — соединение и так перечитает всё из БД
+            pass
+
+
+class LocalBroker:
+    """Pub/sub внутри процесса"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def subscribe(self, user_id):
+        """Вызывается из корутины соединения"""
+        subscription = Subscription(str(user_id), getattr(settings, 'NOTIFICATION_STREAM_QUEUE_SIZE', 16))
+        with self._lock:
+            self._subscriptions[subscription.user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def publish(self, user_ids, kind):
+        self.deliver(user_ids, kind)
+
+    def deliver(self, user_ids, kind):
+        """Передаёт сигнал подключённым к этому процессу соединениям"""
+        with self._lock:
+            targets = [
+                subscription
+                for user_id in user_ids
+                for subscription in self._subscriptions.get(str(user_id), ())
+            ]
+        for subscription in targets:
+            subscription.push(kind)
+
+
+class PostgresBroker(LocalBroker):
+    """
+    Сигналы через LISTEN / NOTIFY PostgreSQL — для нескольких воркеров.
+    Процесс слушает канал одним соединением в фоновом потоке, который
+    запускается при первой подписке (и заново после fork).
+    """
+    channel = 'notification_stream'
+    # Размер NOTIFY ограничен 8000 байт: id пользователей шлются пачками
+    ids_per_message = 150
+
+    def __init__(self):
+        super().__init__()
+        self._listener = None
+
+    def publish(self, user_ids, kind):
+        user_ids = [str(user_id) for user_id in user_ids]
+        with connection.cursor() as cursor:
+            for start in range(0, len(user_ids), self.ids_per_message):
+                payload = json.dumps({'kind': kind, 'users': user_ids[start:start + self.ids_per_message]})
+                cursor.execute('SELECT pg_notify(%s, %s)', [self.channel, payload])
+
+    def subscribe(self, user_id):
+        self._ensure_listener()
+        return super().subscribe(user_id)
+
+    def _ensure_listener(self):
+        if self._listener is not None and self._listener.is_alive():
+            return
+        with self._lock:
+            if self._listener is not None and self._listener.is_alive():
+                return
+            self._listener = threading.Thread(target=self._run, name='notification-listener', daemon=True)
+            self._listener.start()
+
+    def _run(self):
+        while True:
+            try:
+                self._listen()
+            except Exception:
+                logger.exception('Notification stream listener failed, reconnecting')
+                connection.close()
+                time.sleep(1)
+
+    def _listen(self):
+        # Своё соединение потока (autocommit): LISTEN действует, пока оно открыто
+        with connection.cursor() as cursor:
+            cursor.execute(f'LISTEN {self.channel}')
+        raw = connection.connection
+        while True:
+            if select.select([raw], [], [], 60) == ([], [], []):
+                continue
+            raw.poll()
+            while raw.notifies:
+                message = json.loads(raw.notifies.pop(0).payload)
+                self.deliver(message['users'], message['kind'])
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                _broker = import_string(getattr(
+                    settings, 'NOTIFICATION_STREAM_BACKEND', 'posts.notification_stream.LocalBroker'
+                ))()
+    return _broker
+
+
+def publish(user_ids, kind=NOTIFICATION):
+    """Сигнал подключённым клиентам пользователей — после коммита транзакции"""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+
+    def send():
+        try:
+            get_broker().publish(user_ids, kind)
+        except Exception:
+            # Поток — дополнение к API: сбой брокера не ломает запрос
+            logger.exception('Failed to publish notification stream event')
+
+    transaction.on_commit(send)
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def event_id(moment):
+    """id события — время создания уведомления в микросекундах (без потери точности)"""
+    return str((moment - EPOCH) // MICROSECOND)
+
+
+def parse_event_id(value):
+    try:
+        return EPOCH + int(value) * MICROSECOND
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+def format_event(event, data, id=None):
+    lines = []
+    if id is not None:
+        lines.append(f'id: {id}')
+    lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data, cls=DjangoJSONEncoder)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def _call_and_close(func, *args):
+    try:
+        return func(*args)
+    finally:
+        connection.close()
+
+
+async def run_db(func, *args):
+    """
+    Вызывает синхронную func из корутины соединения в общем пуле потоков,
+    а не в потоке запроса (thread_sensitive), и сразу закрывает соединение
+    с БД: открытые вкладки не держат по соединению PostgreSQL
+    """
+    return await sync_to_async(_call_and_close, thread_sensitive=False)(func, *args)
+
+
+def issue_ticket(user):
+    """Одноразовый билет на открытие потока (вместо JWT в URL)"""
+    return signing.dumps({'u': str(user.pk), 'n': secrets.token_urlsafe(12)}, salt=STREAM_TICKET_SALT)
+
+
+def redeem_ticket(ticket):
+    """Пользователь билета или None (подпись неверна, срок истёк, билет уже использован)"""
+    from users.models import User
+
+    try:
+        payload = signing.loads(ticket, salt=STREAM_TICKET_SALT, max_age=STREAM_TICKET_MAX_AGE)
+    except signing.BadSignature:
+        return None
+    # Повторное предъявление отклоняется (между процессами — при общем кэше)
+    if not cache.add(f'stream-ticket:{payload["n"]}', 1, STREAM_TICKET_MAX_AGE):
+        return None
+    return User.objects.filter(pk=payload['u'], is_active=True).first()
+
+
+def authenticate(request):
+    """
+    Пользователь по JWT из заголовка Authorization или по билету ?ticket=
+    (для EventSource, который не умеет передавать заголовки);
+    None — не аутентифицирован
+    """
+    from rest_framework.exceptions import AuthenticationFailed
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+
+    auth = JWTAuthentication()
+    header = auth.get_header(request)
+    raw_token = auth.get_raw_token(header) if header else None
+    if raw_token is None:
+        ticket = request.GET.get('ticket')
+        return redeem_ticket(ticket) if ticket else None
+    try:
+        return auth.get_user(auth.get_validated_token(raw_token))
+    except AuthenticationFailed:
+        return None
+
+
+def fetch_notifications(user_id, after, sent=None):
+    """
+    Уведомления пользователя новее after: [(created_at, данные)].
+    sent — {id: created_at} уже отправленных; сгруппированное уведомление
+    с новым created_at отправляется снова (клиент заменяет его по id).
+    """
+    from django.db.models import Q
+    from . import notification_groups
+    from . import notification_reads
+    from .models import Notification
+    from .serializers import NotificationSerializer
+
+    queryset = notification_reads.with_read_state(
+        Notification.objects.filter(recipient_id=user_id, created_at__gt=after)
+    )
+    if sent:
+        already_sent = Q()
+        for notification_id, created_at in sent.items():
+            already_sent |= Q(id=notification_id, created_at=created_at)
+        queryset = queryset.exclude(already_sent)
+    notifications = notification_groups.attach_recent_senders(
+        queryset.select_related('sender', 'post').order_by('created_at')[:FETCH_BATCH_SIZE]
+    )
+    data = NotificationSerializer(notifications, many=True).data
+    return [(notification.created_at, item) for notification, item in zip(notifications, data)]
+
+
+def unread_count(user_id):
+    """Число непрочитанных: колонка пользователя + незаписанные шарды"""
+    from users.models import User
+    from . import counters
+
+    value = User.objects.filter(pk=user_id).values_list('unread_notifications_count', flat=True).first() or 0
+    pending = counters.pending_for(User, [user_id]).get(user_id, {})
+    return max(value + pending.get('unread_notifications_count', 0), 0)
+
+
+async def event_stream(user_id, last_event_id=None):
+    """
+    Асинхронный генератор SSE для StreamingHttpResponse.
+    События: notification (с id) и unread_count; ': ping' — heartbeat.
+    """
+    broker = get_broker()
+    subscription = broker.subscribe(user_id)
+    heartbeat = getattr(settings, 'NOTIFICATION_STREAM_HEARTBEAT', 15)
+    try:
+        yield f'retry: {RETRY_MS}\n\n'
+
+        now = timezone.now()
+        cursor = parse_event_id(last_event_id)
+        if cursor is not None:
+            # Курсор присылает клиент: не дочитываем историю дальше RESUME_MAX_AGE
+            cursor = min(max(cursor, now - RESUME_MAX_AGE), now)
+        # Переподключение: сначала дочитываем пропущенное строго после курсора
+        lookback = timedelta(0) if cursor is not None else LOOKBACK
+        kinds = {NOTIFICATION} if cursor is not None else {READ}
+        if cursor is None:
+            cursor = now
+        sent = {}
+        unread = None
+
+        while True:
+            if NOTIFICATION in kinds:
+                while True:
+                    batch = await run_db(fetch_notifications, user_id, cursor - lookback, sent)
+                    for created_at, item in batch:
+                        sent[item['id']] = created_at
+                        cursor = max(cursor, created_at)
+                        yield format_event('notification', item, id=event_id(cursor))
+                    # Помним только id внутри окна перечитывания — исключение в запросе не растёт
+                    sent = {key: moment for key, moment in sent.items() if moment > cursor - LOOKBACK}
+                    if len(batch) < FETCH_BATCH_SIZE:
+                        break
+                lookback = LOOKBACK
+
+            if kinds:
+                count = await run_db(unread_count, user_id)
+                if count != unread:
+                    unread = count
+                    yield format_event('unread_count', {'unread_count': count})
+
+            try:
+                kind = await asyncio.wait_for(subscription.queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ': ping\n\n'
+                kinds = set()
+                continue
+            kinds = {kind}
+            # Накопившиеся сигналы обрабатываются одним перечитыванием
+            while not subscription.queue.empty():
+                kinds.add(subscription.queue.get_nowait())
+    finally:
+        broker.unsubscribe(subscription)
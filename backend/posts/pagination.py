@@ -0,0 +1,154 @@
+"""
+Пагинация списков постов
+
+Keyset (cursor) пагинация: вместо OFFSET + COUNT(*) курсор хранит значение
+поля сортировки и id последнего поста, следующая страница берётся условием
+(field, id) < (value, last_id). Стоимость не зависит от глубины прокрутки.
+"""
+import base64
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+def keyset_filter(queryset, field_name, value, last_id, descending=True, id_field='id'):
+    """Записи строго после (value, last_id) в порядке (field_name, id_field)"""
+    lookup = 'lt' if descending else 'gt'
+    return queryset.filter(
+        Q(**{f'{field_name}__{lookup}': value})
+        | Q(**{field_name: value, f'{id_field}__{lookup}': last_id})
+    )
+
+
+class PostKeysetPagination(BasePagination):
+    """Keyset пагинация по одной из поддерживаемых сортировок + id"""
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    ordering_fields = ['created_at', 'likes_count', 'views', 'comments_count']
+    invalid_cursor_message = 'Некорректный курсор'
+
+    @classmethod
+    def get_ordering(cls, queryset):
+        """Первое поле сортировки queryset, если по нему поддерживается keyset"""
+        ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+        if not ordering or not isinstance(ordering[0], str):
+            return None
+        if ordering[0].lstrip('-') not in cls.ordering_fields:
+            return None
+        return ordering[0]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = self.get_ordering(queryset)
+        field_name = self.ordering.lstrip('-')
+        descending = self.ordering.startswith('-')
+
+        queryset = queryset.order_by(self.ordering, '-id' if descending else 'id')
+
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded:
+            value, last_id = self.decode_cursor(encoded, queryset.model)
+            queryset = keyset_filter(queryset, field_name, value, last_id, descending)
+
+        # Берём на одну запись больше, чтобы понять, есть ли следующая страница
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        # Ключ курсора — значения из БД, по которым строки отсортированы:
+        # до сериализации к счётчикам страницы добавляются ещё не сброшенные
+        # изменения (counters.apply_pending), и курсор по ним сдвинулся бы
+        self.last_key = self.cursor_key(self.page[-1]) if self.page else None
+        return self.page
+
+    def cursor_key(self, post):
+        field = post._meta.get_field(self.ordering.lstrip('-'))
+        return field.value_to_string(post), str(post.pk)
+
+    def encode_cursor(self, key):
+        value, last_id = key
+        payload = {
+            'o': self.ordering,
+            'v': value,
+            'id': last_id,
+        }
+        raw = json.dumps(payload, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, encoded, model):
+        try:
+            raw = base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4))
+            payload = json.loads(raw)
+            if payload['o'] != self.ordering:
+                raise ValueError('ordering mismatch')
+            field = model._meta.get_field(self.ordering.lstrip('-'))
+            return field.to_python(payload['v']), model._meta.pk.to_python(payload['id'])
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.last_key))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': None,
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class PostListPagination(BasePagination):
+    """
+    Переключатель для плавного перехода фронтенда:
+    keyset включается через ?cursor= / ?pagination=cursor
+    (или по умолчанию при POSTS_PAGINATION = 'cursor'),
+    иначе работает прежняя PageNumberPagination.
+    Поиск по релевантности и прочие сортировки всегда идут постранично.
+    """
+    def __init__(self):
+        self.paginator = None
+
+    def use_cursor(self, queryset, request):
+        mode = request.query_params.get('pagination')
+        if mode is None:
+            if PostKeysetPagination.cursor_query_param in request.query_params:
+                mode = 'cursor'
+            else:
+                mode = getattr(settings, 'POSTS_PAGINATION', 'page')
+        return mode == 'cursor' and PostKeysetPagination.get_ordering(queryset) is not None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_cursor(queryset, request):
+            self.paginator = PostKeysetPagination()
+        else:
+            self.paginator = PageNumberPagination()
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+
+class CommentRepliesPagination(PostKeysetPagination):
+    """Keyset пагинация прямых ответов комментария по (created_at, id)"""
+    # Столько же, сколько ответов показывается в ветке (comment_tree.REPLIES_PER_LEVEL)
+    page_size = 20
+    ordering_fields = ['created_at']
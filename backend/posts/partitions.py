@@ -0,0 +1,245 @@
+"""
+Помесячное секционирование Notification и PostView (необязательно)
+
+Обе таблицы только растут, и удаление старых строк (posts/retention.py)
+пачками DELETE всё равно оставляет работу для VACUUM. В секционированной
+схеме таблица — PARTITION BY RANGE (created_at) с секцией на каждый
+месяц UTC ({таблица}_pYYYY_MM) и секцией {таблица}_default на случай,
+если месяц не был создан заранее; удаление месяца — DROP TABLE секции.
+
+Схема включается один раз командой partition_tables --convert (таблица
+копируется под ACCESS EXCLUSIVE блокировкой — в окно обслуживания, затем
+процессы приложения перезапускаются), после чего partition_tables
+(и prune_old_rows) заранее создают секции на PARTITION_MONTHS_AHEAD
+месяцев вперёд.
+
+Ограничения PostgreSQL:
+- первичный ключ секционированной таблицы — (id, created_at);
+- уникальный индекс без created_at возможен только внутри секции, поэтому
+  notification_group_key_uniq создаётся в каждой секции, а группировка
+  (posts/notification_groups.py) пишет прямо в секцию текущего месяца;
+  так же в каждой секции живут уникальные ключи зрителей PostView.
+"""
+import logging
+import re
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Notification, PostView
+
+logger = logging.getLogger(__name__)
+
+# Уникальные индексы, которые в секционированной схеме живут в каждой секции:
+# {модель: [(суффикс имени, колонки, условие)]}
+LOCAL_UNIQUE = {
+    Notification: [('group_key_uniq', 'group_key', 'group_key IS NOT NULL')],
+    PostView: [
+        ('user_uniq', 'post_id, user_id', 'user_id IS NOT NULL'),
+        ('session_uniq', 'post_id, session_key', 'user_id IS NULL AND session_key IS NOT NULL'),
+        ('ip_uniq', 'post_id, ip_address', 'user_id IS NULL AND session_key IS NULL AND ip_address IS NOT NULL'),
+    ],
+}
+MODELS = {'notifications': Notification, 'post_views': PostView}
+# Сколько ждать блокировку таблицы при DDL, прежде чем отступить
+LOCK_TIMEOUT = '5s'
+
+_PARTITION_RE = re.compile(r'_p(\d{4})_(\d{2})$')
+# Схема таблиц {таблица: секционирована ли} и секции, существование которых проверено
+_layouts = {}
+_known = set()
+
+
+def months_ahead():
+    return getattr(settings, 'PARTITION_MONTHS_AHEAD', 3)
+
+
+def month_start(moment):
+    """Начало месяца UTC, в который попадает moment"""
+    moment = moment.astimezone(dt_timezone.utc)
+    return datetime(moment.year, moment.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(model, month):
+    return f'{model._meta.db_table}_p{month:%Y_%m}'
+
+
+def default_partition_name(model):
+    return f'{model._meta.db_table}_default'
+
+
+def is_partitioned(model):
+    """Секционирована ли таблица модели (запоминается до перезапуска процесса)"""
+    table = model._meta.db_table
+    if table not in _layouts:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))',
+                [table],
+            )
+            _layouts[table] = cursor.fetchone()[0]
+    return _layouts[table]
+
+
+def partition_exists(name):
+    if name in _known:
+        return True
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT to_regclass(%s) IS NOT NULL', [name])
+        exists = cursor.fetchone()[0]
+    if exists:
+        _known.add(name)
+    return exists
+
+
+def insert_table(model, moment):
+    """
+    Таблица для INSERT ... ON CONFLICT по уникальному индексу секции:
+    секция месяца moment, если схема секционированная, иначе сама таблица.
+    None — секции месяца нет (строка попала бы в default).
+    """
+    if not is_partitioned(model):
+        return model._meta.db_table
+    name = partition_name(model, month_start(moment))
+    return name if partition_exists(name) else None
+
+
+def monthly_partitions(model):
+    """Помесячные секции: [(начало месяца, имя)] по возрастанию"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+            'WHERE i.inhparent = to_regclass(%s)',
+            [model._meta.db_table],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    result = []
+    for name in names:
+        match = _PARTITION_RE.search(name)
+        if match:
+            month = datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=dt_timezone.utc)
+            result.append((month, name))
+    return sorted(result)
+
+
+def _create_local_unique(model, name, cursor):
+    for suffix, columns, condition in LOCAL_UNIQUE[model]:
+        where = f' WHERE {condition}' if condition else ''
+        cursor.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS {name}_{suffix} ON {name} ({columns}){where}')
+
+
+def create_partition(model, month):
+    """
+    Секция месяца: отдельная таблица, в которую переносятся строки этого
+    месяца из default, затем ATTACH PARTITION (блокирует только DDL, не запись)
+    """
+    table = model._meta.db_table
+    name = partition_name(model, month)
+    if partition_exists(name):
+        return False
+    lower, upper = month, add_months(month, 1)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+        cursor.execute(f'CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+        default = default_partition_name(model)
+        if partition_exists(default):
+            cursor.execute(
+                f'WITH moved AS (DELETE FROM {default} WHERE created_at >= %s AND created_at < %s RETURNING *) '
+                f'INSERT INTO {name} SELECT * FROM moved',
+                [lower, upper],
+            )
+        _create_local_unique(model, name, cursor)
+        cursor.execute(f'ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)', [lower, upper])
+    _known.add(name)
+    return True
+
+
+def ensure_partitions(model, ahead=None):
+    """Секции с текущего месяца на ahead месяцев вперёд; возвращает имена созданных"""
+    ahead = months_ahead() if ahead is None else ahead
+    current = month_start(timezone.now())
+    created = []
+    for offset in range(ahead + 1):
+        month = add_months(current, offset)
+        if create_partition(model, month):
+            created.append(partition_name(model, month))
+    return created
+
+
+def convert(model, ahead=None):
+    """
+    Переводит обычную таблицу в помесячно секционированную.
+    Одна транзакция под ACCESS EXCLUSIVE: на время копирования таблица недоступна.
+    """
+    table = model._meta.db_table
+    old = f'{table}_unpartitioned'
+    ahead = months_ahead() if ahead is None else ahead
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE')
+        # Неуникальные индексы и внешние ключи пересоздаются на новой таблице
+        cursor.execute(
+            'SELECT i.indexdef FROM pg_indexes i JOIN pg_index x ON x.indexrelid = to_regclass(i.indexname) '
+            'WHERE i.tablename = %s AND NOT x.indisunique',
+            [table],
+        )
+        index_defs = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+            [table],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f'SELECT min(created_at) FROM {table}')
+        oldest = cursor.fetchone()[0] or timezone.now()
+
+        cursor.execute(f'ALTER TABLE {table} RENAME TO {old}')
+        cursor.execute(
+            f'CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) '
+            f'PARTITION BY RANGE (created_at)'
+        )
+        cursor.execute(f'CREATE TABLE {default_partition_name(model)} PARTITION OF {table} DEFAULT')
+        last = add_months(month_start(timezone.now()), ahead)
+        month = month_start(oldest)
+        while month <= last:
+            name = partition_name(model, month)
+            cursor.execute(
+                f'CREATE TABLE {name} PARTITION OF {table} FOR VALUES FROM (%s) TO (%s)',
+                [month, add_months(month, 1)],
+            )
+            _create_local_unique(model, name, cursor)
+            month = add_months(month, 1)
+
+        cursor.execute(f'INSERT INTO {table} SELECT * FROM {old}')
+        cursor.execute(f'DROP TABLE {old}')
+        cursor.execute(f'ALTER TABLE {table} ADD PRIMARY KEY (id, created_at)')
+        for index_def in index_defs:
+            cursor.execute(index_def)
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {name} {definition}')
+    _layouts.pop(table, None)
+    _known.clear()
+
+
+def drop_partition(model, name, before_drop=None):
+    """
+    Удаляет секцию целиком; before_drop(cursor, name) выполняется в той же
+    транзакции (перенос в архив, поправка счётчиков). False — не дождались блокировки.
+    """
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+            if before_drop is not None:
+                before_drop(cursor, name)
+            cursor.execute(f'DROP TABLE {name}')
+    except Exception:
+        logger.exception('Failed to drop partition %s', name)
+        return False
+    _known.discard(name)
+    return True
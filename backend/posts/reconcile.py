@@ -0,0 +1,321 @@
+"""
+Сверка денормализованных счётчиков с исходными таблицами
+
+Вместо COUNT на каждый объект истинные значения считаются сгруппированными
+агрегатами по диапазону id (чанку), а в строки записываются только
+расхождения одним UPDATE ... FROM на чанк:
+
+    WITH actual AS (SELECT t.id, t.likes_count AS old_0, COALESCE(s0.n, 0) AS new_0, ...
+                    FROM posts_post t
+                    LEFT JOIN (SELECT post_id AS id, COUNT(*) AS n FROM posts_like
+                               WHERE post_id <чанк> GROUP BY post_id) s0 ON s0.id = t.id
+                    WHERE t.id <чанк>),
+         drift AS (SELECT * FROM actual WHERE (old_0, ...) IS DISTINCT FROM (new_0, ...))
+    UPDATE posts_post t SET likes_count = d.new_0, ... FROM drift d WHERE t.id = d.id
+    RETURNING d.*
+
+Незаписанные изменения счётчиков чанка в шардах (posts/counters.py) уже
+учтены в исходных таблицах: они удаляются в той же транзакции, что и
+точная запись (в отчёте «было» = значение в строке + шарды), иначе
+следующий flush прибавил бы их поверх пересчёта.
+
+Чанки независимы и могут обрабатываться параллельно (каждый поток —
+своё соединение). Инкрементальный режим (since) проверяет только объекты,
+у которых с указанного момента появились исходные строки; удаления
+ловит полный прогон.
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.db import connection, transaction
+
+from . import counters
+from . import notification_reads
+from . import retention
+from . import unique_views
+from .models import CounterShard, Post, Tag, Like, Comment, Bookmark, PostView, Notification
+
+
+class Source:
+    """
+    Источник счётчика: число строк model, сгруппированных по внешнему ключу fk
+    (where — необязательное SQL-условие на строки, например 'NOT is_read')
+    """
+
+    def __init__(self, model, fk, changed_since='created_at', where=None):
+        self.model = model
+        self.fk = fk
+        # Поле времени для инкрементального режима (можно через связь)
+        self.changed_since = changed_since
+        self.where = where
+
+    @property
+    def table(self):
+        return connection.ops.quote_name(self.model._meta.db_table)
+
+    @property
+    def column(self):
+        return connection.ops.quote_name(self.model._meta.get_field(self.fk).column)
+
+
+class Target:
+    """
+    Модель со счётчиками: counters — {колонка: Source} считаются в SQL,
+    python_counters — {колонка: функция(ids) -> {id: значение}} для значений,
+    которые нельзя посчитать в SQL (оценки HyperLogLog); python_changed —
+    функция(since) -> ids объектов, у которых такие значения могли измениться
+    """
+
+    def __init__(self, name, model, counters, python_counters=None, python_changed=None):
+        self.name = name
+        self.model = model
+        self.counters = counters
+        self.python_counters = python_counters or {}
+        self.python_changed = python_changed
+
+    @property
+    def table(self):
+        return connection.ops.quote_name(self.model._meta.db_table)
+
+    @property
+    def pk(self):
+        return connection.ops.quote_name(self.model._meta.pk.column)
+
+
+def get_targets():
+    """Все поддерживаемые счётчики: {имя: Target}"""
+    from users.models import User, Follow
+
+    post_counters = {
+        'likes_count': Source(Like, 'post'),
+        'comments_count': Source(Comment, 'post'),
+        'bookmarks_count': Source(Bookmark, 'post'),
+        'views': Source(PostView, 'post'),
+    }
+    post_python_counters = {}
+    if unique_views.hll_enabled():
+        # Просмотры — оценки скетчей, посты без скетча не трогаем
+        del post_counters['views']
+        post_python_counters['views'] = unique_views.estimates
+    elif retention.POLICIES['post_views'].days:
+        # Старые PostView удаляются (posts/retention.py) — строк меньше, чем просмотров
+        del post_counters['views']
+
+    return {
+        'posts': Target(
+            'posts', Post, post_counters,
+            python_counters=post_python_counters,
+            python_changed=unique_views.changed_post_ids,
+        ),
+        'tags': Target('tags', Tag, {
+            'usage_count': Source(Post.tags.through, 'tag', changed_since='post__updated_at'),
+        }),
+        'comments': Target('comments', Comment, {
+            'replies_count': Source(Comment, 'parent'),
+        }),
+        'users': Target('users', User, {
+            'followers_count': Source(Follow, 'following'),
+            'following_count': Source(Follow, 'follower'),
+            'posts_count': Source(Post, 'author'),
+            # Непрочитанные — новее отметки «прочитано всё» (posts/notification_reads.py)
+            'unread_notifications_count': Source(
+                Notification, 'recipient', where=notification_reads.unread_sql(Notification._meta.db_table)
+            ),
+        }),
+    }
+
+
+class Chunk:
+    """Диапазон (lower, upper] первичных ключей или явный список ids"""
+
+    def __init__(self, lower=None, upper=None, ids=None):
+        self.lower = lower
+        self.upper = upper
+        self.ids = ids
+
+    def condition(self, column):
+        """SQL-условие и параметры для колонки"""
+        if self.ids is not None:
+            return f'{column} = ANY(%s)', [list(self.ids)]
+        if self.lower is None:
+            return f'{column} <= %s', [self.upper]
+        return f'{column} > %s AND {column} <= %s', [self.lower, self.upper]
+
+
+def range_chunks(target, chunk_size):
+    """Делит таблицу на чанки по chunk_size строк за один проход по индексу pk"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT id FROM ('
+            f'SELECT {target.pk} AS id, row_number() OVER (ORDER BY {target.pk}) AS rn, '
+            f'count(*) OVER () AS total FROM {target.table}'
+            f') s WHERE rn %% %s = 0 OR rn = total ORDER BY id',
+            [chunk_size],
+        )
+        bounds = [row[0] for row in cursor.fetchall()]
+
+    chunks = []
+    lower = None
+    for upper in bounds:
+        chunks.append(Chunk(lower, upper))
+        lower = upper
+    return chunks
+
+
+def changed_ids(target, since):
+    """id объектов, у которых с момента since появились исходные строки"""
+    ids = set()
+    for source in target.counters.values():
+        ids.update(
+            source.model.objects.filter(
+                **{f'{source.changed_since}__gte': since}
+            ).values_list(source.fk, flat=True).distinct()
+        )
+    if target.python_counters and target.python_changed:
+        ids.update(target.python_changed(since))
+    ids.discard(None)
+    return ids
+
+
+def id_chunks(ids, chunk_size):
+    ids = sorted(ids)
+    return [Chunk(ids=ids[i:i + chunk_size]) for i in range(0, len(ids), chunk_size)]
+
+
+def _sql_drift(target, chunk, dry_run):
+    """Расхождения SQL-счётчиков чанка; без dry_run сразу исправляет их"""
+    columns = list(target.counters)
+    if not columns:
+        return []
+
+    where, params = chunk.condition(f't.{target.pk}')
+    # Шарды чанка: без dry_run удаляются — точное значение их уже включает
+    shard_where, shard_params = chunk.condition('object_id')
+    shard_table = CounterShard._meta.db_table
+    shard_filter = f'FROM {shard_table} WHERE model = %s AND field = ANY(%s) AND {shard_where}'
+    if dry_run:
+        pending = f'SELECT object_id, field, delta {shard_filter}'
+    else:
+        pending = f'DELETE {shard_filter} RETURNING object_id, field, delta'
+    pending_params = [target.model._meta.label_lower, columns, *shard_params]
+
+    selects = []
+    joins = []
+    join_params = []
+    for i, column in enumerate(columns):
+        source = target.counters[column]
+        source_where, source_params = chunk.condition(source.column)
+        if source.where:
+            source_where = f'{source_where} AND ({source.where})'
+        quoted = connection.ops.quote_name(column)
+        selects.append(
+            f't.{quoted} AS cur_{i}, t.{quoted} + COALESCE(p{i}.delta, 0) AS old_{i}, '
+            f'COALESCE(s{i}.n, 0) AS new_{i}'
+        )
+        joins.append(
+            f'LEFT JOIN (SELECT {source.column} AS id, COUNT(*) AS n FROM {source.table} '
+            f'WHERE {source_where} GROUP BY {source.column}) s{i} ON s{i}.id = t.{target.pk} '
+            f'LEFT JOIN (SELECT object_id AS id, SUM(delta)::bigint AS delta FROM pending '
+            f'WHERE field = %s GROUP BY object_id) p{i} ON p{i}.id = t.{target.pk}'
+        )
+        join_params.extend([*source_params, column])
+
+    current = ', '.join(f'cur_{i}' for i in range(len(columns)))
+    old = ', '.join(f'old_{i}' for i in range(len(columns)))
+    new = ', '.join(f'new_{i}' for i in range(len(columns)))
+    sql = (
+        f'WITH pending AS ({pending}), '
+        f'actual AS (SELECT t.{target.pk} AS id, {", ".join(selects)} '
+        f'FROM {target.table} t {" ".join(joins)} WHERE {where}), '
+        f'drift AS (SELECT * FROM actual WHERE ({current}) IS DISTINCT FROM ({new}) '
+        f'OR ({old}) IS DISTINCT FROM ({new})) '
+    )
+    if dry_run:
+        sql += f'SELECT id, {old}, {new} FROM drift'
+    else:
+        sets = ', '.join(f'{connection.ops.quote_name(column)} = d.new_{i}' for i, column in enumerate(columns))
+        sql += (
+            f'UPDATE {target.table} t SET {sets} FROM drift d WHERE t.{target.pk} = d.id '
+            f'RETURNING d.id, {", ".join(f"d.old_{i}" for i in range(len(columns)))}, '
+            f'{", ".join(f"d.new_{i}" for i in range(len(columns)))}'
+        )
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, pending_params + join_params + params)
+        rows = cursor.fetchall()
+
+    drift = []
+    count = len(columns)
+    for row in rows:
+        object_id, values = row[0], row[1:]
+        for i, column in enumerate(columns):
+            if values[i] != values[count + i]:
+                drift.append((object_id, column, values[i], values[count + i]))
+    return drift
+
+
+def _python_drift(target, chunk, dry_run):
+    """Расхождения счётчиков, вычисляемых в Python (python_counters)"""
+    drift = []
+    for column, compute in target.python_counters.items():
+        where, params = chunk.condition(target.pk)
+        quoted = connection.ops.quote_name(column)
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT {target.pk}, {quoted} FROM {target.table} WHERE {where}', params)
+            current = dict(cursor.fetchall())
+        actual = compute(list(current))
+        # Шарды пересчитанных объектов уже учтены в точном значении
+        measured = [object_id for object_id in actual if object_id in current]
+        if dry_run:
+            pending = counters.pending_for(target.model, measured)
+        else:
+            pending = counters.take_pending(target.model, measured, column)
+        pending = {object_id: deltas for object_id, deltas in pending.items() if deltas.get(column)}
+        # Пишем, если строка отличается; в отчёт — если отличается вместе с шардами
+        changes = [
+            (object_id, value)
+            for object_id, value in actual.items()
+            if object_id in current and (current[object_id] != value or object_id in pending)
+        ]
+        if changes and not dry_run:
+            values = ', '.join(['(%s, %s)'] * len(changes))
+            pk_type = target.model._meta.pk.db_type(connection)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'UPDATE {target.table} t SET {quoted} = v.value '
+                    f'FROM (VALUES {values}) v(id, value) WHERE t.{target.pk} = v.id::{pk_type}',
+                    [param for change in changes for param in change],
+                )
+        for object_id, value in changes:
+            old = current[object_id] + pending.get(object_id, {}).get(column, 0)
+            if old != value:
+                drift.append((object_id, column, old, value))
+    return drift
+
+
+def reconcile_chunk(target, chunk, dry_run=False):
+    """Сверяет один чанк в своей транзакции; возвращает [(id, колонка, было, стало)]"""
+    with transaction.atomic():
+        return _sql_drift(target, chunk, dry_run) + _python_drift(target, chunk, dry_run)
+
+
+def _run_in_thread(target, chunk, dry_run):
+    try:
+        return reconcile_chunk(target, chunk, dry_run)
+    finally:
+        connection.close()
+
+
+def reconcile_target(target, chunks, workers=1, dry_run=False):
+    """
+    Сверяет чанки (параллельно при workers > 1).
+    Генератор: после каждого чанка отдаёт его расхождения.
+    """
+    if workers <= 1:
+        for chunk in chunks:
+            yield reconcile_chunk(target, chunk, dry_run)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_run_in_thread, target, chunk, dry_run) for chunk in chunks]
+        for future in as_completed(futures):
+            yield future.result()
@@ -0,0 +1,181 @@
+"""
+Срок хранения Notification и PostView
+
+Обе таблицы только растут. prune_old_rows удаляет строки старше
+NOTIFICATION_RETENTION_DAYS / POST_VIEW_RETENTION_DAYS дней (0 — хранить всё):
+- в секционированной схеме (posts/partitions.py) месяцы целиком старше
+  срока удаляются DROP TABLE секции;
+- остальное — пачками по batch_size строк, каждая пачка своей короткой
+  транзакцией (SKIP LOCKED, без долгих блокировок):
+
+    WITH doomed AS (SELECT id FROM t WHERE created_at < <срок>
+                    ORDER BY created_at LIMIT <пачка> FOR UPDATE SKIP LOCKED),
+         deleted AS (DELETE FROM t USING doomed WHERE t.id = doomed.id RETURNING t.*)
+    SELECT ... FROM deleted
+
+С archive строки не пропадают, а переносятся в {таблица}_archive (без индексов).
+Удалённые непрочитанные уведомления вычитаются из unread_notifications_count.
+
+NotificationActor (отправители групп уведомлений) нужны, только пока окно
+группировки открыто: они хранятся на сутки дольше NOTIFICATION_GROUP_WINDOW.
+
+PostView — ключи уникальных просмотров в режиме UNIQUE_VIEWS_MODE = 'exact':
+после удаления старых строк зритель снова посчитается, а views постов
+больше не сверяются с таблицей (posts/reconcile.py).
+"""
+import math
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import counters
+from . import notification_reads
+from . import notification_stream
+from . import partitions
+from .models import Notification, NotificationActor, PostView
+
+# Строк в одной пачке удаления
+BATCH_SIZE = 5000
+
+
+class Policy:
+    """Срок хранения таблицы: model, настройка с числом дней и значение по умолчанию"""
+
+    def __init__(self, name, model, setting, default_days):
+        self.name = name
+        self.model = model
+        self.setting = setting
+        self.default_days = default_days
+
+    @property
+    def table(self):
+        return self.model._meta.db_table
+
+    @property
+    def days(self):
+        return getattr(settings, self.setting, self.default_days)
+
+    def cutoff(self, days=None):
+        """Момент, старше которого строки удаляются; None — хранить всё"""
+        days = self.days if days is None else days
+        if not days:
+            return None
+        return timezone.now() - timedelta(days=days)
+
+    def returning(self, alias):
+        """SQL-выражение по удаляемой строке, значения которого передаются в deleted()"""
+        return 'NULL'
+
+    def deleted(self, counts):
+        """Вызывается в транзакции удаления: counts — {значение returning(): число строк}"""
+
+
+class NotificationPolicy(Policy):
+    """Удалённые непрочитанные уведомления вычитаются из счётчиков получателей"""
+
+    def returning(self, alias):
+        return f'CASE WHEN {notification_reads.unread_sql(alias)} THEN {alias}.recipient_id END'
+
+    def deleted(self, counts):
+        from users.models import User
+
+        by_count = defaultdict(list)
+        for recipient_id, count in counts.items():
+            if recipient_id is not None:
+                by_count[count].append(recipient_id)
+        for count, recipient_ids in by_count.items():
+            counters.increment_many(User, recipient_ids, unread_notifications_count=-count)
+            notification_stream.publish(recipient_ids, notification_stream.READ)
+
+
+class ActorPolicy(Policy):
+    """По умолчанию — окно группировки уведомлений плюс сутки"""
+
+    @property
+    def days(self):
+        window_days = math.ceil(getattr(settings, 'NOTIFICATION_GROUP_WINDOW', 24) / 24)
+        return getattr(settings, self.setting, window_days + 1)
+
+
+POLICIES = {
+    'notifications': NotificationPolicy('notifications', Notification, 'NOTIFICATION_RETENTION_DAYS', 180),
+    'post_views': Policy('post_views', PostView, 'POST_VIEW_RETENTION_DAYS', 0),
+    'notification_actors': ActorPolicy('notification_actors', NotificationActor, 'NOTIFICATION_ACTOR_RETENTION_DAYS', None),
+}
+
+
+def archive_table(policy, cursor):
+    name = f'{policy.table}_archive'
+    cursor.execute(f'CREATE TABLE IF NOT EXISTS {name} (LIKE {policy.table} INCLUDING DEFAULTS)')
+    return name
+
+
+def count_expired(policy, cutoff):
+    return policy.model.objects.filter(created_at__lt=cutoff).count()
+
+
+def drop_expired_partitions(policy, cutoff, archive=False):
+    """Удаляет помесячные секции, целиком старше cutoff; возвращает [(имя, строк)]"""
+    if not partitions.is_partitioned(policy.model):
+        return []
+
+    dropped = []
+    for month, name in partitions.monthly_partitions(policy.model):
+        if partitions.add_months(month, 1) > cutoff:
+            break
+        rows = []
+
+        def before_drop(cursor, name=name, rows=rows):
+            cursor.execute(f'SELECT {policy.returning("p")} AS value, COUNT(*) FROM {name} p GROUP BY value')
+            counts = dict(cursor.fetchall())
+            rows.append(sum(counts.values()))
+            policy.deleted(counts)
+            if archive:
+                cursor.execute(f'INSERT INTO {archive_table(policy, cursor)} SELECT * FROM {name}')
+
+        if partitions.drop_partition(policy.model, name, before_drop):
+            dropped.append((name, rows[0]))
+    return dropped
+
+
+def delete_batch(policy, cutoff, batch_size=BATCH_SIZE, archive=False):
+    """Удаляет (или переносит в архив) одну пачку строк старше cutoff; возвращает число строк"""
+    table = policy.table
+    with transaction.atomic(), connection.cursor() as cursor:
+        archived = ''
+        if archive:
+            archived = f', archived AS (INSERT INTO {archive_table(policy, cursor)} SELECT * FROM deleted)'
+        cursor.execute(
+            f'WITH doomed AS ('
+            f'SELECT id FROM {table} WHERE created_at < %s ORDER BY created_at LIMIT %s FOR UPDATE SKIP LOCKED'
+            f'), deleted AS ('
+            f'DELETE FROM {table} t USING doomed WHERE t.id = doomed.id RETURNING t.*'
+            f'){archived} SELECT {policy.returning("d")} FROM deleted d',
+            [cutoff, batch_size],
+        )
+        values = [row[0] for row in cursor.fetchall()]
+        policy.deleted(Counter(values))
+    return len(values)
+
+
+def prune(policy, cutoff, batch_size=BATCH_SIZE, archive=False, pause=0, progress=None):
+    """
+    Удаляет всё старше cutoff: сначала секции, затем пачки.
+    progress(rows) вызывается после каждой пачки; возвращает (секции, строк всего).
+    """
+    dropped = drop_expired_partitions(policy, cutoff, archive)
+    total = sum(rows for name, rows in dropped)
+    while True:
+        deleted = delete_batch(policy, cutoff, batch_size, archive)
+        total += deleted
+        if progress is not None and deleted:
+            progress(deleted)
+        if deleted < batch_size:
+            return dropped, total
+        if pause:
+            # Даём репликам и autovacuum догнать
+            time.sleep(pause)
@@ -0,0 +1,122 @@
+"""
+Поиск по постам:
+- полнотекстовый (PostgreSQL tsvector + GIN индекс)
+  вес полей: title (A) > filename, теги (B) > description (C) > code (D);
+- поиск подстрок и регулярок внутри кода (pg_trgm GIN индекс по Post.code).
+"""
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import F, OuterRef, Subquery
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.settings import api_settings
+
+from .models import Post
+
+# 'simple' не применяет стемминг — подходит для идентификаторов в коде
+# и для смешанного русско-английского текста
+SEARCH_CONFIG = 'simple'
+
+
+def build_search_vector():
+    """Выражение для вычисления взвешенного поискового вектора поста"""
+    tag_names = Post.tags.through.objects.filter(
+        post_id=OuterRef('pk')
+    ).values('post_id').annotate(
+        names=StringAgg('tag__name', delimiter=' ')
+    ).values('names')
+
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('filename', weight='B', config=SEARCH_CONFIG)
+        + SearchVector(Subquery(tag_names), weight='B', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='C', config=SEARCH_CONFIG)
+        + SearchVector('code', weight='D', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vector(queryset):
+    """Пересчитывает search_vector одним UPDATE для всех постов из queryset"""
+    return Post.objects.filter(
+        pk__in=queryset.values('pk')
+    ).update(search_vector=build_search_vector())
+
+
+class PostFullTextSearchFilter(BaseFilterBackend):
+    """
+    Поиск по ?search= через search_vector с ранжированием по ts_rank.
+    Если явно передан ?ordering=, сортировку не меняем.
+    """
+    search_param = api_settings.SEARCH_PARAM
+
+    def filter_queryset(self, request, queryset, view):
+        terms = request.query_params.get(self.search_param, '').strip()
+        if not terms:
+            return queryset
+
+        query = SearchQuery(terms, search_type='websearch', config=SEARCH_CONFIG)
+        queryset = queryset.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        )
+
+        if request.query_params.get(api_settings.ORDERING_PARAM):
+            return queryset
+        return queryset.order_by('-search_rank', '-created_at')
+
+
+# =============================
+# Поиск по коду
+# =============================
+# Жёсткие лимиты, чтобы патологический запрос не раздул ответ
+CODE_SEARCH_MIN_LENGTH = 3  # trigram индекс работает от 3 символов
+CODE_SEARCH_MAX_LENGTH = 200
+CODE_SEARCH_MAX_MATCHES = 20  # совпадений на один пост
+CODE_SEARCH_MAX_CONTEXT = 5
+CODE_SEARCH_MAX_LINE_LENGTH = 500
+CODE_SEARCH_TIMEOUT_MS = 3000
+
+
+def find_code_lines(post_ids, query, regex=False, limit=CODE_SEARCH_MAX_MATCHES):
+    """
+    Возвращает {post_id: [номера строк]} для строк кода, содержащих query.
+    Одним запросом на страницу; на пост не больше limit + 1 строк
+    (лишняя строка нужна, чтобы понять, что совпадения обрезаны).
+    """
+    if not post_ids:
+        return {}
+    
+    condition = 'l.line ~ %s' if regex else 'strpos(l.line, %s) > 0'
+    sql = f"""
+        SELECT hits.id, hits.n FROM (
+            SELECT p.id, l.n,
+                   row_number() OVER (PARTITION BY p.id ORDER BY l.n) AS rn
+            FROM {Post._meta.db_table} p
+            CROSS JOIN LATERAL regexp_split_to_table(p.code, E'\\n')
+                WITH ORDINALITY AS l(line, n)
+            WHERE p.id = ANY(%s) AND {condition}
+        ) hits
+        WHERE hits.rn <= %s
+        ORDER BY hits.id, hits.n
+    """
+    result = {}
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [list(post_ids), query, limit + 1])
+        for post_id, line_number in cursor.fetchall():
+            result.setdefault(post_id, []).append(line_number)
+    return result
+
+
+def build_code_matches(code, line_numbers, context=2, limit=CODE_SEARCH_MAX_MATCHES):
+    """Собирает совпадения с несколькими строками контекста вокруг каждой"""
+    lines = code.split('\n')
+    matches = []
+    for line_number in line_numbers[:limit]:
+        index = line_number - 1
+        start = max(index - context, 0)
+        end = min(index + context + 1, len(lines))
+        matches.append({
+            'line': line_number,
+            'start_line': start + 1,
+            'lines': [line[:CODE_SEARCH_MAX_LINE_LENGTH] for line in lines[start:end]],
+        })
+    return matches
@@ -1,10 +1,52 @@
 """
 Сериализаторы для постов
 """
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+from django.utils.functional import cached_property
 from rest_framework import serializers
 from .models import Post, Tag, Like, Bookmark, Comment, Notification
-from users.serializers import UserSerializer
+from . import comment_tree
+from . import notification_reads
+from users.serializers import UserSerializer, fast_serialization_enabled, user_to_dict
+
+
+def datetime_to_str(value, tz):
+    """Дата как у DRF DateTimeField (ISO 8601 в текущем часовом поясе)"""
+    if value is None:
+        return None
+    value = value.astimezone(tz).isoformat() if tz is not None else value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def prefetched_tags(post):
+    """Теги из prefetch_related без создания менеджера на каждый пост"""
+    cache = getattr(post, '_prefetched_objects_cache', {})
+    if 'tags' in cache:
+        return cache['tags']
+    return post.tags.all()
+
+
+class FastPathMixin:
+    """Общие помощники быстрого пути сериализации"""
+    
+    @cached_property
+    def current_timezone(self):
+        # Часовой пояс берём один раз на сериализатор, а не на каждый объект
+        return timezone.get_current_timezone() if settings.USE_TZ else None
+
+
+def tag_to_dict(tag):
+    """Быстрое представление тега (поля TagSerializer)"""
+    return {
+        'id': str(tag.id),
+        'name': tag.name,
+        'color': tag.color,
+        'usage_count': tag.usage_count,
+    }
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -14,6 +56,11 @@ class TagSerializer(serializers.ModelSerializer):
         model = Tag
         fields = ['id', 'name', 'color', 'usage_count']
         read_only_fields = ['id', 'usage_count']
+    
+    def to_representation(self, instance):
+        if fast_serialization_enabled():
+            return tag_to_dict(instance)
+        return super().to_representation(instance)
 
 
 class CommentSerializer(serializers.ModelSerializer):
@@ -37,17 +84,19 @@ class CommentSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'author', 'created_at', 'updated_at']
     
     def get_replies_count(self, obj):
-        return obj.replies.count()
+        # Денормализованный счётчик (см. сигналы комментариев)
+        return obj.replies_count
     
     def get_replies(self, obj):
         # Ограничиваем глубину вложенности через контекст
         depth = self.context.get('depth', 0)
-        max_depth = 5  # Максимальная глубина вложенности
         
-        if depth >= max_depth:
+        if depth >= comment_tree.MAX_DEPTH:
             return []
         
-        replies = obj.replies.select_related('author').order_by('created_at')[:20]
+        replies = getattr(obj, 'thread_replies', None)
+        if replies is None:
+            replies = obj.replies.select_related('author').order_by('created_at')[:comment_tree.REPLIES_PER_LEVEL]
         # Передаём увеличенную глубину в дочерний сериализатор
         serializer = CommentSerializer(
             replies, 
@@ -57,13 +106,38 @@ class CommentSerializer(serializers.ModelSerializer):
         return serializer.data
 
 
-class PostListSerializer(serializers.ModelSerializer):
+class ViewerStateFieldsMixin:
+    """
+    is_liked / is_bookmarked для текущего пользователя.
+    Берёт готовые множества id из контекста (см. posts/viewer_state.py),
+    без них делает запрос на каждый пост.
+    """
+    
+    def get_is_liked(self, obj):
+        liked_ids = self.context.get('liked_post_ids')
+        if liked_ids is not None:
+            return obj.pk in liked_ids
+        request = self.context.get('request')
+        if request and request.user.is_authenticated:
+            return Like.objects.filter(user=request.user, post=obj).exists()
+        return False
+    
+    def get_is_bookmarked(self, obj):
+        bookmarked_ids = self.context.get('bookmarked_post_ids')
+        if bookmarked_ids is not None:
+            return obj.pk in bookmarked_ids
+        request = self.context.get('request')
+        if request and request.user.is_authenticated:
+            return Bookmark.objects.filter(user=request.user, post=obj).exists()
+        return False
+
+
+class PostListSerializer(FastPathMixin, ViewerStateFieldsMixin, serializers.ModelSerializer):
     """Сериализатор для списка постов (краткая информация)"""
     author = UserSerializer(read_only=True)
     tags = TagSerializer(many=True, read_only=True)
     is_liked = serializers.SerializerMethodField()
     is_bookmarked = serializers.SerializerMethodField()
-    code_preview = serializers.SerializerMethodField()
     
     class Meta:
         model = Post
@@ -83,29 +157,67 @@ class PostListSerializer(serializers.ModelSerializer):
             'is_liked',
             'is_bookmarked',
             'code_preview',
+            'code_lines',
+            'code_size',
         ]
         read_only_fields = fields
     
-    def get_is_liked(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return Like.objects.filter(user=request.user, post=obj).exists()
-        return False
+    def to_representation(self, instance):
+        """Быстрый путь: dict из предзагруженных author и tags"""
+        if not fast_serialization_enabled():
+            return super().to_representation(instance)
+        return {
+            'id': str(instance.id),
+            'author': user_to_dict(instance.author),
+            'title': instance.title,
+            'filename': instance.filename,
+            'language': instance.language,
+            'description': instance.description,
+            'tags': [tag_to_dict(tag) for tag in prefetched_tags(instance)],
+            'views': instance.views,
+            'likes_count': instance.likes_count,
+            'comments_count': instance.comments_count,
+            'bookmarks_count': instance.bookmarks_count,
+            'created_at': datetime_to_str(instance.created_at, self.current_timezone),
+            'is_liked': self.get_is_liked(instance),
+            'is_bookmarked': self.get_is_bookmarked(instance),
+            'code_preview': instance.code_preview,
+            'code_lines': instance.code_lines,
+            'code_size': instance.code_size,
+        }
+
+
+class CodeSearchResultSerializer(serializers.ModelSerializer):
+    """Результат поиска по коду: строки с совпадениями вместо всего кода"""
+    author = UserSerializer(read_only=True)
+    matches = serializers.SerializerMethodField()
+    matches_truncated = serializers.SerializerMethodField()
     
-    def get_is_bookmarked(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return Bookmark.objects.filter(user=request.user, post=obj).exists()
-        return False
+    class Meta:
+        model = Post
+        fields = [
+            'id',
+            'author',
+            'title',
+            'filename',
+            'language',
+            'created_at',
+            'matches',
+            'matches_truncated',
+        ]
+        read_only_fields = fields
+    
+    def get_matches(self, obj):
+        from .search import build_code_matches
+        line_numbers = self.context.get('line_hits', {}).get(obj.id, [])
+        return build_code_matches(obj.code, line_numbers, context=self.context.get('context_lines', 2))
     
-    def get_code_preview(self, obj):
-        """Возвращает первые 500 символов кода для превью"""
-        if obj.code:
-            return obj.code[:500]
-        return ""
+    def get_matches_truncated(self, obj):
+        from .search import CODE_SEARCH_MAX_MATCHES
+        return len(self.context.get('line_hits', {}).get(obj.id, [])) > CODE_SEARCH_MAX_MATCHES
 
 
-class PostDetailSerializer(serializers.ModelSerializer):
+class PostDetailSerializer(ViewerStateFieldsMixin, serializers.ModelSerializer):
     """Детальный сериализатор поста (с кодом)"""
     author = UserSerializer(read_only=True)
     tags = TagSerializer(many=True, read_only=True)
@@ -146,18 +258,6 @@ class PostDetailSerializer(serializers.ModelSerializer):
             'updated_at',
         ]
     
-    def get_is_liked(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return Like.objects.filter(user=request.user, post=obj).exists()
-        return False
-    
-    def get_is_bookmarked(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return Bookmark.objects.filter(user=request.user, post=obj).exists()
-        return False
-
 
 class PostCreateSerializer(serializers.ModelSerializer):
     """Сериализатор для создания поста"""
@@ -182,18 +282,20 @@ class PostCreateSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         tag_names = validated_data.pop('tags', [])
-        post = Post.objects.create(**validated_data)
-        
-        # Создаём или получаем теги
-        for tag_name in tag_names:
-            tag_name = tag_name.lower().strip()
-            if tag_name:
-                tag, created = Tag.objects.get_or_create(name=tag_name)
-                # Увеличиваем счётчик использования
-                Tag.objects.filter(pk=tag.pk).update(
-                    usage_count=models.F('usage_count') + 1
-                )
-                post.tags.add(tag)
+        # Пост, теги и задача рассылки подписчикам (posts/fanout_jobs.py) — одним коммитом
+        with transaction.atomic():
+            post = Post.objects.create(**validated_data)
+            
+            # Создаём или получаем теги
+            for tag_name in tag_names:
+                tag_name = tag_name.lower().strip()
+                if tag_name:
+                    tag, created = Tag.objects.get_or_create(name=tag_name)
+                    # Увеличиваем счётчик использования
+                    Tag.objects.filter(pk=tag.pk).update(
+                        usage_count=models.F('usage_count') + 1
+                    )
+                    post.tags.add(tag)
         
         return post
     
@@ -273,11 +375,13 @@ class PostRevisionSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
 
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(FastPathMixin, serializers.ModelSerializer):
     """Сериализатор для уведомлений"""
     sender = UserSerializer(read_only=True)
     post_title = serializers.SerializerMethodField()
     post_id = serializers.SerializerMethodField()
+    is_read = serializers.SerializerMethodField()
+    recent_senders = serializers.SerializerMethodField()
     
     class Meta:
         model = Notification
@@ -289,9 +393,41 @@ class NotificationSerializer(serializers.ModelSerializer):
             'post_title',
             'message',
             'is_read',
+            'actors_count',
+            'recent_senders',
             'created_at',
         ]
-        read_only_fields = ['id', 'sender', 'notification_type', 'post_id', 'post_title', 'created_at']
+        read_only_fields = [
+            'id', 'sender', 'notification_type', 'post_id', 'post_title',
+            'is_read', 'actors_count', 'recent_senders', 'created_at',
+        ]
+    
+    def to_representation(self, instance):
+        if not fast_serialization_enabled():
+            return super().to_representation(instance)
+        return {
+            'id': str(instance.id),
+            'sender': user_to_dict(instance.sender),
+            'notification_type': instance.notification_type,
+            'post_id': self.get_post_id(instance),
+            'post_title': self.get_post_title(instance),
+            'message': instance.message,
+            'is_read': self.get_is_read(instance),
+            'actors_count': instance.actors_count,
+            'recent_senders': [user_to_dict(user) for user in self._recent_senders(instance)],
+            'created_at': datetime_to_str(instance.created_at, self.current_timezone),
+        }
+    
+    def get_is_read(self, obj):
+        # Флаг строки или отметка «прочитано всё» получателя
+        return notification_reads.is_read(obj)
+    
+    def _recent_senders(self, obj):
+        # Загружены заранее (notification_groups.attach_recent_senders) — без запроса
+        return getattr(obj, 'recent_senders', None) or [obj.sender]
+    
+    def get_recent_senders(self, obj):
+        return UserSerializer(self._recent_senders(obj), many=True).data
     
     def get_post_title(self, obj):
         if obj.post:
@@ -1,11 +1,24 @@
 """
 Django signals для обновления счётчиков и создания уведомлений
 """
-from django.db.models.signals import post_save, post_delete
+from django.conf import settings
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
 from django.dispatch import receiver
-from django.db.models import F
 
-from .models import Like, Bookmark, Comment, Post, PostView, Notification
+from . import cache as response_cache
+from . import counters
+from . import fanout_jobs
+from . import notification_groups
+from . import notification_reads
+from . import notification_stream
+from . import stats
+from . import trending
+from .models import Like, Bookmark, Comment, Post, PostView, Notification, Tag
+from .search import update_search_vector
+from .view_buffer import views_flushed
+
+# Поля поста, от которых зависит search_vector
+SEARCH_FIELDS = {'title', 'filename', 'description', 'code'}
 
 
 # =============================
@@ -15,26 +28,19 @@ from .models import Like, Bookmark, Comment, Post, PostView, Notification
 def like_created(sender, instance, created, **kwargs):
     """Увеличиваем likes_count при создании лайка и создаём уведомление"""
     if created:
-        Post.objects.filter(pk=instance.post_id).update(
-            likes_count=F('likes_count') + 1
-        )
+        counters.increment(Post, instance.post_id, likes_count=1)
         
-        # Создаём уведомление (если лайк не от автора поста)
-        post = instance.post
-        if post.author != instance.user:
-            Notification.objects.create(
-                recipient=post.author,
-                sender=instance.user,
-                notification_type='like',
-                post=post
-            )
+        # Создаём уведомление (если лайк не от автора поста).
+        # Сравниваем id, чтобы не загружать автора
+        author_id = instance.post.author_id
+        if author_id != instance.user_id:
+            # Лайки поста за окно собираются в одно уведомление (posts/notification_groups.py)
+            notification_groups.notify(author_id, instance.user_id, 'like', instance.post_id)
 
 @receiver(post_delete, sender=Like)
 def like_deleted(sender, instance, **kwargs):
     """Уменьшаем likes_count при удалении лайка"""
-    Post.objects.filter(pk=instance.post_id, likes_count__gt=0).update(
-        likes_count=F('likes_count') - 1
-    )
+    counters.increment(Post, instance.post_id, likes_count=-1)
 
 
 # =============================
@@ -44,16 +50,12 @@ def like_deleted(sender, instance, **kwargs):
 def bookmark_created(sender, instance, created, **kwargs):
     """Увеличиваем bookmarks_count при создании закладки"""
     if created:
-        Post.objects.filter(pk=instance.post_id).update(
-            bookmarks_count=F('bookmarks_count') + 1
-        )
+        counters.increment(Post, instance.post_id, bookmarks_count=1)
 
 @receiver(post_delete, sender=Bookmark)
 def bookmark_deleted(sender, instance, **kwargs):
     """Уменьшаем bookmarks_count при удалении закладки"""
-    Post.objects.filter(pk=instance.post_id, bookmarks_count__gt=0).update(
-        bookmarks_count=F('bookmarks_count') - 1
-    )
+    counters.increment(Post, instance.post_id, bookmarks_count=-1)
 
 
 # =============================
@@ -61,11 +63,11 @@ def bookmark_deleted(sender, instance, **kwargs):
 # =============================
 @receiver(post_save, sender=Comment)
 def comment_created(sender, instance, created, **kwargs):
-    """Увеличиваем comments_count при создании комментария и создаём уведомления"""
+    """Увеличиваем comments_count (и replies_count родителя) при создании комментария и создаём уведомления"""
     if created:
-        Post.objects.filter(pk=instance.post_id).update(
-            comments_count=F('comments_count') + 1
-        )
+        counters.increment(Post, instance.post_id, comments_count=1)
+        if instance.parent_id:
+            counters.increment(Comment, instance.parent_id, replies_count=1)
         
         post = instance.post
         
@@ -95,10 +97,10 @@ def comment_created(sender, instance, created, **kwargs):
 
 @receiver(post_delete, sender=Comment)
 def comment_deleted(sender, instance, **kwargs):
-    """Уменьшаем comments_count при удалении комментария"""
-    Post.objects.filter(pk=instance.post_id, comments_count__gt=0).update(
-        comments_count=F('comments_count') - 1
-    )
+    """Уменьшаем comments_count (и replies_count родителя) при удалении комментария"""
+    counters.increment(Post, instance.post_id, comments_count=-1)
+    if instance.parent_id:
+        counters.increment(Comment, instance.parent_id, replies_count=-1)
 
 
 # =============================
@@ -108,9 +110,23 @@ def comment_deleted(sender, instance, **kwargs):
 def view_created(sender, instance, created, **kwargs):
     """Увеличиваем views при создании просмотра"""
     if created:
-        Post.objects.filter(pk=instance.post_id).update(
-            views=F('views') + 1
-        )
+        counters.increment(Post, instance.post_id, views=1)
+
+
+@receiver(views_flushed)
+def views_flushed_update(sender, counts, when, **kwargs):
+    """
+    Пачка просмотров из буфера: views уже увеличены в write_views,
+    обновляем рейтинги, статистику и кэш так же, как для одиночных PostView
+    """
+    for post_id, count in counts.items():
+        trending.record_engagement(post_id, trending.VIEW_WEIGHT * count)
+    stats.record(when, views=sum(counts.values()))
+    response_cache.invalidate(
+        response_cache.POSTS,
+        response_cache.STATS,
+        debounce=response_cache.VIEW_INVALIDATION_DEBOUNCE
+    )
 
 
 # =============================
@@ -118,29 +134,207 @@ def view_created(sender, instance, created, **kwargs):
 # =============================
 @receiver(post_save, sender=Post)
 def post_created_notify_followers(sender, instance, created, **kwargs):
-    """Уведомляем подписчиков о новом посте автора"""
+    """Ставим в очередь рассылку нового поста подписчикам (уведомления и ленты)"""
     if created and instance.is_public:
-        from users.models import Follow
-        
-        # Получаем всех подписчиков автора
-        follower_ids = Follow.objects.filter(
-            following=instance.author
-        ).values_list('follower_id', flat=True)
-        
-        # Создаём уведомления для каждого подписчика
-        notifications = [
-            Notification(
-                recipient_id=follower_id,
-                sender=instance.author,
-                notification_type='new_post',
-                post=instance,
-                message=f'Новый пост: {instance.title[:50]}'
-            )
-            for follower_id in follower_ids
-        ]
-        
-        if notifications:
-            Notification.objects.bulk_create(notifications)
+        fanout_jobs.enqueue(instance)
+
+
+# =============================
+# Notification signals - счётчик непрочитанных и SSE-поток
+# =============================
+@receiver(post_save, sender=Notification)
+def notification_created(sender, instance, created, **kwargs):
+    """Увеличиваем unread_notifications_count получателя и будим его SSE-соединения"""
+    if created and not instance.is_read:
+        from users.models import User
+        counters.increment(User, instance.recipient_id, unread_notifications_count=1)
+    if created:
+        notification_stream.publish([instance.recipient_id])
+
+
+@receiver(post_delete, sender=Notification)
+def notification_deleted(sender, instance, **kwargs):
+    """Удалённое непрочитанное уведомление больше не считается"""
+    if not notification_reads.is_read(instance):
+        from users.models import User
+        counters.increment(User, instance.recipient_id, unread_notifications_count=-1)
+        notification_stream.publish([instance.recipient_id], notification_stream.READ)
+
+
+# =============================
+# Search vector signals
+# =============================
+@receiver(post_save, sender=Post)
+def post_search_vector_update(sender, instance, update_fields=None, **kwargs):
+    """Пересчитываем search_vector при изменении текстовых полей поста"""
+    if update_fields is not None and not SEARCH_FIELDS & set(update_fields):
+        return
+    update_search_vector(Post.objects.filter(pk=instance.pk))
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def post_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Пересчитываем search_vector при изменении тегов поста"""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    
+    if not reverse:
+        update_search_vector(Post.objects.filter(pk=instance.pk))
+    elif pk_set:
+        update_search_vector(Post.objects.filter(pk__in=pk_set))
+
+
+@receiver(post_save, sender=Tag)
+def tag_renamed(sender, instance, created, **kwargs):
+    """Переименование тега меняет search_vector всех его постов"""
+    if not created:
+        update_search_vector(instance.posts.all())
+
+
+# =============================
+# Trending signals
+# =============================
+@receiver([post_save, post_delete], sender=Like)
+def like_changed_trending(sender, instance, created=None, **kwargs):
+    """Лайк добавляет вес в трендовый рейтинг, удаление лайка — вычитает (с затуханием)"""
+    if created is None:
+        trending.record_engagement(instance.post_id, -trending.LIKE_WEIGHT, instance.created_at)
+    elif created:
+        trending.record_engagement(instance.post_id, trending.LIKE_WEIGHT)
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def comment_changed_trending(sender, instance, created=None, **kwargs):
+    if created is None:
+        trending.record_engagement(instance.post_id, -trending.COMMENT_WEIGHT, instance.created_at)
+    elif created:
+        trending.record_engagement(instance.post_id, trending.COMMENT_WEIGHT)
+
+
+@receiver(post_save, sender=PostView)
+def view_created_trending(sender, instance, created, **kwargs):
+    if created:
+        trending.record_engagement(instance.post_id, trending.VIEW_WEIGHT)
+
+
+@receiver(post_save, sender=Post)
+def post_created_trending(sender, instance, created, **kwargs):
+    """Новый пост сразу попадает в рейтинги (теги добавятся через m2m_changed)"""
+    if created:
+        trending.ensure_entries(instance)
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def post_tags_changed_trending(sender, instance, action, reverse, **kwargs):
+    if action == 'post_add' and not reverse:
+        trending.ensure_entries(instance)
+
+
+# =============================
+# Platform stats rollup
+# =============================
+@receiver([post_save, post_delete], sender=Like)
+def like_changed_stats(sender, instance, created=None, **kwargs):
+    if created is None or created:
+        stats.record(instance.created_at, likes=1 if created else -1)
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def comment_changed_stats(sender, instance, created=None, **kwargs):
+    if created is None or created:
+        stats.record(instance.created_at, comments=1 if created else -1)
+
+
+@receiver(post_save, sender=PostView)
+def view_created_stats(sender, instance, created, **kwargs):
+    if created:
+        stats.record(instance.created_at, views=1)
+
+
+@receiver(pre_save, sender=Post)
+def post_visibility_before_save(sender, instance, update_fields=None, **kwargs):
+    """Запоминаем прежний is_public, чтобы учесть смену видимости"""
+    if instance._state.adding or (update_fields is not None and 'is_public' not in update_fields):
+        instance._was_public = None
+        return
+    instance._was_public = Post.objects.filter(pk=instance.pk).values_list('is_public', flat=True).first()
+
+
+@receiver(post_save, sender=Post)
+def post_saved_stats(sender, instance, created, **kwargs):
+    if created:
+        if instance.is_public:
+            stats.record(instance.created_at, posts=1)
+        if not Post.objects.filter(author_id=instance.author_id).exclude(pk=instance.pk).exists():
+            stats.record_total(authors=1)
+        return
+    
+    was_public = getattr(instance, '_was_public', None)
+    if was_public is not None and was_public != instance.is_public:
+        stats.record(instance.created_at, posts=1 if instance.is_public else -1)
+
+
+@receiver(pre_delete, sender=Post)
+def post_views_before_delete(sender, instance, **kwargs):
+    """views в памяти может отставать: счётчик увеличивается UPDATE'ом"""
+    instance._views_before_delete = Post.objects.filter(pk=instance.pk).values_list('views', flat=True).first() or 0
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted_stats(sender, instance, **kwargs):
+    stats.record_total(views=-getattr(instance, '_views_before_delete', instance.views))
+    if instance.is_public:
+        stats.record(instance.created_at, posts=-1)
+    if not Post.objects.filter(author_id=instance.author_id).exists():
+        stats.record_total(authors=-1)
+
+
+# =============================
+# Response cache invalidation
+# =============================
+@receiver([post_save, post_delete], sender=Like)
+@receiver([post_save, post_delete], sender=Comment)
+def engagement_changed_invalidate_cache(sender, created=True, **kwargs):
+    """Лайки и комментарии меняют счётчики в списках и статистику"""
+    if created:
+        response_cache.invalidate(response_cache.POSTS, response_cache.STATS)
+
+
+@receiver([post_save, post_delete], sender=Bookmark)
+def bookmark_changed_invalidate_cache(sender, created=True, **kwargs):
+    if created:
+        response_cache.invalidate(response_cache.POSTS)
+
+
+@receiver(post_save, sender=PostView)
+def view_created_invalidate_cache(sender, created, **kwargs):
+    """Просмотры частые — сбрасываем кэш не чаще раза в VIEW_INVALIDATION_DEBOUNCE"""
+    if created:
+        response_cache.invalidate(
+            response_cache.POSTS,
+            response_cache.STATS,
+            debounce=response_cache.VIEW_INVALIDATION_DEBOUNCE
+        )
+
+
+@receiver([post_save, post_delete], sender=Post)
+def post_changed_invalidate_cache(sender, **kwargs):
+    response_cache.invalidate(response_cache.POSTS, response_cache.TAGS, response_cache.STATS)
+
+
+@receiver([post_save, post_delete], sender=Tag)
+@receiver(m2m_changed, sender=Post.tags.through)
+def tags_changed_invalidate_cache(sender, action=None, **kwargs):
+    if action is None or action in ('post_add', 'post_remove', 'post_clear'):
+        response_cache.invalidate(response_cache.POSTS, response_cache.TAGS)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def author_changed_invalidate_cache(sender, update_fields=None, **kwargs):
+    """Автор (имя, аватар) входит в карточки постов; вход в систему не считаем"""
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    response_cache.invalidate(response_cache.POSTS)
 
 
 # =============================
@@ -0,0 +1,134 @@
+"""
+Роллап статистики платформы
+
+Вместо агрегатов по всем таблицам на каждый запрос сигналы увеличивают
+счётчики в PlatformStats: строку итогов ('total') и строку дня события.
+Строку итогов меняет каждый лайк, комментарий и просмотр платформы,
+поэтому изменения идут через шарды счётчиков (posts/counters.py)
+и переносятся в строки периодическим сбросом.
+День считается в часовом поясе TIME_ZONE (Asia/Almaty), а не в UTC.
+Команда reconcile_platform_stats пересчитывает счётчики из исходных таблиц.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from . import counters
+from .models import PlatformStats, Post, Like, Comment, PostView
+
+TOTAL = 'total'
+
+# {bucket: pk строки PlatformStats} — строки не удаляются, кэш живёт до перезапуска
+_bucket_ids = {}
+
+
+def day_bucket(value=None):
+    """Ключ дня для момента value (или сейчас) в локальном часовом поясе"""
+    return timezone.localdate(value).isoformat()
+
+
+def bucket_id(bucket):
+    """pk строки периода; строка создаётся при первом обращении"""
+    if bucket in _bucket_ids:
+        return _bucket_ids[bucket]
+    pk = PlatformStats.objects.filter(bucket=bucket).values_list('pk', flat=True).first()
+    if pk is None:
+        try:
+            with transaction.atomic():
+                pk = PlatformStats.objects.create(bucket=bucket).pk
+        except IntegrityError:
+            # Строку успели создать параллельно
+            pk = PlatformStats.objects.get(bucket=bucket).pk
+        if connection.in_atomic_block:
+            # Внешнюю транзакцию могут откатить вместе с новой строкой
+            return pk
+    _bucket_ids[bucket] = pk
+    return pk
+
+
+def record(when, **deltas):
+    """Прибавляет deltas к итогам и к дню события when (одна вставка в шарды)"""
+    counters.increment_many(PlatformStats, [bucket_id(TOTAL), bucket_id(day_bucket(when))], **deltas)
+
+
+def record_total(**deltas):
+    """Прибавляет deltas только к итогам"""
+    counters.increment(PlatformStats, bucket_id(TOTAL), **deltas)
+
+
+def day_range(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def day_views(day):
+    """Уникальные просмотры за день: строки PostView или скетчи в режиме 'hll'"""
+    from .unique_views import hll_enabled, day_total
+
+    if hll_enabled():
+        return day_total(day)
+    start, end = day_range(day)
+    return PostView.objects.filter(created_at__gte=start, created_at__lt=end).count()
+
+
+def _write(bucket, values):
+    """Точные значения периода; незаписанные изменения в шардах уже учтены в них"""
+    with transaction.atomic():
+        row, created = PlatformStats.objects.update_or_create(bucket=bucket, defaults=values)
+        counters.discard_pending(PlatformStats, row.pk, *values)
+    _bucket_ids[bucket] = row.pk
+
+
+def reconcile(days=1):
+    """Пересчитывает итоги и последние days дней из исходных таблиц"""
+    _write(
+        TOTAL,
+        {
+            'likes': Like.objects.count(),
+            'comments': Comment.objects.count(),
+            'views': Post.objects.aggregate(total=Sum('views'))['total'] or 0,
+            'posts': Post.objects.filter(is_public=True).count(),
+            'authors': Post.objects.values('author').distinct().count(),
+        },
+    )
+
+    today = timezone.localdate()
+    for offset in range(days):
+        day = today - timedelta(days=offset)
+        start, end = day_range(day)
+        _write(
+            day.isoformat(),
+            {
+                'likes': Like.objects.filter(created_at__gte=start, created_at__lt=end).count(),
+                'comments': Comment.objects.filter(created_at__gte=start, created_at__lt=end).count(),
+                'views': day_views(day),
+                'posts': Post.objects.filter(
+                    is_public=True, created_at__gte=start, created_at__lt=end
+                ).count(),
+            },
+        )
+
+
+def get_stats():
+    """Итоги и счётчики за сегодня — две строки и их незаписанные изменения"""
+    today = day_bucket()
+    rows = {row.bucket: row for row in PlatformStats.objects.filter(bucket__in=[TOTAL, today])}
+    if TOTAL not in rows:
+        # Роллап ещё не заполнен — считаем один раз
+        reconcile()
+        rows = {row.bucket: row for row in PlatformStats.objects.filter(bucket__in=[TOTAL, today])}
+
+    counters.apply_pending(rows.values())
+    total = rows[TOTAL]
+    day = rows.get(today, PlatformStats(bucket=today))
+    return {
+        'total_likes': total.likes,
+        'total_comments': total.comments,
+        'total_views': total.views,
+        'today_likes': day.likes,
+        'today_comments': day.comments,
+        'total_posts': total.posts,
+        'total_users': total.authors,
+    }
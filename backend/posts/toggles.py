@@ -0,0 +1,114 @@
+"""
+Лайки и закладки за один запрос к БД
+
+Раньше клик по лайку стоил 6–8 запросов: get_object_or_404, get_or_create,
+перечитывание поста и автора в сигнале и refresh_from_db для счётчика.
+Теперь вставка (или удаление) и чтение счётчика поста с учётом
+незаписанных шардов — один SQL-оператор:
+
+    WITH post AS (SELECT id, author_id, likes_count FROM posts_post WHERE id = ...),
+         changed AS (INSERT INTO posts_like ... SELECT ... FROM post
+                     ON CONFLICT (user_id, post_id) DO NOTHING RETURNING id, created_at)
+    SELECT post.author_id, post.likes_count + <шарды>, changed.id, changed.created_at ...
+
+Сигналы post_save / post_delete отправляются вручную с уже заполненными
+объектами (пост с author_id в кэше связи), поэтому обработчики
+(счётчик, уведомление, рейтинги, статистика, кэш) не перечитывают пост.
+"""
+import uuid
+
+from django.db import connection, transaction
+from django.db.models.signals import post_save, post_delete
+
+from . import counters
+from .models import Post, Like, Bookmark, CounterShard
+
+# Модель реакции -> счётчик поста
+COUNTER_FIELDS = {
+    Like: 'likes_count',
+    Bookmark: 'bookmarks_count',
+}
+
+
+def _pending_sql(field):
+    """Подзапрос суммы незаписанных шардов счётчика поста"""
+    if not counters.sharded_enabled():
+        return '0', []
+    return (
+        f'(SELECT COALESCE(SUM(delta), 0)::bigint FROM {CounterShard._meta.db_table} '
+        f'WHERE model = %s AND object_id = post.id AND field = %s)',
+        [Post._meta.label_lower, field],
+    )
+
+
+def _instance(model, reaction_id, user, post_id, author_id, created_at):
+    """Объект реакции с постом в кэше связи — обработчики сигналов не делают запросов"""
+    post = Post(id=post_id, author_id=author_id)
+    instance = model(id=reaction_id, user=user, post=post, created_at=created_at)
+    instance._state.adding = False
+    return instance
+
+
+def add_reaction(model, post_id, user):
+    """
+    Ставит лайк / добавляет закладку.
+    Возвращает (создано ли, значение счётчика). Post.DoesNotExist — поста нет.
+    """
+    field = COUNTER_FIELDS[model]
+    table = model._meta.db_table
+    pending_sql, pending_params = _pending_sql(field)
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'WITH post AS (SELECT id, author_id, {field} AS value FROM {Post._meta.db_table} WHERE id = %s), '
+                f'changed AS (INSERT INTO {table} (id, user_id, post_id, created_at) '
+                f'SELECT %s, %s, id, now() FROM post '
+                f'ON CONFLICT (user_id, post_id) DO NOTHING RETURNING id, created_at) '
+                f'SELECT post.author_id, post.value + {pending_sql}, changed.id, changed.created_at '
+                f'FROM post LEFT JOIN changed ON true',
+                [post_id, uuid.uuid4(), user.pk, *pending_params],
+            )
+            row = cursor.fetchone()
+        if row is None:
+            raise Post.DoesNotExist
+
+        author_id, value, reaction_id, created_at = row
+        if reaction_id is None:
+            return False, max(value, 0)
+
+        instance = _instance(model, reaction_id, user, post_id, author_id, created_at)
+        post_save.send(sender=model, instance=instance, created=True, update_fields=None, raw=False, using='default')
+    return True, max(value + 1, 0)
+
+
+def remove_reaction(model, post_id, user):
+    """
+    Убирает лайк / закладку.
+    Возвращает (удалено ли, значение счётчика). Post.DoesNotExist — поста нет.
+    """
+    field = COUNTER_FIELDS[model]
+    table = model._meta.db_table
+    pending_sql, pending_params = _pending_sql(field)
+
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'WITH post AS (SELECT id, author_id, {field} AS value FROM {Post._meta.db_table} WHERE id = %s), '
+                f'changed AS (DELETE FROM {table} WHERE user_id = %s AND post_id IN (SELECT id FROM post) '
+                f'RETURNING id, created_at) '
+                f'SELECT post.author_id, post.value + {pending_sql}, changed.id, changed.created_at '
+                f'FROM post LEFT JOIN changed ON true',
+                [post_id, user.pk, *pending_params],
+            )
+            row = cursor.fetchone()
+        if row is None:
+            raise Post.DoesNotExist
+
+        author_id, value, reaction_id, created_at = row
+        if reaction_id is None:
+            return False, max(value, 0)
+
+        instance = _instance(model, reaction_id, user, post_id, author_id, created_at)
+        post_delete.send(sender=model, instance=instance, using='default', origin=instance)
+    return True, max(value - 1, 0)
@@ -0,0 +1,266 @@
+"""
+Трендовые посты: затухающий рейтинг вовлечённости
+
+score = Σ weight * 0.5 ^ (возраст события / half_life)
+
+- Сигналы лайков, комментариев и просмотров только добавляют строки
+  TrendingDelta (вес и момент события) — без блокировок строк рейтинга.
+  Фоновый fold_deltas() раз в TRENDING_FOLD_INTERVAL секунд забирает их
+  пачками: старый score приводится к текущему моменту и к нему прибавляются
+  затухшие веса (один UPDATE на пачку).
+- Команда update_trending периодически пересчитывает рейтинги из событий,
+  приводя все score к одному моменту, и убирает посты, выпавшие из окна.
+  Пересчёт идёт в одном снимке REPEATABLE READ и удаляет только видимые
+  в нём TrendingDelta — события, закоммиченные позже, доберёт fold_deltas().
+  Пересчёт и fold_deltas() не пересекаются (advisory lock).
+  В режиме UNIQUE_VIEWS_MODE = 'hll' просмотры берутся из дневных скетчей.
+- Рейтинги хранятся по периодам (today/week/month) глобально, по языку
+  и по тегу, поэтому эндпоинт трендов — одно чтение по индексу.
+"""
+from datetime import timedelta
+
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+from django.db.models import F, FloatField, Func, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import unique_views
+from .background import PeriodicFlusher
+from .models import Post, TrendingEntry, TrendingDelta, Like, Comment, PostView
+
+# Период: (окно, период полураспада рейтинга)
+PERIODS = {
+    'today': (timedelta(hours=24), timedelta(hours=6)),
+    'week': (timedelta(days=7), timedelta(days=2)),
+    'month': (timedelta(days=30), timedelta(days=7)),
+}
+
+# Вес событий
+LIKE_WEIGHT = 3.0
+COMMENT_WEIGHT = 5.0
+VIEW_WEIGHT = 1.0
+
+GLOBAL_SCOPE = ''
+
+# Строк TrendingDelta за одну пачку fold_deltas()
+FOLD_BATCH_SIZE = 5000
+# Ключ pg_advisory_lock: пересчёт и перенос изменений по очереди
+REBUILD_LOCK_KEY = 0x7472656e64
+
+
+def language_scope(language):
+    return f'lang:{language}'
+
+
+def tag_scope(tag_name):
+    return f'tag:{tag_name}'
+
+
+def post_scopes(post, tag_names):
+    return [GLOBAL_SCOPE, language_scope(post.language)] + [tag_scope(name) for name in tag_names]
+
+
+def decay_factor(now, field, half_life):
+    """0.5 ^ ((now - field) / half_life) в SQL"""
+    return Func(
+        Value(now),
+        F(field),
+        arg_joiner=' - ',
+        template=f'power(0.5, extract(epoch from (%(expressions)s)) / {half_life.total_seconds()})',
+        output_field=FloatField(),
+    )
+
+
+def record_engagement(post_id, weight, occurred_at=None):
+    """
+    Добавляет событие в рейтинги поста (строки TrendingDelta по периодам).
+    occurred_at — момент события: удаление лайка/комментария вычитает вес,
+    затухший с момента его создания, а не полный. Событие старше окна
+    периода рейтинг периода не меняет.
+    """
+    now = timezone.now()
+    occurred_at = occurred_at or now
+    TrendingDelta.objects.bulk_create([
+        TrendingDelta(period=period, post_id=post_id, weight=weight, occurred_at=occurred_at)
+        for period, (window, half_life) in PERIODS.items()
+        if occurred_at >= now - window
+    ])
+    folder.ensure_started()
+
+
+@contextmanager
+def rebuild_lock():
+    """Сессионный advisory lock: пересчёт и fold_deltas() не идут одновременно"""
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_lock(%s)', [REBUILD_LOCK_KEY])
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_unlock(%s)', [REBUILD_LOCK_KEY])
+
+
+def _half_life_sql(column):
+    """Период полураспада (в секундах) по колонке периода в SQL"""
+    whens = ' '.join(
+        f"WHEN '{period}' THEN {half_life.total_seconds()}"
+        for period, (window, half_life) in PERIODS.items()
+    )
+    return f'(CASE {column} {whens} END)'
+
+
+def fold_deltas():
+    """Переносит накопленные TrendingDelta в рейтинги; возвращает число событий"""
+    deltas = TrendingDelta._meta.db_table
+    entries = TrendingEntry._meta.db_table
+    folded = 0
+    with rebuild_lock():
+        while True:
+            now = timezone.now()
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(
+                    f'WITH batch AS ('
+                    f'  DELETE FROM {deltas} WHERE id IN ('
+                    f'    SELECT id FROM {deltas} ORDER BY id LIMIT %s FOR UPDATE SKIP LOCKED'
+                    f'  ) RETURNING period, post_id, weight, occurred_at'
+                    f'), totals AS ('
+                    f'  SELECT period, post_id, SUM(weight * power(0.5, '
+                    f'    extract(epoch from (%s - occurred_at)) / {_half_life_sql("period")})) AS score, '
+                    f'    count(*) AS events '
+                    f'  FROM batch GROUP BY period, post_id'
+                    f'), folded AS ('
+                    f'  UPDATE {entries} e SET '
+                    f'    score = GREATEST(e.score * power(0.5, '
+                    f'      extract(epoch from (%s - e.decayed_at)) / {_half_life_sql("e.period")}) + t.score, 0), '
+                    f'    decayed_at = %s '
+                    f'  FROM totals t WHERE e.period = t.period AND e.post_id = t.post_id'
+                    f') SELECT COALESCE(SUM(events), 0) FROM totals',
+                    [FOLD_BATCH_SIZE, now, now, now],
+                )
+                events = cursor.fetchone()[0]
+            folded += events
+            if events < FOLD_BATCH_SIZE:
+                return folded
+
+
+folder = PeriodicFlusher(fold_deltas, 'TRENDING_FOLD_INTERVAL', name='trending-folder')
+
+
+def ensure_entries(post):
+    """Создаёт нулевые записи рейтинга для нового поста или новых тегов"""
+    if not post.is_public:
+        return
+    now = timezone.now()
+    scopes = post_scopes(post, post.tags.values_list('name', flat=True))
+    entries = [
+        TrendingEntry(period=period, scope=scope, post=post, score=0, decayed_at=now)
+        for period, (window, half_life) in PERIODS.items()
+        if post.created_at >= now - window
+        for scope in scopes
+    ]
+    TrendingEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+def _event_score(model, since, now, half_life, weight):
+    """Подзапрос: сумма затухающих весов событий поста за окно"""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(
+                post_id=OuterRef('pk'),
+                created_at__gte=since
+            ).values('post_id').annotate(
+                total=Sum(decay_factor(now, 'created_at', half_life))
+            ).values('total')
+        ),
+        Value(0.0),
+    ) * weight
+
+
+def rebuild_period(period):
+    """
+    Полностью пересчитывает рейтинги периода; возвращает число постов.
+    Читатели видят старые рейтинги до коммита.
+    """
+    outermost = not connection.in_atomic_block
+    with rebuild_lock(), transaction.atomic():
+        if outermost:
+            # События и TrendingDelta — из одного снимка: удаляются только изменения
+            # уже учтённых событий, более поздние перенесёт fold_deltas()
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ')
+        return _rebuild_period(period)
+
+
+def _rebuild_period(period):
+    window, half_life = PERIODS[period]
+    now = timezone.now()
+    since = now - window
+
+    posts = Post.objects.filter(
+        is_public=True,
+        created_at__gte=since
+    )
+    trending_score = (
+        _event_score(Like, since, now, half_life, LIKE_WEIGHT)
+        + _event_score(Comment, since, now, half_life, COMMENT_WEIGHT)
+    )
+    view_counts = {}
+    if unique_views.hll_enabled():
+        # Строки PostView не пишутся — просмотры берём из дневных скетчей
+        view_counts = unique_views.decayed_day_counts(posts.values('pk'), since, now, half_life)
+    else:
+        trending_score += _event_score(PostView, since, now, half_life, VIEW_WEIGHT)
+    posts = posts.annotate(
+        trending_score=trending_score
+    ).only('id', 'language').prefetch_related('tags')
+
+    entries = []
+    count = 0
+    for post in posts.iterator(chunk_size=1000):
+        count += 1
+        for scope in post_scopes(post, [tag.name for tag in post.tags.all()]):
+            entries.append(TrendingEntry(
+                period=period,
+                scope=scope,
+                post_id=post.pk,
+                score=post.trending_score + VIEW_WEIGHT * view_counts.get(post.pk, 0),
+                decayed_at=now,
+            ))
+
+    TrendingDelta.objects.filter(period=period).delete()
+    TrendingEntry.objects.bulk_create(
+        entries,
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['period', 'scope', 'post'],
+        update_fields=['score', 'decayed_at'],
+    )
+    # Посты, выпавшие из окна, ставшие приватными или потерявшие тег
+    TrendingEntry.objects.filter(period=period).exclude(decayed_at=now).delete()
+    return count
+
+
+def trending_posts(period, language=None, tag=None):
+    """
+    Посты периода по убыванию рейтинга (чтение по trending_rank_idx).
+    Тег и язык вместе: рейтинг тега, отфильтрованный по языку поста.
+    """
+    window, half_life = PERIODS[period]
+    if tag:
+        scope = tag_scope(tag)
+    elif language:
+        scope = language_scope(language)
+    else:
+        scope = GLOBAL_SCOPE
+
+    queryset = Post.objects.filter(
+        is_public=True,
+        created_at__gte=timezone.now() - window,
+        trending_entries__period=period,
+        trending_entries__scope=scope,
+    )
+    if tag and language:
+        queryset = queryset.filter(language=language)
+    return queryset.order_by('-trending_entries__score', '-created_at')
@@ -0,0 +1,162 @@
+"""
+Уникальные просмотры через HyperLogLog (UNIQUE_VIEWS_MODE = 'hll')
+
+В режиме 'exact' уникальность проверяется по таблице PostView, которая
+растёт на строку за каждого зрителя. В режиме 'hll' строки PostView
+не пишутся: зритель добавляется в скетч поста за всё время и за день
+(PostViewSketch), а Post.views увеличивается на прирост оценки.
+
+Переход: python manage.py build_view_sketches строит скетчи
+из существующих PostView, после чего можно включать UNIQUE_VIEWS_MODE=hll.
+"""
+from collections import defaultdict
+from datetime import date, datetime, time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .hll import HyperLogLog
+from .models import Post, PostView, PostViewSketch
+from .stats import TOTAL, day_bucket
+
+
+def hll_enabled():
+    return getattr(settings, 'UNIQUE_VIEWS_MODE', 'exact') == 'hll'
+
+
+def viewer_id(kind, value):
+    """Значение, которое попадает в скетч: 'user:<id>', 'session:<key>', 'ip:<addr>'"""
+    return f'{kind}:{value}'
+
+
+def post_view_viewer_id(user_id, session_key, ip_address):
+    """viewer_id для строки PostView (те же правила, что в PostView.record_view)"""
+    if user_id:
+        return viewer_id('user', user_id)
+    if session_key:
+        return viewer_id('session', session_key)
+    if ip_address:
+        return viewer_id('ip', ip_address)
+    return None
+
+
+def add_views(keys, when=None):
+    """
+    Добавляет зрителей в скетчи постов.
+    keys — ключи (post_id, kind, value) из view_buffer.view_key.
+    Возвращает {post_id: прирост оценки уникальных просмотров}.
+    """
+    viewers = defaultdict(set)
+    for post_id, kind, value in keys:
+        viewers[post_id].add(viewer_id(kind, value))
+
+    now = timezone.now()
+    buckets = [TOTAL, day_bucket(when or now)]
+    counts = {}
+    with transaction.atomic():
+        # Пост могли удалить, пока просмотр ждал в буфере
+        post_ids = list(Post.objects.filter(pk__in=viewers).values_list('pk', flat=True))
+        PostViewSketch.objects.bulk_create([
+            PostViewSketch(post_id=post_id, bucket=bucket, registers=b'')
+            for post_id in post_ids
+            for bucket in buckets
+        ], ignore_conflicts=True)
+
+        sketches = PostViewSketch.objects.select_for_update().filter(
+            post_id__in=post_ids,
+            bucket__in=buckets
+        ).order_by('post_id', 'bucket')
+
+        changed = []
+        for sketch in sketches:
+            hll = HyperLogLog.from_bytes(sketch.registers)
+            before = hll.count() if sketch.bucket == TOTAL else None
+            if not hll.update(viewers[sketch.post_id]):
+                continue
+            sketch.registers = hll.to_bytes()
+            sketch.updated_at = now
+            changed.append(sketch)
+            if before is not None:
+                delta = hll.count() - before
+                if delta > 0:
+                    counts[sketch.post_id] = delta
+
+        PostViewSketch.objects.bulk_update(changed, ['registers', 'updated_at'])
+        for post_id, delta in counts.items():
+            Post.objects.filter(pk=post_id).update(views=F('views') + delta)
+    return counts
+
+
+def estimates(post_ids, bucket=TOTAL):
+    """Оценки для нескольких постов одним запросом: {post_id: count}"""
+    rows = PostViewSketch.objects.filter(
+        post_id__in=post_ids,
+        bucket=bucket
+    ).values_list('post_id', 'registers')
+    return {post_id: HyperLogLog.from_bytes(registers).count() for post_id, registers in rows}
+
+
+def changed_post_ids(since):
+    """id постов, чьи скетчи обновлялись начиная с since"""
+    return set(
+        PostViewSketch.objects.filter(
+            bucket=TOTAL,
+            updated_at__gte=since
+        ).values_list('post_id', flat=True)
+    )
+
+
+def decayed_day_counts(posts, since, now, half_life):
+    """
+    Затухающая сумма дневных оценок уникальных зрителей постов (queryset posts):
+    {post_id: Σ оценка за день * 0.5 ^ (возраст середины дня / half_life)}.
+    В режиме 'hll' заменяет строки PostView при пересчёте трендов (posts/trending.py).
+    """
+    rows = PostViewSketch.objects.filter(
+        post__in=posts,
+        bucket__gte=day_bucket(since),
+        bucket__lte=day_bucket(now)
+    ).exclude(bucket=TOTAL).values_list('post_id', 'bucket', 'registers')
+
+    counts = defaultdict(float)
+    for post_id, bucket, registers in rows.iterator(chunk_size=500):
+        midday = timezone.make_aware(datetime.combine(date.fromisoformat(bucket), time(12)))
+        age = (now - min(max(midday, since), now)).total_seconds()
+        counts[post_id] += HyperLogLog.from_bytes(registers).count() * 0.5 ** (age / half_life.total_seconds())
+    return counts
+
+
+def day_total(day):
+    """Сумма оценок уникальных просмотров всех постов за день"""
+    rows = PostViewSketch.objects.filter(bucket=day.isoformat()).values_list('registers', flat=True)
+    return sum(HyperLogLog.from_bytes(registers).count() for registers in rows.iterator(chunk_size=500))
+
+
+def build_sketches(post_ids):
+    """
+    Строит скетчи постов (за всё время и по дням) из строк PostView,
+    заменяя существующие. Возвращает число обработанных строк.
+    """
+    sketches = defaultdict(HyperLogLog)
+    rows = PostView.objects.filter(post_id__in=post_ids).values_list(
+        'post_id', 'user_id', 'session_key', 'ip_address', 'created_at'
+    ).order_by()
+
+    processed = 0
+    for post_id, user_id, session_key, ip_address, created_at in rows.iterator(chunk_size=2000):
+        viewer = post_view_viewer_id(user_id, session_key, ip_address)
+        if viewer is None:
+            continue
+        sketches[(post_id, TOTAL)].add(viewer)
+        sketches[(post_id, day_bucket(created_at))].add(viewer)
+        processed += 1
+
+    with transaction.atomic():
+        PostViewSketch.objects.filter(post_id__in=post_ids).delete()
+        PostViewSketch.objects.bulk_create([
+            PostViewSketch(post_id=post_id, bucket=bucket, registers=hll.to_bytes())
+            for (post_id, bucket), hll in sketches.items()
+        ], batch_size=500)
+    return processed
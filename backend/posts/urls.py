@@ -7,11 +7,14 @@ from . import views
 urlpatterns = [
     # Посты
     path('posts/', views.PostListCreateView.as_view(), name='post-list'),
+    path('posts/code-search/', views.CodeSearchView.as_view(), name='post-code-search'),
+    path('posts/state/', views.PostStateView.as_view(), name='post-state'),
     path('posts/<uuid:id>/', views.PostDetailView.as_view(), name='post-detail'),
     path('posts/<uuid:id>/like/', views.PostLikeView.as_view(), name='post-like'),
     path('posts/<uuid:id>/bookmark/', views.PostBookmarkView.as_view(), name='post-bookmark'),
     path('posts/<uuid:id>/comments/', views.PostCommentsView.as_view(), name='post-comments'),
     path('comments/<uuid:id>/', views.CommentDeleteView.as_view(), name='comment-delete'),
+    path('comments/<uuid:id>/replies/', views.CommentRepliesView.as_view(), name='comment-replies'),
     path('posts/<uuid:id>/revisions/', views.PostRevisionsView.as_view(), name='post-revisions'),
     
     # Ревизии
@@ -22,12 +25,19 @@ urlpatterns = [
     
     # Уведомления
     path('notifications/', views.NotificationListView.as_view(), name='notification-list'),
+    path('notifications/unread-count/', views.UnreadNotificationCountView.as_view(), name='notifications-unread-count'),
+    path('notifications/stream/', views.NotificationStreamView.as_view(), name='notifications-stream'),
+    path('notifications/stream/ticket/', views.NotificationStreamTicketView.as_view(), name='notifications-stream-ticket'),
+    path('notifications/read/', views.MarkNotificationsReadBulkView.as_view(), name='notifications-read'),
     path('notifications/read-all/', views.MarkNotificationsReadView.as_view(), name='notifications-read-all'),
     path('notifications/<uuid:id>/read/', views.MarkNotificationReadView.as_view(), name='notification-read'),
     
     # Посты пользователя
     path('users/<str:username>/posts/', views.UserPostsView.as_view(), name='user-posts'),
     
+    # Лента подписок
+    path('feed/', views.FeedView.as_view(), name='feed'),
+    
     # Трендовые и теги
     path('trending/', views.TrendingPostsView.as_view(), name='trending-posts'),
     path('tags/', views.TagListView.as_view(), name='tag-list'),
@@ -0,0 +1,213 @@
+"""
+Буфер просмотров (write-behind)
+
+GET /api/posts/<id>/ больше не пишет в БД: просмотр попадает в буфер
+процесса с дедупликацией по (пост, пользователь / сессия / IP).
+Фоновый поток раз в VIEW_BUFFER_FLUSH_INTERVAL секунд:
+- отбрасывает просмотры, которые уже есть в PostView;
+- вставляет новые PostView (INSERT ... ON CONFLICT DO NOTHING по уникальному
+  ключу зрителя — два процесса с одним зрителем не вставят его дважды);
+- увеличивает views одним UPDATE на пост на число реально вставленных строк;
+- отправляет сигнал views_flushed (рейтинги, статистика, кэш).
+В режиме UNIQUE_VIEWS_MODE = 'hll' вместо PostView обновляются скетчи
+HyperLogLog (posts/unique_views.py).
+
+Буфер ограничен VIEW_BUFFER_MAX_SIZE: при заполнении сброс выполняется
+сразу в потоке запроса. После неудачного сброса (БД недоступна) запросы
+не пытаются сбрасывать синхронно FLUSH_RETRY_MIN..FLUSH_RETRY_MAX секунд
+(удваивая паузу), а просмотры сверх размера буфера отбрасываются.
+При завершении процесса остаток сбрасывается (atexit).
+"""
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.dispatch import Signal
+from django.utils import timezone
+
+from . import unique_views
+from .background import PeriodicFlusher
+from .models import Post, PostView
+
+logger = logging.getLogger(__name__)
+
+# Отправляется после сброса пачки: counts — {post_id: новых просмотров}, when — время сброса
+views_flushed = Signal()
+
+# Строк в одном INSERT
+INSERT_BATCH_SIZE = 1000
+# Пауза перед следующим синхронным сбросом после ошибки, секунды
+FLUSH_RETRY_MIN = 1
+FLUSH_RETRY_MAX = 60
+
+# Поле PostView для каждого вида ключа дедупликации
+KEY_FIELDS = {
+    'user': 'user_id',
+    'session': 'session_key',
+    'ip': 'ip_address',
+}
+
+
+def view_key(post_id, user_id=None, session_key=None, ip_address=None):
+    """Ключ уникальности просмотра — те же правила, что в PostView.record_view"""
+    if user_id:
+        return (post_id, 'user', user_id)
+    if session_key:
+        return (post_id, 'session', session_key)
+    if ip_address:
+        return (post_id, 'ip', ip_address)
+    return None
+
+
+def existing_keys(keys):
+    """Ключи, для которых просмотр уже записан в PostView"""
+    post_ids = {post_id for post_id, kind, value in keys}
+    existing = set()
+    for kind, field in KEY_FIELDS.items():
+        values = {value for post_id, key_kind, value in keys if key_kind == kind}
+        if not values:
+            continue
+        rows = PostView.objects.filter(
+            post_id__in=post_ids,
+            **{f'{field}__in': values}
+        ).values_list('post_id', field)
+        existing.update((post_id, kind, value) for post_id, value in rows)
+    return existing
+
+
+def insert_views(views):
+    """
+    Вставляет просмотры, пропуская уже записанные (уникальные ключи PostView);
+    возвращает {post_id: вставлено строк}
+    """
+    table = PostView._meta.db_table
+    now = timezone.now()
+    counts = Counter()
+    with connection.cursor() as cursor:
+        for start in range(0, len(views), INSERT_BATCH_SIZE):
+            batch = views[start:start + INSERT_BATCH_SIZE]
+            cursor.execute(
+                f'INSERT INTO {table} (id, post_id, user_id, session_key, ip_address, created_at) '
+                f'VALUES {", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(batch))} '
+                f'ON CONFLICT DO NOTHING RETURNING post_id',
+                [
+                    value
+                    for view in batch
+                    for value in (view.id, view.post_id, view.user_id, view.session_key, view.ip_address, now)
+                ],
+            )
+            counts.update(post_id for post_id, in cursor.fetchall())
+    return counts
+
+
+def write_views(pending):
+    """
+    Записывает пачку просмотров {ключ: PostView}; возвращает число новых.
+    В режиме 'hll' вместо строк PostView обновляются скетчи (posts/unique_views.py).
+    """
+    now = timezone.now()
+    if unique_views.hll_enabled():
+        counts = unique_views.add_views(pending.keys(), when=now)
+    else:
+        existing = existing_keys(pending.keys())
+        views = [view for key, view in pending.items() if key not in existing]
+        counts = Counter()
+        if views:
+            with transaction.atomic():
+                counts = insert_views(views)
+                for post_id, count in counts.items():
+                    Post.objects.filter(pk=post_id).update(views=F('views') + count)
+
+    if counts:
+        views_flushed.send(sender=PostView, counts=counts, when=now)
+    return sum(counts.values())
+
+
+class ViewBuffer:
+    """Буфер просмотров одного процесса с фоновым сбросом"""
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        # monotonic-время, до которого запросы не сбрасывают буфер синхронно
+        self._retry_at = 0
+        self._retry_delay = FLUSH_RETRY_MIN
+        self.flusher = PeriodicFlusher(self.flush, 'VIEW_BUFFER_FLUSH_INTERVAL', name='view-buffer-flusher')
+
+    @property
+    def max_size(self):
+        return getattr(settings, 'VIEW_BUFFER_MAX_SIZE', 10000)
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, post_id, user_id=None, session_key=None, ip_address=None):
+        """Добавляет просмотр; False, если он уже в буфере или его не к чему привязать"""
+        key = view_key(post_id, user_id, session_key, ip_address)
+        if key is None:
+            return False
+
+        backing_off = time.monotonic() < self._retry_at
+        with self._lock:
+            if key in self._pending:
+                return False
+            if backing_off and len(self._pending) >= self.max_size:
+                # БД недоступна — не растим буфер без ограничений
+                return False
+            if user_id:
+                view = PostView(post_id=post_id, user_id=user_id)
+            else:
+                view = PostView(post_id=post_id, session_key=session_key, ip_address=ip_address)
+            self._pending[key] = view
+            full = len(self._pending) >= self.max_size
+
+        self.flusher.ensure_started()
+        if full and not backing_off:
+            self.flush()
+        return True
+
+    def flush(self):
+        """Сбрасывает буфер в БД; возвращает число записанных просмотров"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+            try:
+                written = write_views(pending)
+            except Exception:
+                logger.exception('Failed to flush %d buffered views', len(pending))
+                self._requeue(pending)
+                self._retry_at = time.monotonic() + self._retry_delay
+                self._retry_delay = min(self._retry_delay * 2, FLUSH_RETRY_MAX)
+                return 0
+            self._retry_at = 0
+            self._retry_delay = FLUSH_RETRY_MIN
+            return written
+
+    def _requeue(self, pending):
+        # Возвращаем просмотры в буфер, не превышая его размер
+        with self._lock:
+            for key, view in pending.items():
+                if len(self._pending) >= self.max_size:
+                    break
+                self._pending.setdefault(key, view)
+
+
+view_buffer = ViewBuffer()
+
+
+def record_view(post, user=None, ip_address=None, session_key=None):
+    """Записывает уникальный просмотр через буфер (или сразу, если буфер выключен)"""
+    user_id = user.pk if user and user.is_authenticated else None
+    if getattr(settings, 'VIEW_BUFFER_ENABLED', True):
+        return view_buffer.add(post.pk, user_id=user_id, session_key=session_key, ip_address=ip_address)
+    if unique_views.hll_enabled():
+        key = view_key(post.pk, user_id, session_key, ip_address)
+        return key is not None and write_views({key: None}) > 0
+    return PostView.record_view(post, user=user, ip_address=ip_address, session_key=session_key)
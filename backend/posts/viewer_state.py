@@ -0,0 +1,46 @@
+"""
+Состояние текущего пользователя для страницы постов (is_liked / is_bookmarked)
+
+Вместо двух .exists() на каждый пост id лайков и закладок для всей страницы
+загружаются одним запросом на связь и передаются в контекст сериализатора.
+"""
+from . import counters
+from .models import Like, Bookmark
+
+
+def preload_post_viewer_state(posts, user):
+    """Возвращает контекст {'liked_post_ids': set, 'bookmarked_post_ids': set}"""
+    return viewer_state_for_ids([post.pk for post in posts], user)
+
+
+def viewer_state_for_ids(post_ids, user):
+    """То же, что preload_post_viewer_state, но по списку id постов"""
+    if not user or not user.is_authenticated:
+        return {'liked_post_ids': set(), 'bookmarked_post_ids': set()}
+
+    if not post_ids:
+        return {'liked_post_ids': set(), 'bookmarked_post_ids': set()}
+
+    return {
+        'liked_post_ids': set(
+            Like.objects.filter(user=user, post_id__in=post_ids).values_list('post_id', flat=True)
+        ),
+        'bookmarked_post_ids': set(
+            Bookmark.objects.filter(user=user, post_id__in=post_ids).values_list('post_id', flat=True)
+        ),
+    }
+
+
+class PostViewerStateMixin:
+    """
+    Для GET-запросов добавляет состояние пользователя в контекст сериализатора
+    и ещё не сброшенные изменения счётчиков (posts/counters.py).
+    Подключается к любому generic view, отдающему посты.
+    """
+    def get_serializer(self, *args, **kwargs):
+        if args and self.request.method == 'GET':
+            posts = args[0] if kwargs.get('many') else [args[0]]
+            context = kwargs.setdefault('context', self.get_serializer_context())
+            context.update(preload_post_viewer_state(posts, self.request.user))
+            counters.apply_pending(posts)
+        return super().get_serializer(*args, **kwargs)
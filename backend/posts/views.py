@@ -1,11 +1,21 @@
 """
 API Views для постов
 """
+import hashlib
+import json
+import uuid
+
 from rest_framework import generics, status, permissions, filters
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from django.db.models import F
+from django.db import DataError, OperationalError, connection, transaction
+from django.db.models import F, Q
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from django.views import View
 from django_filters.rest_framework import DjangoFilterBackend
 
 from .models import Post, Tag, Like, Bookmark, Comment, Notification
@@ -17,18 +27,36 @@ from .serializers import (
     TagSerializer,
     CommentSerializer,
     NotificationSerializer,
+    CodeSearchResultSerializer,
 )
-
-
-class PostListCreateView(generics.ListCreateAPIView):
+from . import cache as response_cache
+from . import comment_tree
+from . import counters
+from . import notification_groups
+from . import notification_reads
+from . import notification_stream
+from . import search
+from . import stats
+from . import toggles
+from . import trending
+from .pagination import PostListPagination, CommentRepliesPagination
+from .cache import AnonymousResponseCacheMixin
+from .feed import FeedPagination
+from .view_buffer import record_view
+from .viewer_state import PostViewerStateMixin, viewer_state_for_ids
+from .search import PostFullTextSearchFilter
+
+
+class PostListCreateView(AnonymousResponseCacheMixin, PostViewerStateMixin, generics.ListCreateAPIView):
     """
-    GET: Список постов с фильтрацией и поиском
+    GET: Список постов с фильтрацией и полнотекстовым поиском (?search=)
     POST: Создать новый пост (требуется авторизация)
     """
-    queryset = Post.objects.filter(is_public=True).select_related('author').prefetch_related('tags')
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    queryset = Post.objects.filter(is_public=True).for_list()
+    # Поиск идёт после OrderingFilter, чтобы без ?ordering= сортировать по релевантности
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, PostFullTextSearchFilter]
+    pagination_class = PostListPagination
     filterset_fields = ['language', 'author__username']
-    search_fields = ['title', 'filename', 'description', 'code', 'tags__name']
     ordering_fields = ['created_at', 'likes_count', 'views', 'comments_count']
     ordering = ['-created_at']
     
@@ -46,7 +74,80 @@ class PostListCreateView(generics.ListCreateAPIView):
         serializer.save(author=self.request.user)
 
 
-class PostDetailView(generics.RetrieveUpdateDestroyAPIView):
+class CodeSearchView(generics.ListAPIView):
+    """
+    Поиск подстроки (или регулярки при ?regex=true) внутри кода.
+    GET ?q=useEffect(&language=javascript&context=2
+    Возвращает номера строк с контекстом, а не весь код поста.
+    """
+    serializer_class = CodeSearchResultSerializer
+    permission_classes = [permissions.AllowAny]
+    
+    def get_search_params(self):
+        params = self.request.query_params
+        query = params.get('q', '')
+        regex = params.get('regex', 'false').lower() == 'true'
+        try:
+            context = int(params.get('context', 2))
+        except ValueError:
+            context = 2
+        context = min(max(context, 0), search.CODE_SEARCH_MAX_CONTEXT)
+        return query, regex, context
+    
+    def get_queryset(self):
+        query, regex, _ = self.get_search_params()
+        queryset = Post.objects.filter(is_public=True).select_related('author').defer('search_vector')
+        
+        # Индекс pg_trgm используется и для LIKE '%...%', и для оператора ~
+        if regex:
+            queryset = queryset.filter(code__regex=query)
+        else:
+            queryset = queryset.filter(code__contains=query)
+        
+        language = self.request.query_params.get('language')
+        if language:
+            queryset = queryset.filter(language=language)
+        return queryset.order_by('-created_at')
+    
+    def list(self, request, *args, **kwargs):
+        query, regex, context = self.get_search_params()
+        if not search.CODE_SEARCH_MIN_LENGTH <= len(query) <= search.CODE_SEARCH_MAX_LENGTH:
+            return Response(
+                {'detail': f'Длина запроса должна быть от {search.CODE_SEARCH_MIN_LENGTH} '
+                           f'до {search.CODE_SEARCH_MAX_LENGTH} символов'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        try:
+            with transaction.atomic():
+                # Ограничиваем время, чтобы тяжёлая регулярка не держала соединение
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL statement_timeout = %s', [search.CODE_SEARCH_TIMEOUT_MS])
+                page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+                line_hits = search.find_code_lines([post.id for post in page], query, regex=regex)
+        except DataError:
+            return Response(
+                {'detail': 'Некорректное регулярное выражение'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except OperationalError as error:
+            # 57014 query_canceled — сработал statement_timeout
+            if getattr(error.__cause__, 'pgcode', None) != '57014':
+                raise
+            return Response(
+                {'detail': 'Слишком тяжёлый шаблон поиска, упростите его'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        serializer = self.get_serializer(
+            page,
+            many=True,
+            context={**self.get_serializer_context(), 'line_hits': line_hits, 'context_lines': context}
+        )
+        return self.get_paginated_response(serializer.data)
+
+
+class PostDetailView(PostViewerStateMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     GET: Получить пост с кодом (увеличивает счётчик просмотров)
     PUT/PATCH: Обновить пост (только автор)
@@ -67,8 +168,7 @@ class PostDetailView(generics.RetrieveUpdateDestroyAPIView):
     
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
-        # Записываем уникальный просмотр
-        from .models import PostView
+        # Записываем уникальный просмотр (через буфер, см. posts/view_buffer.py)
         
         def get_client_ip(request):
             x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
@@ -76,7 +176,7 @@ class PostDetailView(generics.RetrieveUpdateDestroyAPIView):
                 return x_forwarded_for.split(',')[0]
             return request.META.get('REMOTE_ADDR')
         
-        PostView.record_view(
+        record_view(
             post=instance,
             user=request.user if request.user.is_authenticated else None,
             ip_address=get_client_ip(request),
@@ -109,12 +209,15 @@ class PostLikeView(APIView):
     """
     POST: Лайкнуть пост
     DELETE: Убрать лайк
+    Один SQL-оператор на изменение и актуальный likes_count (см. posts/toggles.py)
     """
     permission_classes = [permissions.IsAuthenticated]
     
     def post(self, request, id):
-        post = get_object_or_404(Post, id=id)
-        like, created = Like.objects.get_or_create(user=request.user, post=post)
+        try:
+            created, likes_count = toggles.add_reaction(Like, id, request.user)
+        except Post.DoesNotExist:
+            raise NotFound()
         
         if not created:
             return Response(
@@ -122,43 +225,44 @@ class PostLikeView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Обновляем объект из БД для получения актуального likes_count
-        post.refresh_from_db()
         return Response({
             'detail': 'Лайк добавлен',
-            'likes_count': post.likes_count,
+            'likes_count': likes_count,
             'is_liked': True
         }, status=status.HTTP_201_CREATED)
     
     def delete(self, request, id):
-        post = get_object_or_404(Post, id=id)
         try:
-            like = Like.objects.get(user=request.user, post=post)
-            like.delete()
-            # Обновляем объект из БД для получения актуального likes_count
-            post.refresh_from_db()
-            return Response({
-                'detail': 'Лайк убран',
-                'likes_count': post.likes_count,
-                'is_liked': False
-            }, status=status.HTTP_200_OK)
-        except Like.DoesNotExist:
+            deleted, likes_count = toggles.remove_reaction(Like, id, request.user)
+        except Post.DoesNotExist:
+            raise NotFound()
+        
+        if not deleted:
             return Response(
                 {'detail': 'Вы не лайкали этот пост'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        
+        return Response({
+            'detail': 'Лайк убран',
+            'likes_count': likes_count,
+            'is_liked': False
+        }, status=status.HTTP_200_OK)
 
 
 class PostBookmarkView(APIView):
     """
     POST: Добавить в закладки
     DELETE: Убрать из закладок
+    Один SQL-оператор на изменение и актуальный bookmarks_count (см. posts/toggles.py)
     """
     permission_classes = [permissions.IsAuthenticated]
     
     def post(self, request, id):
-        post = get_object_or_404(Post, id=id)
-        bookmark, created = Bookmark.objects.get_or_create(user=request.user, post=post)
+        try:
+            created, bookmarks_count = toggles.add_reaction(Bookmark, id, request.user)
+        except Post.DoesNotExist:
+            raise NotFound()
         
         if not created:
             return Response(
@@ -166,24 +270,35 @@ class PostBookmarkView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        return Response({'detail': 'Добавлено в закладки'}, status=status.HTTP_201_CREATED)
+        return Response({
+            'detail': 'Добавлено в закладки',
+            'bookmarks_count': bookmarks_count,
+            'is_bookmarked': True
+        }, status=status.HTTP_201_CREATED)
     
     def delete(self, request, id):
-        post = get_object_or_404(Post, id=id)
         try:
-            bookmark = Bookmark.objects.get(user=request.user, post=post)
-            bookmark.delete()
-            return Response({'detail': 'Убрано из закладок'}, status=status.HTTP_200_OK)
-        except Bookmark.DoesNotExist:
+            deleted, bookmarks_count = toggles.remove_reaction(Bookmark, id, request.user)
+        except Post.DoesNotExist:
+            raise NotFound()
+        
+        if not deleted:
             return Response(
                 {'detail': 'Пост не был в закладках'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        
+        return Response({
+            'detail': 'Убрано из закладок',
+            'bookmarks_count': bookmarks_count,
+            'is_bookmarked': False
+        }, status=status.HTTP_200_OK)
 
 
 class PostCommentsView(generics.ListCreateAPIView):
     """
     GET: Список комментариев к посту
+    (страница корневых комментариев + все их ответы одним запросом, см. posts/comment_tree.py)
     POST: Добавить комментарий
     """
     serializer_class = CommentSerializer
@@ -192,6 +307,11 @@ class PostCommentsView(generics.ListCreateAPIView):
         post_id = self.kwargs['id']
         return Comment.objects.filter(post_id=post_id, parent=None).select_related('author')
     
+    def get_serializer(self, *args, **kwargs):
+        if args and kwargs.get('many') and self.request.method == 'GET':
+            args = (comment_tree.load_threads(args[0]), *args[1:])
+        return super().get_serializer(*args, **kwargs)
+    
     def get_permissions(self):
         if self.request.method == 'POST':
             return [permissions.IsAuthenticated()]
@@ -203,7 +323,43 @@ class PostCommentsView(generics.ListCreateAPIView):
         parent = None
         if parent_id:
             parent = get_object_or_404(Comment, id=parent_id, post=post)
-        serializer.save(author=self.request.user, post=post, parent=parent)
+            if parent.depth >= comment_tree.MAX_NESTING:
+                raise ValidationError({'parent': 'Слишком глубокая ветка ответов'})
+        comment = serializer.save(author=self.request.user, post=post, parent=parent)
+        # У нового комментария ответов нет — сериализатор не делает запросов
+        comment_tree.build_tree([comment], [])
+
+
+class CommentRepliesView(generics.ListAPIView):
+    """
+    Прямые ответы комментария, keyset пагинация по (created_at, id).
+    Каждый ответ — с веткой до MAX_DEPTH (одним запросом, см. comment_tree.load_replies),
+    более глубокие ответы догружаются этим же эндпоинтом.
+    """
+    serializer_class = CommentSerializer
+    pagination_class = CommentRepliesPagination
+    permission_classes = [permissions.AllowAny]
+    
+    def get_parent(self):
+        if not hasattr(self, '_parent'):
+            self._parent = get_object_or_404(Comment, id=self.kwargs['id'])
+        return self._parent
+    
+    def get_queryset(self):
+        return Comment.objects.filter(
+            parent=self.get_parent()
+        ).select_related('author').order_by('created_at')
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        # Глубина ответов в дереве — вложенность ограничивается как в ветке поста
+        context['depth'] = self.get_parent().depth + 1
+        return context
+    
+    def get_serializer(self, *args, **kwargs):
+        if args and kwargs.get('many'):
+            args = (comment_tree.load_replies(self.get_parent(), args[0]), *args[1:])
+        return super().get_serializer(*args, **kwargs)
 
 
 class CommentDeleteView(generics.DestroyAPIView):
@@ -217,28 +373,30 @@ class CommentDeleteView(generics.DestroyAPIView):
         return Comment.objects.filter(author=self.request.user)
 
 
-class UserBookmarksView(generics.ListAPIView):
+class UserBookmarksView(PostViewerStateMixin, generics.ListAPIView):
     """Список закладок текущего пользователя"""
     serializer_class = PostListSerializer
+    pagination_class = PostListPagination
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
         bookmark_ids = Bookmark.objects.filter(
             user=self.request.user
         ).values_list('post_id', flat=True)
-        return Post.objects.filter(id__in=bookmark_ids).select_related('author').prefetch_related('tags')
+        return Post.objects.filter(id__in=bookmark_ids).for_list()
 
 
-class UserPostsView(generics.ListAPIView):
+class UserPostsView(PostViewerStateMixin, generics.ListAPIView):
     """Список постов пользователя"""
     serializer_class = PostListSerializer
+    pagination_class = PostListPagination
     permission_classes = [permissions.AllowAny]
     
     def get_queryset(self):
         username = self.kwargs['username']
         queryset = Post.objects.filter(
             author__username=username
-        ).select_related('author').prefetch_related('tags')
+        ).for_list()
         
         # Показываем приватные только автору
         if not self.request.user.is_authenticated or self.request.user.username != username:
@@ -247,60 +405,87 @@ class UserPostsView(generics.ListAPIView):
         return queryset
 
 
-class TrendingPostsView(generics.ListAPIView):
-    """Трендовые посты за период (последние 24ч/7 дней/30 дней)"""
+class TrendingPostsView(AnonymousResponseCacheMixin, PostViewerStateMixin, generics.ListAPIView):
+    """
+    Трендовые посты за период (последние 24ч/7 дней/30 дней)
+    по затухающему рейтингу из posts/trending.py.
+    Фильтры: ?language=python, ?tag=react
+    """
     serializer_class = PostListSerializer
     permission_classes = [permissions.AllowAny]
     
     def get_queryset(self):
         from django.utils import timezone
-        from datetime import timedelta
+        from .models import TrendingEntry
         
         # Получаем параметры из query params
         period = self.request.query_params.get('period', 'week')  # По умолчанию неделя
         widget = self.request.query_params.get('widget', 'false').lower() == 'true'
+        language = self.request.query_params.get('language')
+        tag = self.request.query_params.get('tag')
         
-        now = timezone.now()
+        if period not in trending.PERIODS:
+            period = 'today'
         
-        # Относительные периоды (последние N часов/дней)
-        if period == 'week':
-            since = now - timedelta(days=7)
-        elif period == 'month':
-            since = now - timedelta(days=30)
-        else:  # today = последние 24 часа
-            since = now - timedelta(hours=24)
+        queryset = trending.trending_posts(period, language=language, tag=tag)
         
+        # Для виджета - только посты с лайками, максимум 3
+        if widget:
+            queryset = queryset.filter(likes_count__gt=0)
+        limit = 3 if widget else 20
+        
+        posts = list(queryset.for_list()[:limit])
+        if posts or TrendingEntry.objects.filter(period=period).exists():
+            return posts
+        
+        # Рейтинг ещё не рассчитан (update_trending не запускалась)
+        window, half_life = trending.PERIODS[period]
         queryset = Post.objects.filter(
             is_public=True,
-            created_at__gte=since
+            created_at__gte=timezone.now() - window
         )
-        
-        # Для виджета - только посты с лайками, максимум 3
+        if language:
+            queryset = queryset.filter(language=language)
+        if tag:
+            queryset = queryset.filter(tags__name=tag)
         if widget:
             queryset = queryset.filter(likes_count__gt=0)
-            return queryset.select_related('author').prefetch_related('tags').order_by('-likes_count', '-views')[:3]
-        
-        return queryset.select_related('author').prefetch_related('tags').order_by('-likes_count', '-views', '-created_at')[:20]
+        return queryset.for_list().order_by('-likes_count', '-views', '-created_at')[:limit]
 
 
-class TagListView(generics.ListAPIView):
+class FeedView(PostViewerStateMixin, generics.ListAPIView):
+    """Лента постов от авторов, на которых подписан пользователь (?cursor=)"""
+    serializer_class = PostListSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def list(self, request, *args, **kwargs):
+        paginator = FeedPagination()
+        page = paginator.paginate_feed(request)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+
+class TagListView(AnonymousResponseCacheMixin, generics.ListAPIView):
     """Список популярных тегов"""
     queryset = Tag.objects.all()[:50]
     serializer_class = TagSerializer
     permission_classes = [permissions.AllowAny]
+    cache_namespaces = (response_cache.TAGS,)
 
 
-class TagPostsView(generics.ListAPIView):
+class TagPostsView(AnonymousResponseCacheMixin, PostViewerStateMixin, generics.ListAPIView):
     """Посты по тегу"""
     serializer_class = PostListSerializer
+    pagination_class = PostListPagination
     permission_classes = [permissions.AllowAny]
+    cache_namespaces = (response_cache.POSTS, response_cache.TAGS)
     
     def get_queryset(self):
         tag_name = self.kwargs['name']
         return Post.objects.filter(
             is_public=True,
             tags__name=tag_name
-        ).select_related('author').prefetch_related('tags')
+        ).for_list()
 
 
 class PostRevisionsView(generics.ListAPIView):
@@ -333,71 +518,208 @@ class NotificationListView(generics.ListAPIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        return Notification.objects.filter(
+        return notification_reads.with_read_state(Notification.objects.filter(
             recipient=self.request.user
-        ).select_related('sender', 'post').order_by('-created_at')[:50]
+        )).select_related('sender', 'post').order_by('-created_at')[:50]
+    
+    def get_serializer(self, *args, **kwargs):
+        if args and kwargs.get('many'):
+            # Последние отправители сгруппированных уведомлений — одним запросом
+            args = (notification_groups.attach_recent_senders(args[0]), *args[1:])
+        return super().get_serializer(*args, **kwargs)
 
 
 class MarkNotificationsReadView(APIView):
-    """Отметить все уведомления как прочитанные"""
+    """
+    Отметить все уведомления как прочитанные:
+    одна запись в строку пользователя (posts/notification_reads.py)
+    """
     permission_classes = [permissions.IsAuthenticated]
     
     def post(self, request):
-        Notification.objects.filter(
-            recipient=request.user,
-            is_read=False
-        ).update(is_read=True)
+        notification_reads.mark_all_read(request.user)
         return Response({'status': 'ok'})
 
 
+class MarkNotificationsReadBulkView(APIView):
+    """
+    POST /api/notifications/read/ {"ids": [<id>, ...]}
+    Отметить выбранные уведомления (до notification_reads.MAX_IDS) как прочитанные
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def post(self, request):
+        raw_ids = request.data.get('ids')
+        if not isinstance(raw_ids, list) or not raw_ids:
+            return Response({'detail': 'Поле ids обязательно'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(raw_ids) > notification_reads.MAX_IDS:
+            return Response(
+                {'detail': f'Не больше {notification_reads.MAX_IDS} уведомлений за запрос'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            ids = list(dict.fromkeys(uuid.UUID(str(value)) for value in raw_ids))
+        except ValueError:
+            return Response({'detail': 'Некорректный id уведомления'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        updated = notification_reads.mark_read(request.user, ids)
+        return Response({'status': 'ok', 'updated': updated})
+
+
 class MarkNotificationReadView(APIView):
     """Отметить одно уведомление как прочитанное"""
     permission_classes = [permissions.IsAuthenticated]
     
     def post(self, request, id):
-        notification = get_object_or_404(
-            Notification, 
-            id=id, 
-            recipient=request.user
-        )
-        notification.is_read = True
-        notification.save()
+        # Сразу условный UPDATE; проверка существования — только если ничего не изменилось
+        if not notification_reads.mark_read(request.user, [id]):
+            get_object_or_404(Notification, id=id, recipient=request.user)
         return Response({'status': 'ok'})
 
 
-class PlatformStatsView(APIView):
-    """Статистика платформы: лайки, комментарии, просмотры"""
-    permission_classes = [permissions.AllowAny]
+class UnreadNotificationCountView(APIView):
+    """
+    GET /api/notifications/unread-count/
+    Число непрочитанных уведомлений для опроса из навбара.
+    Берётся из счётчика пользователя (строка уже загружена аутентификацией)
+    плюс незаписанные шарды; поддерживает ETag / If-None-Match (304).
+    """
+    permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
-        from django.db.models import Sum, Count
-        from datetime import datetime, timedelta
-        from django.utils import timezone
-        
-        # За сегодня
-        today = timezone.now().date()
-        today_start = timezone.make_aware(datetime.combine(today, datetime.min.time()))
-        
-        # Общие данные
-        total_likes = Like.objects.count()
-        total_comments = Comment.objects.count()
-        total_views = Post.objects.aggregate(total=Sum('views'))['total'] or 0
-        
-        # За сегодня
-        today_likes = Like.objects.filter(created_at__gte=today_start).count()
-        today_comments = Comment.objects.filter(created_at__gte=today_start).count()
-        
-        # Посты и пользователи
-        total_posts = Post.objects.filter(is_public=True).count()
-        total_users = Post.objects.values('author').distinct().count()
+        user = request.user
+        pending = counters.pending_for(type(user), [user.pk]).get(user.pk, {})
+        data = {
+            'unread_count': max(user.unread_notifications_count + pending.get('unread_notifications_count', 0), 0)
+        }
         
+        etag = quote_etag(f'unread-{data["unread_count"]}')
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(data)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        patch_vary_headers(response, ['Authorization', 'Cookie'])
+        return response
+
+
+class NotificationStreamView(View):
+    """
+    GET /api/notifications/stream/
+    SSE-поток новых уведомлений и числа непрочитанных (posts/notification_stream.py).
+    DRF не поддерживает асинхронные представления, поэтому это обычный Django View.
+    """
+    http_method_names = ['get']
+    
+    async def get(self, request):
+        user = await notification_stream.run_db(notification_stream.authenticate, request)
+        if user is None:
+            return JsonResponse(
+                {'detail': 'Учетные данные не были предоставлены.'},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+        response = StreamingHttpResponse(
+            notification_stream.event_stream(
+                user.pk,
+                # При переподключении с новым билетом курсор передаётся параметром
+                request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+            ),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        # Прокси (nginx) не должен буферизовать поток
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class NotificationStreamTicketView(APIView):
+    """
+    POST /api/notifications/stream/ticket/
+    Одноразовый билет на открытие SSE-потока: EventSource не передаёт
+    заголовки, а JWT в URL попадал бы в логи и историю браузера
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def post(self, request):
         return Response({
-            'total_likes': total_likes,
-            'total_comments': total_comments,
-            'total_views': total_views,
-            'today_likes': today_likes,
-            'today_comments': today_comments,
-            'total_posts': total_posts,
-            'total_users': total_users,
+            'ticket': notification_stream.issue_ticket(request.user),
+            'expires_in': notification_stream.STREAM_TICKET_MAX_AGE,
         })
 
+
+# GET /api/posts/state/: лимит id и отдаваемые счётчики
+POST_STATE_MAX_IDS = 100
+POST_STATE_COUNTERS = ('likes_count', 'comments_count', 'bookmarks_count', 'views')
+
+
+class PostStateView(APIView):
+    """
+    GET /api/posts/state/?ids=<id>,<id>,...
+    Счётчики и состояние текущего пользователя для уже отрисованных постов
+    (до POST_STATE_MAX_IDS штук) без кода и прочих полей.
+    Фиксированное число запросов: посты, шарды счётчиков, лайки, закладки.
+    Поддерживает ETag / If-None-Match: без изменений отдаёт 304.
+    """
+    permission_classes = [permissions.AllowAny]
+    
+    def get(self, request):
+        raw_ids = [value for value in request.query_params.get('ids', '').split(',') if value]
+        if not raw_ids:
+            return Response({'detail': 'Параметр ids обязателен'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(raw_ids) > POST_STATE_MAX_IDS:
+            return Response(
+                {'detail': f'Не больше {POST_STATE_MAX_IDS} постов за запрос'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            post_ids = list(dict.fromkeys(uuid.UUID(value) for value in raw_ids))
+        except ValueError:
+            return Response({'detail': 'Некорректный id поста'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        visible = Q(is_public=True)
+        if request.user.is_authenticated:
+            visible |= Q(author=request.user)
+        rows = {
+            row['id']: row
+            for row in Post.objects.filter(visible, id__in=post_ids).values('id', *POST_STATE_COUNTERS)
+        }
+        pending = counters.pending_for(Post, rows)
+        viewer_state = viewer_state_for_ids(list(rows), request.user)
+        
+        results = []
+        for post_id in post_ids:
+            row = rows.get(post_id)
+            if row is None:
+                continue
+            deltas = pending.get(post_id, {})
+            item = {'id': str(post_id)}
+            for field in POST_STATE_COUNTERS:
+                item[field] = max(row[field] + deltas.get(field, 0), 0)
+            item['is_liked'] = post_id in viewer_state['liked_post_ids']
+            item['is_bookmarked'] = post_id in viewer_state['bookmarked_post_ids']
+            results.append(item)
+        data = {'results': results}
+        
+        etag = quote_etag(hashlib.md5(json.dumps(data, sort_keys=True).encode()).hexdigest())
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(data)
+        response['ETag'] = etag
+        # Ответ зависит от пользователя: браузер хранит его у себя и перепроверяет
+        response['Cache-Control'] = 'private, no-cache'
+        patch_vary_headers(response, ['Authorization', 'Cookie'])
+        return response
+
+
+class PlatformStatsView(AnonymousResponseCacheMixin, APIView):
+    """Статистика платформы: лайки, комментарии, просмотры (из роллапа posts/stats.py)"""
+    permission_classes = [permissions.AllowAny]
+    cache_namespaces = (response_cache.STATS,)
+    
+    def get(self, request):
+        return self.cached_response(request, self.get_stats)
+    
+    def get_stats(self, request):
+        return Response(stats.get_stats())
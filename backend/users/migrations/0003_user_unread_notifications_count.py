@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:17
+
+from django.db import migrations, models
+
+# Начальные значения счётчика непрочитанных уведомлений одним UPDATE
+BACKFILL_UNREAD_NOTIFICATIONS = """
+UPDATE users_user u SET unread_notifications_count = n.total
+FROM (
+    SELECT recipient_id, COUNT(*) AS total FROM posts_notification
+    WHERE NOT is_read GROUP BY recipient_id
+) n
+WHERE u.id = n.recipient_id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_change_avatar_to_charfield'),
+        ('posts', '0005_add_notification_model'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='unread_notifications_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Непрочитанные уведомления'),
+        ),
+        migrations.RunSQL(BACKFILL_UNREAD_NOTIFICATIONS, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_follow_following_follower_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='notifications_read_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Уведомления прочитаны до'),
+        ),
+    ]
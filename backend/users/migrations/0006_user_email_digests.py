@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 07:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_user_notifications_read_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='digest_sent_until',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Дайджест отправлен до'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='email_digests',
+            field=models.BooleanField(default=True, verbose_name='Email-дайджесты уведомлений'),
+        ),
+    ]
@@ -75,6 +75,28 @@ class User(AbstractUser):
         default=0,
         verbose_name='Посты'
     )
+    unread_notifications_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Непрочитанные уведомления'
+    )
+    # Отметка «прочитано всё»: уведомления, созданные не позже неё,
+    # считаются прочитанными (posts/notification_reads.py)
+    notifications_read_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Уведомления прочитаны до'
+    )
+    # Email-дайджесты (posts/email_digests.py): уведомления, созданные
+    # не позже digest_sent_until, уже попали в отправленный дайджест
+    email_digests = models.BooleanField(
+        default=True,
+        verbose_name='Email-дайджесты уведомлений'
+    )
+    digest_sent_until = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Дайджест отправлен до'
+    )
     
     class Meta:
         verbose_name = 'Пользователь'
@@ -121,23 +143,24 @@ class Follow(models.Model):
         verbose_name_plural = 'Подписки'
         unique_together = ['follower', 'following']
         ordering = ['-created_at']
+        indexes = [
+            # Подписчики автора по возрастанию id — курсор рассылки (posts/fanout_jobs.py)
+            models.Index(fields=['following', 'follower'], name='follow_following_follower_idx'),
+        ]
     
     def __str__(self):
         return f'{self.follower.username} -> {self.following.username}'
     
     def save(self, *args, **kwargs):
         """Обновляем счётчики при сохранении"""
-        is_new = self.pk is None
+        is_new = self._state.adding
         super().save(*args, **kwargs)
         
         if is_new:
-            # Увеличиваем счётчики
-            User.objects.filter(pk=self.follower.pk).update(
-                following_count=models.F('following_count') + 1
-            )
-            User.objects.filter(pk=self.following.pk).update(
-                followers_count=models.F('followers_count') + 1
-            )
+            # Увеличиваем счётчики (через шарды, см. posts/counters.py)
+            from posts.counters import increment
+            increment(User, self.follower_id, following_count=1)
+            increment(User, self.following_id, followers_count=1)
     
     def delete(self, *args, **kwargs):
         """Обновляем счётчики при удалении"""
@@ -146,9 +169,6 @@ class Follow(models.Model):
         super().delete(*args, **kwargs)
         
         # Уменьшаем счётчики
-        User.objects.filter(pk=follower_id).update(
-            following_count=models.F('following_count') - 1
-        )
-        User.objects.filter(pk=following_id).update(
-            followers_count=models.F('followers_count') - 1
-        )
+        from posts.counters import increment
+        increment(User, follower_id, following_count=-1)
+        increment(User, following_id, followers_count=-1)
@@ -2,11 +2,33 @@
 Сериализаторы для пользователей
 """
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
 
+def fast_serialization_enabled():
+    """
+    Быстрый путь сериализации для горячих read-сериализаторов:
+    dict собирается напрямую из полей модели, минуя механизм полей DRF.
+    JSON на выходе совпадает с обычным путём байт в байт
+    (проверяется командой bench_serializers).
+    """
+    return getattr(settings, 'FAST_SERIALIZATION', True)
+
+
+def user_to_dict(user):
+    """Быстрое представление пользователя (поля UserSerializer)"""
+    return {
+        'id': str(user.id),
+        'username': user.username,
+        'display_name': user.display_name,
+        'avatar': user.avatar,
+        'is_verified': user.is_verified,
+    }
+
+
 class UserSerializer(serializers.ModelSerializer):
     """Базовый сериализатор пользователя (для списков, комментариев и т.д.)"""
     
@@ -20,6 +42,11 @@ class UserSerializer(serializers.ModelSerializer):
             'is_verified',
         ]
         read_only_fields = fields
+    
+    def to_representation(self, instance):
+        if fast_serialization_enabled():
+            return user_to_dict(instance)
+        return super().to_representation(instance)
 
 
 class UserDetailSerializer(serializers.ModelSerializer):
@@ -60,6 +87,9 @@ class UserDetailSerializer(serializers.ModelSerializer):
     
     def get_is_following(self, obj):
         """Проверяем, подписан ли текущий пользователь"""
+        following_ids = self.context.get('following_user_ids')
+        if following_ids is not None:
+            return obj.pk in following_ids
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             from .models import Follow
@@ -70,6 +100,13 @@ class UserDetailSerializer(serializers.ModelSerializer):
         return False
 
 
+class CurrentUserSerializer(UserDetailSerializer):
+    """Профиль текущего пользователя: плюс личные настройки, не видные другим"""
+    
+    class Meta(UserDetailSerializer.Meta):
+        fields = UserDetailSerializer.Meta.fields + ['email_digests']
+
+
 class UserProfileUpdateSerializer(serializers.ModelSerializer):
     """Сериализатор для обновления профиля"""
     
@@ -83,6 +120,7 @@ class UserProfileUpdateSerializer(serializers.ModelSerializer):
             'website',
             'github_username',
             'twitter_username',
+            'email_digests',
         ]
     
     def validate_github_username(self, value):
@@ -1,7 +1,7 @@
 """
 Django signals для пользователей - создание уведомлений о подписках и OAuth
 """
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from allauth.account.signals import user_logged_in
 from rest_framework_simplejwt.tokens import RefreshToken
@@ -16,16 +16,28 @@ logger = logging.getLogger(__name__)
 def follow_created(sender, instance, created, **kwargs):
     """Создаём уведомление при подписке на пользователя"""
     if created:
-        # Импортируем Notification здесь чтобы избежать циклического импорта
-        from posts.models import Notification
+        # Импортируем здесь чтобы избежать циклического импорта
+        from posts import notification_groups
         
-        # Не создаём уведомление если пользователь подписывается сам на себя
-        if instance.follower != instance.following:
-            Notification.objects.create(
-                recipient=instance.following,
-                sender=instance.follower,
-                notification_type='follow'
-            )
+        # Не создаём уведомление если пользователь подписывается сам на себя.
+        # Подписки за окно собираются в одно уведомление
+        if instance.follower_id != instance.following_id:
+            notification_groups.notify(instance.following_id, instance.follower_id, 'follow')
+
+
+@receiver(post_save, sender=Follow)
+def follow_created_backfill_feed(sender, instance, created, **kwargs):
+    """Добавляем последние посты автора в ленту нового подписчика"""
+    if created:
+        from posts.feed import backfill_follow
+        backfill_follow(instance.follower_id, instance.following)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted_trim_feed(sender, instance, **kwargs):
+    """Убираем посты автора из ленты после отписки"""
+    from posts.feed import trim_unfollow
+    trim_unfollow(instance.follower_id, instance.following_id)
 
 
 @receiver(user_logged_in)
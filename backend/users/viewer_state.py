@@ -0,0 +1,42 @@
+"""
+Состояние текущего пользователя для профилей (is_following)
+
+id пользователей, на которых подписан текущий пользователь, загружаются
+одним запросом и передаются в контекст сериализатора.
+"""
+from .models import Follow
+
+
+def preload_following_ids(users, viewer):
+    """Возвращает контекст {'following_user_ids': set}"""
+    if not viewer or not viewer.is_authenticated:
+        return {'following_user_ids': set()}
+
+    user_ids = [user.pk for user in users]
+    if not user_ids:
+        return {'following_user_ids': set()}
+
+    return {
+        'following_user_ids': set(
+            Follow.objects.filter(
+                follower=viewer,
+                following_id__in=user_ids
+            ).values_list('following_id', flat=True)
+        ),
+    }
+
+
+class FollowingStateMixin:
+    """
+    Для GET-запросов добавляет following_user_ids в контекст сериализатора
+    и ещё не сброшенные изменения счётчиков (posts/counters.py)
+    """
+    def get_serializer(self, *args, **kwargs):
+        if args and self.request.method == 'GET':
+            from posts.counters import apply_pending
+            
+            users = args[0] if kwargs.get('many') else [args[0]]
+            context = kwargs.setdefault('context', self.get_serializer_context())
+            context.update(preload_following_ids(users, self.request.user))
+            apply_pending(users)
+        return super().get_serializer(*args, **kwargs)
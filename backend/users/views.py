@@ -8,12 +8,18 @@ from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
 
 from .models import Follow
-from .serializers import UserDetailSerializer, UserProfileUpdateSerializer, UserSerializer
+from .serializers import (
+    CurrentUserSerializer,
+    UserDetailSerializer,
+    UserProfileUpdateSerializer,
+    UserSerializer,
+)
+from .viewer_state import FollowingStateMixin
 
 User = get_user_model()
 
 
-class UserProfileView(generics.RetrieveUpdateAPIView):
+class UserProfileView(FollowingStateMixin, generics.RetrieveUpdateAPIView):
     """
     GET: Получить профиль пользователя по username
     PUT/PATCH: Обновить свой профиль
@@ -129,7 +135,7 @@ class FollowUserView(APIView):
 
 class CurrentUserView(generics.RetrieveAPIView):
     """Получить данные текущего авторизованного пользователя"""
-    serializer_class = UserDetailSerializer
+    serializer_class = CurrentUserSerializer
     permission_classes = [permissions.IsAuthenticated]
     
     def get_object(self):
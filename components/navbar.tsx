@@ -45,18 +45,22 @@ export function Navbar() {
 
     const fetchUnread = async () => {
       try {
-        const notifications = await notificationsAPI.list()
-        const unread = notifications.filter((n: any) => !n.is_read).length
-        setUnreadCount(unread)
+        setUnreadCount(await notificationsAPI.unreadCount())
       } catch (err) {
         console.error("Error fetching notifications:", err)
       }
     }
 
     fetchUnread()
-    // Refresh every 30 seconds
-    const interval = setInterval(fetchUnread, 30000)
-    return () => clearInterval(interval)
+    // Push через SSE; опрос раз в 30 секунд — только пока поток не подключён
+    const stream = notificationsAPI.stream({ onUnreadCount: setUnreadCount })
+    const interval = setInterval(() => {
+      if (!stream || !stream.isOpen()) fetchUnread()
+    }, 30000)
+    return () => {
+      clearInterval(interval)
+      stream?.close()
+    }
   }, [isAuthenticated])
 
   // Keyboard shortcut for search (Cmd+K)
@@ -19,9 +19,12 @@ import {
 import { toast } from "sonner"
 import { cn } from "@/lib/utils"
 import { useLanguage } from "@/contexts/LanguageContext"
+import { useAuth } from "@/contexts/AuthContext"
+import { usersAPI } from "@/lib/api"
 
 export function SettingsNotifications() {
   const { t } = useLanguage()
+  const { user, refreshUser } = useAuth()
   const [saving, setSaving] = useState(false)
   const [notifications, setNotifications] = useState({
     emailLikes: true,
@@ -46,6 +49,14 @@ export function SettingsNotifications() {
     }
   }, [])
 
+  // Флаг дайджеста хранится в профиле — он главнее localStorage
+  useEffect(() => {
+    const emailDigests = user?.email_digests
+    if (emailDigests !== undefined) {
+      setNotifications((prev) => ({ ...prev, emailDigest: emailDigests }))
+    }
+  }, [user?.email_digests])
+
   const toggleNotification = (key: keyof typeof notifications) => {
     setNotifications({ ...notifications, [key]: !notifications[key] })
   }
@@ -94,12 +105,21 @@ export function SettingsNotifications() {
 
   const handleSave = async () => {
     setSaving(true)
-    await new Promise((resolve) => setTimeout(resolve, 500))
-
     localStorage.setItem("gitforum-notifications", JSON.stringify(notifications))
 
-    setSaving(false)
-    toast.success(t.settingsPage.notificationsSaved)
+    try {
+      // Дайджест отправляет сервер — флаг хранится в профиле
+      if (user) {
+        await usersAPI.updateProfile(user.username, { email_digests: notifications.emailDigest })
+        await refreshUser()
+      }
+      toast.success(t.settingsPage.notificationsSaved)
+    } catch (err) {
+      console.error("Error saving notification settings:", err)
+      toast.error(t.settingsPage.profileSaveError)
+    } finally {
+      setSaving(false)
+    }
   }
 
   const NotificationItem = ({
@@ -141,6 +141,7 @@ export const translations = {
             mentioned: 'упомянул(-а) вас',
             replied: 'ответил(-а) на ваш комментарий',
             newPost: 'опубликовал(-а) новый пост',
+            andOthers: 'и ещё',
             loading: 'Загрузка...',
             allMarkedRead: 'Все уведомления прочитаны',
             updateError: 'Ошибка при обновлении',
@@ -923,6 +924,7 @@ export const translations = {
             mentioned: 'сізді атап өтті',
             replied: 'пікіріңізге жауап берді',
             newPost: 'жаңа пост жариялады',
+            andOthers: 'және тағы',
             loading: 'Жүктелуде...',
             allMarkedRead: 'Барлық хабарламалар оқылды',
             updateError: 'Жаңарту қатесі',
@@ -22,6 +22,7 @@ export interface User {
     posts_count: number;
     date_joined: string;
     is_following?: boolean;
+    email_digests?: boolean;
 }
 
 export interface Tag {
@@ -75,6 +76,17 @@ export interface PostRevision {
     created_at: string;
 }
 
+/** Счётчики и состояние пользователя для поста (GET /posts/state/) */
+export interface PostState {
+    id: string;
+    likes_count: number;
+    comments_count: number;
+    bookmarks_count: number;
+    views: number;
+    is_liked: boolean;
+    is_bookmarked: boolean;
+}
+
 export interface PaginatedResponse<T> {
     count: number;
     next: string | null;
@@ -301,6 +313,10 @@ export interface PostFilters {
     search?: string;
     ordering?: string;
     author__username?: string;
+    // Keyset пагинация: 'cursor' включает курсоры, `cursor` берётся из `next`.
+    // В этом режиме `count` в ответе не возвращается.
+    pagination?: 'page' | 'cursor';
+    cursor?: string;
 }
 
 export interface CreatePostData {
@@ -397,6 +413,15 @@ export const postsAPI = {
         return fetchAPI<PaginatedResponse<Comment>>(`/posts/${id}/comments/`);
     },
 
+    /**
+     * Ответы на комментарий (keyset пагинация).
+     * Следующая страница: передайте cursor из поля `next`.
+     */
+    getReplies: async (commentId: string, cursor?: string): Promise<Omit<PaginatedResponse<Comment>, 'count'>> => {
+        const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+        return fetchAPI<Omit<PaginatedResponse<Comment>, 'count'>>(`/comments/${commentId}/replies/${query}`);
+    },
+
     /**
      * Добавить комментарий
      */
@@ -438,6 +463,14 @@ export const postsAPI = {
         return fetchAPI('/stats/');
     },
 
+    /**
+     * Свежие счётчики и is_liked / is_bookmarked для уже загруженных постов
+     * (до 100 id). Сервер отдаёт ETag, браузер сам перепроверяет ответ (304).
+     */
+    state: async (ids: string[]): Promise<{ results: PostState[] }> => {
+        return fetchAPI<{ results: PostState[] }>(`/posts/state/?ids=${ids.map(encodeURIComponent).join(',')}`);
+    },
+
     /**
      * Закладки текущего пользователя
      */
@@ -445,6 +478,15 @@ export const postsAPI = {
         return fetchAPI<PaginatedResponse<Post>>('/bookmarks/');
     },
 
+    /**
+     * Лента постов от авторов, на которых подписан пользователь.
+     * Следующая страница: передайте cursor из поля `next`.
+     */
+    feed: async (cursor?: string): Promise<Omit<PaginatedResponse<Post>, 'count'>> => {
+        const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : '';
+        return fetchAPI<Omit<PaginatedResponse<Post>, 'count'>>(`/feed/${query}`);
+    },
+
     /**
      * История изменений поста
      */
@@ -616,9 +658,21 @@ export interface Notification {
     post_title: string | null;
     message: string;
     is_read: boolean;
+    // Сгруппированные уведомления: число отправителей и последние из них
+    actors_count: number;
+    recent_senders: User[];
     created_at: string;
 }
 
+// Открытый SSE-поток уведомлений
+export interface NotificationStream {
+    isOpen: () => boolean;
+    close: () => void;
+}
+
+// Пауза перед переподключением потока (мс)
+const STREAM_RETRY_MS = 3000;
+
 export const notificationsAPI = {
     /**
      * Получить уведомления
@@ -631,6 +685,83 @@ export const notificationsAPI = {
         return response.results || [];
     },
 
+    /**
+     * Число непрочитанных уведомлений.
+     * Сервер отдаёт ETag, браузер сам перепроверяет ответ (304).
+     */
+    unreadCount: async (): Promise<number> => {
+        const response = await fetchAPI<{ unread_count: number }>('/notifications/unread-count/');
+        return response.unread_count;
+    },
+
+    /**
+     * SSE-поток: новые уведомления и число непрочитанных.
+     * EventSource не передаёт заголовки, поэтому перед каждым подключением
+     * берётся одноразовый билет (JWT в URL попадал бы в логи). По той же причине
+     * переподключение делаем сами: новый билет и last_event_id вместо Last-Event-ID.
+     * Возвращает null без авторизации или без поддержки EventSource.
+     */
+    stream: (handlers: {
+        onNotification?: (notification: Notification) => void;
+        onUnreadCount?: (count: number) => void;
+    }): NotificationStream | null => {
+        if (!accessToken || typeof EventSource === 'undefined') {
+            return null;
+        }
+        let source: EventSource | null = null;
+        let lastEventId = '';
+        let closed = false;
+        let retry: ReturnType<typeof setTimeout> | null = null;
+
+        const reconnect = () => {
+            source?.close();
+            source = null;
+            if (!closed) {
+                retry = setTimeout(connect, STREAM_RETRY_MS);
+            }
+        };
+
+        const connect = async () => {
+            let ticket: string;
+            try {
+                ({ ticket } = await fetchAPI<{ ticket: string }>('/notifications/stream/ticket/', { method: 'POST' }));
+            } catch {
+                reconnect();
+                return;
+            }
+            if (closed) {
+                return;
+            }
+            const params = new URLSearchParams({ ticket });
+            if (lastEventId) {
+                params.set('last_event_id', lastEventId);
+            }
+            source = new EventSource(`${API_URL}/notifications/stream/?${params}`);
+            source.addEventListener('notification', (event) => {
+                lastEventId = (event as MessageEvent).lastEventId || lastEventId;
+                handlers.onNotification?.(JSON.parse((event as MessageEvent).data));
+            });
+            source.addEventListener('unread_count', (event) => {
+                lastEventId = (event as MessageEvent).lastEventId || lastEventId;
+                handlers.onUnreadCount?.(JSON.parse((event as MessageEvent).data).unread_count);
+            });
+            // Билет одноразовый — встроенное переподключение EventSource не пройдёт
+            source.onerror = reconnect;
+        };
+
+        connect();
+        return {
+            isOpen: () => source?.readyState === EventSource.OPEN,
+            close: () => {
+                closed = true;
+                if (retry) {
+                    clearTimeout(retry);
+                }
+                source?.close();
+            },
+        };
+    },
+
     /**
      * Отметить все как прочитанные
      */
@@ -644,4 +775,14 @@ export const notificationsAPI = {
     markRead: async (id: string): Promise<void> => {
         await fetchAPI(`/notifications/${id}/read/`, { method: 'POST' });
     },
+
+    /**
+     * Отметить несколько как прочитанные (до 100 за запрос)
+     */
+    markManyRead: async (ids: string[]): Promise<void> => {
+        await fetchAPI('/notifications/read/', {
+            method: 'POST',
+            body: JSON.stringify({ ids }),
+        });
+    },
 };